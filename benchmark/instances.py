@@ -0,0 +1,48 @@
+"""
+Instance memory: keeps a million small instances alive (as a linked list) and prints the bytes each one takes.
+Run with: PYTHONPATH=src python benchmark/instances.py [--engine=<engine>] [--count=N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from lox.Lox import Lox
+
+PROGRAM = '''
+class Point {{
+  init(x, y, next) {{
+    this.x = x;
+    this.y = y;
+    this.next = next;
+  }}
+}}
+
+var points = nil;
+for (var i = 0; i < {count}; i = i + 1) {{
+  points = Point(1, 2, points);  // literal fields, so only the instances themselves take memory
+}}
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory Lox instances take.')
+    parser.add_argument('--engine', choices=Lox.engines.keys(), default='tree',
+                        help='Engine to run the program with (default tree).')
+    parser.add_argument('--count', type=int, default=1000000, help='Number of instances to keep alive (default 1M).')
+    args = parser.parse_args()
+
+    Lox.use_engine(args.engine)
+    Lox.use_cache = False
+    tracemalloc.start()  # tracing slows everything down, so the elapsed time is only comparable between runs of this
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    Lox.run(PROGRAM.format(count=args.count))  # the instances stay alive in the global points
+    elapsed = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f'{args.count} instances in {elapsed:.2f}s: {allocated / args.count:.0f} bytes per instance')
+
+
+if __name__ == '__main__':
+    main()
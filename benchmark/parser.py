@@ -0,0 +1,30 @@
+"""
+Parser throughput: parses a large generated Lox program and prints the tokens parsed per second.
+Run with: PYTHONPATH=src python benchmark/parser.py [--megabytes=N] [--lazy]
+"""
+import argparse
+import time
+
+from run.Parser import Parser
+from run.Scanner import Scanner
+from scanner import synthetic_source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how fast the Parser builds the AST of a large program.')
+    parser.add_argument('--megabytes', type=float, default=4, help='Size of the generated program (default 4).')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Only pre-parse the bodies of functions and methods, as pylox does for files.')
+    args = parser.parse_args()
+
+    tokens = Scanner(synthetic_source(args.megabytes)).scan()
+    start = time.perf_counter()
+    statements = Parser(tokens, args.lazy).parse()
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(statements)} declarations from {len(tokens)} tokens in {elapsed:.2f}s: '
+          f'{len(tokens) / elapsed:,.0f} tokens/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Scanner throughput: scans a large generated Lox program and prints the tokens scanned per second.
+Run with: PYTHONPATH=src python benchmark/scanner.py [--megabytes=N]
+"""
+import argparse
+import time
+
+from run.Scanner import Scanner
+
+CHUNK = '''// function {n}: a loop, comments and every kind of literal
+fun function{n}(a, b) {{
+  var total = 0; /* running total */
+  for (var i = 0; i < a; i += 1) {{
+    if (i / 2 == b or i >= {n}.5) total = total + i * {n}; else total -= 1;
+  }}
+  var names = ["first {n}", "second", nil, true, false];
+  return total + length(names) ^ 2;
+}}
+class Class{n} {{ init(x) {{ this.x = x; }} get() {{ return this.x + function{n}(2, 1); }} }}
+'''
+
+
+def synthetic_source(megabytes: float) -> str:
+    """
+    Generate a Lox program of about the given size, made of numbered copies of a function and a class.
+    :param megabytes: Size of the program
+    :return: The program's source
+    """
+    chunks = []
+    size = n = 0
+    while size < megabytes * 1_000_000:
+        chunks.append(CHUNK.format(n=n))
+        size += len(chunks[-1])
+        n += 1
+    return ''.join(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how fast the Scanner tokenizes a large program.')
+    parser.add_argument('--megabytes', type=float, default=4, help='Size of the generated program (default 4).')
+    args = parser.parse_args()
+
+    source = synthetic_source(args.megabytes)
+    start = time.perf_counter()
+    tokens = Scanner(source).scan()
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(tokens)} tokens from {len(source) / 1_000_000:.1f} MB in {elapsed:.2f}s: '
+          f'{len(tokens) / elapsed:,.0f} tokens/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,45 @@
 import sys
 
+from run.ClosureCompiler import ClosureInterpreter
 from run.Interpreter import Interpreter
+from run.ParseCache import ParseCache
 from run.Parser import Parser
+from run.Profile import Profile
 from run.Resolver import Resolver
 from run.Scanner import Scanner
+from run.StackInterpreter import StackInterpreter
+from run.TieredInterpreter import TieredInterpreter
+from run.Transpiler import PyInterpreter
+from run.VM import VM
 
 
 class Lox:
+    engines = {
+        "tree": Interpreter,
+        "vm": VM,
+        "closure": ClosureInterpreter,
+        "py": PyInterpreter,
+        "stack": StackInterpreter,
+        "tiered": TieredInterpreter,
+    }
+    # engines which run function bodies from the AST, and so can leave parsing one until it is first called, where the
+    # others compile every body before running
+    lazy_engines = (Interpreter, StackInterpreter, TieredInterpreter)
     interpreter = Interpreter()
     had_error = False
     had_runtime_error = False
+    use_profile: str | None = None  # profile file to specialize scripts with before running them
+    record_profile: str | None = None  # profile file to save the interpreter's feedback to after running scripts
+    use_cache = True  # whether to keep the resolved ASTs of script files in a ParseCache
+    eager_parse = False  # whether to parse function bodies in script files before running, rather than when called
+
+    @classmethod
+    def use_engine(cls, engine: str):
+        """
+        Select the engine that runs resolved programs. Scanning, parsing and resolving are shared by all engines.
+        :param engine: Name of the engine, one of Lox.engines
+        """
+        cls.interpreter = cls.engines[engine]()
 
     @classmethod
     def run_file(cls, filename: str):
@@ -20,7 +50,7 @@ class Lox:
         try:
             with open(filename) as file:
                 file_contents = file.read()
-            cls.run(file_contents)
+            cls.run(file_contents, filename=filename)
         except FileNotFoundError:
             print(f"File '{filename}' not found.")
             sys.exit(1)
@@ -43,28 +73,41 @@ class Lox:
                 return
 
     @classmethod
-    def run(cls, source: str, repl: bool = False):
+    def run(cls, source: str, repl: bool = False, filename: str | None = None):
         """
         Run scanner, parser, resolver, and interpreter on source.
         :param source: String of Lox source code.
         :param repl: Whether it is running in the repl.
+        :param filename: Path of the file the source was read from, to cache its resolved statements by.
         """
-        # Scan
-        scanner = Scanner(source)
-        tokens = scanner.scan()
+        cache = cls.use_cache and filename is not None
+        lazy = filename is not None and not cls.eager_parse and type(cls.interpreter) in cls.lazy_engines
+        statements = ParseCache.load(filename, source, lazy) if cache else None
 
-        # Parse
-        parser = Parser(tokens)
-        statements = parser.parse()
-        if Lox.had_error: return  # stop if there are syntax (parse) errors
+        if statements is None:
+            # Scan
+            scanner = Scanner(source)
+            tokens = scanner.scan()
 
-        # Resolve
-        resolver = Resolver(Lox.interpreter)
-        resolver.resolve_all(statements)
-        if Lox.had_error: return  # stop if there are resolution errors
+            # Parse
+            parser = Parser(tokens, lazy)
+            statements = parser.parse()
+            if Lox.had_error: return  # stop if there are syntax (parse) errors
+
+            # Resolve
+            resolver = Resolver()
+            resolver.resolve_all(statements)
+            if Lox.had_error: return  # stop if there are resolution errors
+
+            if cache: ParseCache.save(filename, source, lazy, statements)
 
         # Interpret
-        Lox.interpreter.interpret(statements, repl)
+        try:
+            if cls.use_profile: Profile.apply(cls.use_profile, source, statements)
+            Lox.interpreter.interpret(statements, repl)
+        except Parser.ParseError:  # errors in a function body parsed when it was first called, already reported
+            return
+        if cls.record_profile: Profile.save(cls.record_profile, source, statements)
 
     @classmethod
     def error_line(cls, line: int, message: str):
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 
 class LoxCallable(ABC):
+    __slots__ = ()  # so callables which declare their own slots don't get a __dict__ as well
     name = "Base LoxCallable"
 
     @abstractmethod
@@ -0,0 +1,128 @@
+from array import array
+from enum import IntEnum, auto
+
+from lox.LoxToken import LoxToken, TokenType
+
+
+class OpCode(IntEnum):
+    # Constants and stack.
+    CONSTANT = auto()  # push constants[arg]
+    NIL = auto()
+    TRUE = auto()
+    FALSE = auto()
+    POP = auto()
+
+    # Variables.
+    GET_LOCAL = auto()  # arg: frame slot
+    SET_LOCAL = auto()
+    GET_UPVALUE = auto()  # arg: index into closure upvalues
+    SET_UPVALUE = auto()
+    GET_GLOBAL = auto()  # arg: constant index of name
+    SET_GLOBAL = auto()
+    DEFINE_GLOBAL = auto()
+
+    # Properties.
+    GET_PROPERTY = auto()  # arg: constant index of name
+    SET_PROPERTY = auto()
+    CHECK_INSTANCE = auto()  # make sure a set target is an instance before its value is evaluated
+    LOAD_METHOD = auto()  # replace receiver with [method, receiver] (or [None, field value])
+    GET_SUPER = auto()
+    SUPER_METHOD = auto()
+
+    # Operators.
+    EQUAL = auto()
+    NOT_EQUAL = auto()
+    GREATER = auto()
+    GREATER_EQUAL = auto()
+    LESS = auto()
+    LESS_EQUAL = auto()
+    ADD = auto()
+    SUBTRACT = auto()
+    MULTIPLY = auto()
+    DIVIDE = auto()
+    POWER = auto()
+    NOT = auto()
+    NEGATE = auto()
+
+    # Control flow. Jump args are absolute offsets into the code list.
+    JUMP = auto()
+    JUMP_IF_FALSE = auto()  # leaves the condition on the stack
+    JUMP_IF_TRUE = auto()  # leaves the condition on the stack
+    POP_JUMP_IF_FALSE = auto()
+
+    # Functions and classes.
+    CALL = auto()  # arg: argument count
+    CALL_METHOD = auto()  # arg: argument count, stack holds the result of LOAD_METHOD/SUPER_METHOD
+    CLOSURE = auto()  # arg: constant index of a LoxFunctionProto
+    CLOSE_UPVALUE = auto()
+    RETURN = auto()
+    CLASS = auto()  # arg: constant index of name
+    INHERIT = auto()
+    METHOD = auto()  # arg: constant index of name
+
+    # Lists.
+    BUILD_LIST = auto()  # arg: item count
+    CHECK_LIST = auto()  # make sure an indexed value is a list before its index is evaluated
+    CHECK_INDEX = auto()  # make sure an index is valid before an assigned value is evaluated
+    INDEX_GET = auto()
+    INDEX_SET = auto()
+
+    # REPL.
+    PRINT_EXPR = auto()  # print the value of a top level expression statement
+
+    def __str__(self):
+        return self.name
+
+
+class Chunk:
+    """
+    A compiled sequence of instructions. Every instruction takes two entries in code: the opcode and its argument
+    (0 when unused). lines holds the source line of each instruction (0 if it has none), used to report runtime
+    errors, so compiled code doesn't keep the tokens alive.
+    """
+
+    __slots__ = ('code', 'constants', 'lines', 'constant_indices')
+
+    def __init__(self):
+        self.code: list[int] = []
+        self.constants: list[object] = []
+        self.lines = array('I')
+        self.constant_indices: dict[tuple[type, object], int] = {}
+
+    def write(self, op: OpCode, arg: int = 0, token: "LoxToken" = None) -> int:
+        """
+        Append an instruction to the chunk.
+        :param op: Opcode of the instruction
+        :param arg: Argument of the instruction
+        :param token: Token to blame if the instruction raises a runtime error
+        :return: Offset of the argument, so jumps can be patched
+        """
+        self.code.append(int(op))
+        self.code.append(arg)
+        self.lines.append(0 if token is None else token.line)
+        return len(self.code) - 1
+
+    def add_constant(self, value: object) -> int:
+        """
+        Add a value to the constant pool. Numbers and strings are only stored once.
+        :param value: Constant value
+        :return: Index of the value in the constant pool
+        """
+        if isinstance(value, (float, str)):
+            key = (type(value), value)
+            if key not in self.constant_indices:
+                self.constant_indices[key] = len(self.constants)
+                self.constants.append(value)
+            return self.constant_indices[key]
+
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def token_at(self, ip: int) -> "LoxToken | None":
+        """
+        Get a token to blame for the instruction which ends right before ip.
+        :param ip: Offset just past the instruction
+        :return: Token at the instruction's line, None if it has none
+        """
+        line = self.lines[(ip - 2) >> 1]
+        return LoxToken(TokenType.IDENTIFIER, '', None, line) if line else None
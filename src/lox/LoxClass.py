@@ -1,34 +1,34 @@
 from lox.LoxCallable import LoxCallable
 from lox.LoxFunction import LoxFunction
+from lox.LoxShape import Shape
 
 
 class LoxClass(LoxCallable):
+    __slots__ = ('name', 'superclass', 'methods', 'initializer', 'shape')
+
     def __init__(self, name: str, superclass: "LoxClass", methods: dict[str, LoxFunction]):
         self.name = name
         self.superclass = superclass
-        self.methods = methods
+        # inherited methods are copied down, so finding a method is a single lookup (the vm copies them as it inherits)
+        self.methods = {**superclass.methods, **methods} if superclass else methods
+        self.initializer = self.find_method("init")  # found once, the vm updates it as it adds methods
+        self.shape = Shape(self)  # shape of instances without any fields yet
 
     def find_method(self, name: str) -> LoxFunction | None:
-        if name in self.methods:
-            return self.methods[name]
-
-        if self.superclass:
-            return self.superclass.find_method(name)
-
-        return None
+        return self.methods.get(name)
 
     def call(self, interpreter: "Interpreter", arguments: list[object]) -> object:
         from lox.LoxInstance import LoxInstance
         instance = LoxInstance(self)
 
-        initializer = self.find_method("init")
+        initializer = self.initializer
         if initializer:
             initializer.bind(instance).call(interpreter, arguments)
 
         return instance
 
     def arity(self) -> int:
-        initializer = self.find_method("init")
+        initializer = self.initializer
         return 0 if not initializer else initializer.arity()
 
     def __repr__(self) -> str:
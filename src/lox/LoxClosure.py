@@ -0,0 +1,69 @@
+from lox.LoxChunk import Chunk
+
+
+class LoxFunctionProto:
+    """
+    Compiled form of a function declaration, shared by every closure created from it.
+    """
+
+    __slots__ = ('name', 'arity', 'is_initializer', 'chunk', 'upvalues')
+
+    def __init__(self, name: str, arity: int = 0, is_initializer: bool = False):
+        self.name = name
+        self.arity = arity
+        self.is_initializer = is_initializer
+        self.chunk = Chunk()
+        self.upvalues: list[tuple[bool, int]] = []  # (captures a local of the enclosing function?, index)
+
+    def __repr__(self):
+        return f'<fn {self.name}>'
+
+
+class Upvalue:
+    """
+    A variable captured by a closure. While open it refers to a slot on the VM stack, once the slot goes out of
+    scope the value is moved into the upvalue itself.
+    """
+
+    __slots__ = ('stack', 'location', 'closed', 'value')
+
+    def __init__(self, stack: list[object], location: int):
+        self.stack = stack
+        self.location = location
+        self.closed = False
+        self.value = None
+
+    def get(self) -> object:
+        return self.value if self.closed else self.stack[self.location]
+
+    def set(self, value: object):
+        if self.closed:
+            self.value = value
+        else:
+            self.stack[self.location] = value
+
+    def close(self):
+        self.value = self.stack[self.location]
+        self.closed = True
+
+
+class LoxClosure:
+    __slots__ = ('function', 'upvalues')
+
+    def __init__(self, function: LoxFunctionProto, upvalues: list[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+
+    def __repr__(self):
+        return f'<fn {self.function.name}>'
+
+
+class LoxBoundMethod:
+    __slots__ = ('receiver', 'method')
+
+    def __init__(self, receiver: "LoxInstance", method: LoxClosure):
+        self.receiver = receiver
+        self.method = method
+
+    def __repr__(self):
+        return repr(self.method)
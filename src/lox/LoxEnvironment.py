@@ -1,10 +1,30 @@
 from lox.LoxRuntimeError import LoxRuntimeError
 
+UNDEFINED = object()  # marks global slots whose variable hasn't been defined (yet)
+
 
 class Environment:
-    def __init__(self, enclosing: "Environment" = None):
-        self.values = {}
-        self.enclosing = enclosing
+    """
+    The global scope. Globals can be used before they are defined, so the Resolver can't check they exist, but it
+    does give every global name a slot in the table, so lookups are list indexing instead of dict lookups. A slot
+    holds UNDEFINED until its variable is defined. Locals live in flat frames instead, see Resolver.
+    """
+
+    __slots__ = ('values',)
+
+    slots: dict[str, int] = {}  # global names to their slot, shared so the Resolver can number names ahead of time
+
+    def __init__(self):
+        self.values: list[object] = []
+
+    @classmethod
+    def slot(cls, name: str) -> int:
+        """
+        Get the slot of a global name, giving it the next one if it hasn't got one yet.
+        :param name: Variable's name
+        :return: Index into values
+        """
+        return cls.slots.setdefault(name, len(cls.slots))
 
     def define(self, name: str, value: object):
         """
@@ -13,68 +33,50 @@ class Environment:
         :param name: Variable's name
         :param value: Variable's value
         """
-        self.values[name] = value
+        slot = self.slot(name)
+        if slot >= len(self.values):
+            self.values.extend([UNDEFINED] * (len(self.slots) - len(self.values)))  # in place, closures share it
+        self.values[slot] = value
 
-    def assign(self, name: "LoxToken", value: object):
+    def assign(self, name: "LoxToken", slot: int, value: object):
         """
         Assign a variable a new value.
         e.g. a = 2; (Assuming a has been defined).
         :param name: Token to assign to
+        :param slot: Slot the Resolver gave the name
         :param value: Variable's value
         :raises: LoxRuntimeError if trying to assign to undefined variable
         """
-        lexeme = name.lexeme
-        if lexeme in self.values:
-            self.values[lexeme] = value
+        if slot < len(self.values) and self.values[slot] is not UNDEFINED:
+            self.values[slot] = value
             return
 
-        if self.enclosing:
-            self.enclosing.assign(name, value)
-            return
+        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
 
-        raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'.")
-
-    def get(self, name: "LoxToken") -> object:
+    def get(self, name: "LoxToken", slot: int) -> object:
         """
         Get the value of a variable in the environment.
         :param name: Token of the variable
+        :param slot: Slot the Resolver gave the name
         :return: Value of the variable
-        ":raises: LoxRuntimeError if trying to get value of undefined variable
+        :raises: LoxRuntimeError if trying to get value of undefined variable
         """
-        lexeme = name.lexeme
-        if lexeme in self.values:
-            return self.values[lexeme]
-
-        if self.enclosing: return self.enclosing.get(name)
+        try:
+            value = self.values[slot]
+            if value is not UNDEFINED: return value
+        except IndexError:  # named after this environment last grew, so not defined either
+            pass
 
-        raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'.")
+        raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
 
-    def get_at(self, distance: int, name: str) -> object:
-        """
-        Get the value of a variable which is a certain depth in the environment hierarchy.
-        :param distance: Depth of target variable in environment hierarchy
-        :param name: Variable name (lexeme)
-        :return: The variable's value
-        """
-        return self.ancestor(distance).values.get(name)
 
-    def assign_at(self, distance: int, name: "LoxToken", value: object):
-        """
-        Assign a value to a variable which is a certain depth in the environment hierarchy.
-        :param distance: Depth of target variable in environment hierarchy
-        :param name: Variable name (lexeme)
-        :param value: New value for the variable
-        """
-        self.ancestor(distance).values[name.lexeme] = value
+class Cell:
+    """
+    A local variable captured by a closure. The frame declaring the variable and every closure using it share the
+    cell, so closures only keep alive the variables they use.
+    """
 
-    def ancestor(self, distance: int) -> "Environment":
-        """
-        Find the ancestor of the environment a given number of steps away.
-        :param distance: Depth to walk in environment hierarchy
-        :return: Ancestor environment
-        """
-        environment = self
-        for _ in range(distance):
-            environment = environment.enclosing
+    __slots__ = ('value',)
 
-        return environment
+    def __init__(self, value: object):
+        self.value = value
@@ -35,113 +35,185 @@ class ExprVisitor(ABC):
 	def visit_variable_expr(self, expr: "VariableExpr"): pass
 
 class Expr(ABC):
+	__slots__ = ()  # nodes only have the attributes they declare, rather than a __dict__ each
+
 	@abstractmethod
 	def accept(self, visitor: "ExprVisitor"): pass
 
 class AccessExpr(Expr):
+	__slots__ = ('name', 'lst', 'index', 'can_call', )
+
 	def __init__(self, name: "LoxToken", lst: "Expr", index: "Expr", ):
 		self.name = name
 		self.lst = lst
 		self.index = index
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_access_expr(self)
 
 class AssignExpr(Expr):
+	__slots__ = ('name', 'value', 'access', 'slot', 'can_call', )
+
 	def __init__(self, name: "LoxToken", value: "Expr", ):
 		self.name = name
 		self.value = value
+		self.access: "VariableAccess" = None
+		self.slot: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_assign_expr(self)
 
 class BinaryExpr(Expr):
+	__slots__ = ('left', 'operator', 'right', 'left_type', 'right_type', 'operation', 'rewrites', 'can_call', )
+
 	def __init__(self, left: "Expr", operator: "LoxToken", right: "Expr", ):
 		self.left = left
 		self.operator = operator
 		self.right = right
+		self.left_type: "type" = None
+		self.right_type: "type" = None
+		self.operation: "Callable" = None
+		self.rewrites: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_binary_expr(self)
 
 class CallExpr(Expr):
+	__slots__ = ('callee', 'paren', 'arguments', 'can_call', )
+
 	def __init__(self, callee: "Expr", paren: "LoxToken", arguments: "list[Expr]", ):
 		self.callee = callee
 		self.paren = paren
 		self.arguments = arguments
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_call_expr(self)
 
 class GetExpr(Expr):
+	__slots__ = ('object', 'name', 'cached_shape', 'cached_offset', 'cached_method', 'can_call', )
+
 	def __init__(self, object: "Expr", name: "LoxToken", ):
 		self.object = object
 		self.name = name
+		self.cached_shape: "Shape" = None
+		self.cached_offset: "int" = None
+		self.cached_method: "LoxFunction" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_get_expr(self)
 
 class GroupingExpr(Expr):
+	__slots__ = ('expression', 'can_call', )
+
 	def __init__(self, expression: "Expr", ):
 		self.expression = expression
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_grouping_expr(self)
 
 class ListExpr(Expr):
+	__slots__ = ('items', 'can_call', )
+
 	def __init__(self, items: "list[Expr]", ):
 		self.items = items
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_list_expr(self)
 
 class ListAssignExpr(Expr):
+	__slots__ = ('name', 'lst', 'index', 'value', 'can_call', )
+
 	def __init__(self, name: "LoxToken", lst: "Expr", index: "Expr", value: "Expr", ):
 		self.name = name
 		self.lst = lst
 		self.index = index
 		self.value = value
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_listassign_expr(self)
 
 class LiteralExpr(Expr):
+	__slots__ = ('value', 'can_call', )
+
 	def __init__(self, value: "object", ):
 		self.value = value
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_literal_expr(self)
 
 class LogicalExpr(Expr):
+	__slots__ = ('left', 'operator', 'right', 'short_circuit', 'can_call', )
+
 	def __init__(self, left: "Expr", operator: "LoxToken", right: "Expr", ):
 		self.left = left
 		self.operator = operator
 		self.right = right
+		self.short_circuit: "bool" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_logical_expr(self)
 
 class SetExpr(Expr):
+	__slots__ = ('object', 'name', 'value', 'cached_shape', 'cached_offset', 'cached_transition', 'can_call', )
+
 	def __init__(self, object: "Expr", name: "LoxToken", value: "Expr", ):
 		self.object = object
 		self.name = name
 		self.value = value
+		self.cached_shape: "Shape" = None
+		self.cached_offset: "int" = None
+		self.cached_transition: "Shape" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_set_expr(self)
 
 class SuperExpr(Expr):
+	__slots__ = ('keyword', 'method', 'access', 'slot', 'this', 'cached_class', 'cached_method', 'can_call', )
+
 	def __init__(self, keyword: "LoxToken", method: "LoxToken", ):
 		self.keyword = keyword
 		self.method = method
+		self.access: "VariableAccess" = None
+		self.slot: "int" = None
+		self.this: "ThisExpr" = None
+		self.cached_class: "LoxClass" = None
+		self.cached_method: "LoxFunction" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_super_expr(self)
 
 class ThisExpr(Expr):
+	__slots__ = ('keyword', 'access', 'slot', 'can_call', )
+
 	def __init__(self, keyword: "LoxToken", ):
 		self.keyword = keyword
+		self.access: "VariableAccess" = None
+		self.slot: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_this_expr(self)
 
 class UnaryExpr(Expr):
+	__slots__ = ('operator', 'right', 'operand_type', 'operation', 'rewrites', 'can_call', )
+
 	def __init__(self, operator: "LoxToken", right: "Expr", ):
 		self.operator = operator
 		self.right = right
+		self.operand_type: "type" = None
+		self.operation: "Callable" = None
+		self.rewrites: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_unary_expr(self)
 
 class VariableExpr(Expr):
+	__slots__ = ('name', 'access', 'slot', 'can_call', )
+
 	def __init__(self, name: "LoxToken", ):
 		self.name = name
+		self.access: "VariableAccess" = None
+		self.slot: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "ExprVisitor"):
 		return visitor.visit_variable_expr(self)
 
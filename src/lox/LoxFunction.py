@@ -1,38 +1,59 @@
 from lox.LoxStmt import FunctionStmt
 from lox.LoxCallable import LoxCallable
-from lox.LoxEnvironment import Environment
-from lox.LoxReturn import LoxReturn
+from lox.LoxEnvironment import Cell
+from lox.LoxTailCall import LoxTailCall
 
 
 class LoxFunction(LoxCallable):
-    def __init__(self, declaration: FunctionStmt, closure: Environment, is_initializer: bool = False):
+    __slots__ = ('declaration', 'upvalues', 'is_initializer', 'instance')
+
+    def __init__(self, declaration: FunctionStmt, upvalues: list[Cell], is_initializer: bool = False,
+                 instance: "LoxInstance" = None):
         self.declaration = declaration
-        self.closure = closure
+        self.upvalues = upvalues  # cells of the enclosing functions' locals which this function uses
         self.is_initializer = is_initializer
+        self.instance = instance  # 'this' for bound methods
 
     def arity(self) -> int:
         return len(self.declaration.params)
 
     def bind(self, instance: "LoxInstance"):
-        environment = Environment(self.closure)
-        environment.define("this", instance)
-        return LoxFunction(self.declaration, environment, self.is_initializer)
-
-    def call(self, interpreter: "Interpreter", arguments: list[object]) -> object:
-        from run.Interpreter import Interpreter
-        environment = Environment(self.closure)
-
-        for param, arg in zip(self.declaration.params, arguments):
-            environment.define(param.lexeme, arg)
-
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except LoxReturn as return_value:
-            if self.is_initializer: return self.closure.get_at(0, "this")
-
-            return return_value.value
-
-        if self.is_initializer: return self.closure.get_at(0, "this")
+        return LoxFunction(self.declaration, self.upvalues, self.is_initializer, instance)
+
+    def call(self, interpreter: "Interpreter", arguments: list[object], instance: "LoxInstance" = None) -> object:
+        """
+        Call the function. Methods called straight from obj.method(...) get obj as instance, instead of being bound
+        to it first.
+        """
+        function = self
+        if instance is None: instance = self.instance
+        while True:  # runs again for each tail call the body ends with
+            declaration = function.declaration
+            result = interpreter.execute_block(declaration.body, function.new_frame(arguments, instance),
+                                               function.upvalues, declaration)
+
+            if type(result) is not LoxTailCall: break
+            function, arguments = result.function, result.arguments
+            instance = function.instance
+
+        if function.is_initializer: return instance
+        return None if result is None else result[0]
+
+    def new_frame(self, arguments: list[object], instance: "LoxInstance") -> list[object]:
+        """
+        Turn the arguments of a call into the frame holding the function's locals.
+        :param arguments: Evaluated arguments, which are reused as the frame
+        :param instance: 'this' for methods
+        :return: The frame
+        """
+        declaration = self.declaration
+        if declaration.lazy is not None: declaration.lazy.parse(declaration)  # the first call of the function
+        frame = arguments  # parameters take the first slots, followed by 'this' for methods
+        if declaration.frame_size > len(arguments): frame += [None] * (declaration.frame_size - len(arguments))
+        if instance is not None: frame[len(declaration.params)] = instance
+        for slot in declaration.cells:
+            frame[slot] = Cell(frame[slot])
+        return frame
 
     def __repr__(self):
         return f'<fn {self.declaration.name.lexeme}>'
@@ -4,21 +4,43 @@ from lox.LoxRuntimeError import LoxRuntimeError
 
 
 class LoxInstance:
+    """
+    An instance of a Lox class. Fields are stored by index in a list, laid out by the instance's Shape, rather than in
+    a dict of their own.
+    """
+
+    __slots__ = ('shape', 'values')
+
     def __init__(self, l_class: LoxClass):
-        self.l_class = l_class
-        self.fields = {}
+        self.shape = l_class.shape
+        self.values: list[object] = []
 
-    def get(self, name: "LoxToken"):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+    @property
+    def l_class(self) -> LoxClass:
+        return self.shape.l_class
 
-        method = self.l_class.find_method(name.lexeme)
+    def get(self, name: "LoxToken"):
+        offset, method = self.shape.find(name.lexeme)
+        if offset is not None: return self.values[offset]
         if method: return method.bind(self)
 
         raise LoxRuntimeError(name, f"Undefined property {name.lexeme}.")
 
     def set(self, name: "LoxToken", value: object):
-        self.fields[name.lexeme] = value
+        self.set_field(name.lexeme, value)
+
+    def set_field(self, name: str, value: object):
+        """
+        Set a field, adding it if the instance doesn't have it yet.
+        :param name: Name of the field
+        :param value: The field's new value
+        """
+        offset, shape = self.shape.place(name)
+        if shape is None:
+            self.values[offset] = value
+        else:
+            self.shape = shape
+            self.values.append(value)
 
     def __repr__(self):
         return f'<class {self.l_class.name} instance>'
@@ -0,0 +1,42 @@
+from lox.LoxStmt import FunctionStmt
+from lox.LoxTokenBuffer import TokenBuffer
+
+
+class LazyBody:
+    """
+    The body of a function the Parser has only pre-parsed, by matching its brackets. Its statements are parsed and
+    resolved the first time they are needed, usually the first call, into the FunctionStmt's body list, which exists
+    (empty) from the start so anything keyed by it stays valid.
+
+    Only functions and methods declared in top level code are pre-parsed, and only if they don't use 'super', so
+    their bodies can't capture any locals and resolving them later in a Resolver of their own gives the same result.
+    """
+
+    __slots__ = ('tokens', 'start', 'function_type', 'class_type')
+
+    def __init__(self, tokens: TokenBuffer, start: int):
+        self.tokens = tokens
+        self.start = start  # index of the body's first token, after its '{'
+        self.function_type: "FunctionType" = None  # what the Resolver would have resolved the body as
+        self.class_type: "ClassType" = None
+
+    def parse(self, function: FunctionStmt):
+        """
+        Parse and resolve the body of a function. Errors are reported like any other syntax or resolution error.
+        :param function: FunctionStmt the body belongs to
+        :raises: ParseError if the body had errors, which Lox.run stops the program for
+        """
+        from lox.Lox import Lox
+        from run.Parser import Parser
+        from run.Resolver import Resolver
+
+        parser = Parser(self.tokens)
+        parser.current = self.start
+        function.body.extend(parser.block())
+        function.lazy = None
+
+        if not Lox.had_error:
+            resolver = Resolver()
+            resolver.current_class = self.class_type
+            resolver.resolve_function(function, self.function_type)
+        if Lox.had_error: raise Parser.ParseError()
@@ -0,0 +1,231 @@
+"""
+Runtime support for Lox programs transpiled to Python by run.Transpiler. Generated modules start with
+`from lox.LoxPyRuntime import *`, so everything they call is defined here.
+
+Lox functions become plain Python functions, Lox classes become Python classes deriving from LoxPyInstance, and
+instance fields and methods share the `m_<name>` attribute namespace so fields shadow methods just like in Lox.
+Runtime errors carry the Lox line number they should be reported at.
+"""
+import math
+from types import FunctionType, MethodType
+
+from lox.LoxCallable import LoxCallable
+from lox.LoxRuntimeError import LoxRuntimeError
+from lox.LoxToken import LoxToken, TokenType as TT
+from lox.NativeFunctions import NativeFunction
+from run.Interpreter import Interpreter
+
+MISSING = object()  # default for getattr, so a missing property can be told apart from a nil field
+
+
+class PyRuntime(Interpreter):
+    """
+    Interpreter hooks (stringify, is_truthy) for native functions called from transpiled code.
+    """
+
+    @classmethod
+    def stringify(cls, obj: object) -> str:
+        if isinstance(obj, FunctionType): return f'<fn {lox_name(obj.__name__)}>'
+        if isinstance(obj, MethodType): return f'<fn {lox_name(obj.__func__.__name__)}>'
+        return super().stringify(obj)
+
+
+class LoxPyClass(type):
+    """
+    Metaclass of transpiled Lox classes.
+    """
+    lox_name: str
+
+    def __repr__(cls) -> str:
+        return f'<class {cls.lox_name}>'
+
+
+class LoxPyInstance(metaclass=LoxPyClass):
+    """
+    Base class of transpiled Lox classes.
+    """
+    lox_name = 'instance'
+
+    def __repr__(self) -> str:
+        return f'<class {type(self).lox_name} instance>'
+
+
+def lox_name(python_name: str) -> str:
+    """
+    Get the Lox name back from a generated Python name, e.g. g_fib, v3_fib, f3_fib or m_fib.
+    """
+    return python_name.split('_', 1)[1]
+
+
+def native_globals() -> dict[str, object]:
+    """
+    :return: Global constants and native functions, under their generated Python names
+    """
+    natives = {'g_PI': math.pi, 'g_E': math.e}
+    for native in NativeFunction.__subclasses__():
+        natives[f'g_{native.name}'] = native()
+    return natives
+
+
+def error(line: int, message: str) -> LoxRuntimeError:
+    """
+    Create a LoxRuntimeError reported at a Lox line.
+    """
+    return LoxRuntimeError(LoxToken(TT.IDENTIFIER, '', None, line), message)
+
+
+# ------------- Calls ----------
+def call(callee: object, line: int, *arguments: object) -> object:
+    """
+    Call any Lox value, checking that it is callable with this many arguments.
+    """
+    if type(callee) is FunctionType:
+        arity = callee.__code__.co_argcount
+    elif type(callee) is MethodType:
+        arity = callee.__func__.__code__.co_argcount - 1
+    elif isinstance(callee, LoxPyClass):
+        initializer = getattr(callee, 'm_init', None)
+        arity = 0 if initializer is None else initializer.__code__.co_argcount - 1
+    elif isinstance(callee, LoxCallable):
+        arity = callee.arity()
+    else:
+        raise error(line, "Can only call functions and classes.")
+
+    if len(arguments) != arity:
+        raise error(line, f"Expected {arity} arguments but got {len(arguments)}.")
+
+    if isinstance(callee, LoxPyClass):
+        instance = object.__new__(callee)
+        if initializer: initializer(instance, *arguments)
+        return instance
+
+    if isinstance(callee, LoxCallable):
+        return callee.call(PyRuntime, list(arguments))
+
+    return callee(*arguments)
+
+
+def call_top(callee: object, line: int, *arguments: object) -> object:
+    """
+    Call from top level code. Errors from anywhere inside the call are reported at the line of the call.
+    """
+    try:
+        return call(callee, line, *arguments)
+    except LoxRuntimeError as call_error:
+        raise error(line, call_error.message)
+    except NameError as name_error:  # functions read globals without checking they exist
+        raise error(line, f"Undefined variable '{lox_name(name_error.name)}'.")
+
+
+# ------------- Errors ----------
+def numbers_error(line: int, *operands: object):
+    raise error(line, "Both Operands must be numbers.")
+
+
+def operand_error(line: int):
+    raise error(line, "Operand must be a number.")
+
+
+def undefined_variable(line: int, name: str, *values: object):
+    raise error(line, f"Undefined variable '{name}'.")
+
+
+def undefined_property(line: int, name: str):
+    raise error(line, f"Undefined property {name}.")
+
+
+def not_list(line: int):
+    raise error(line, "Can only access index of lists.")
+
+
+# ------------- Operators ----------
+def add(left: object, right: object, line: int) -> object:
+    """
+    Addition for anything other than two numbers: lists append, strings concatenate.
+    """
+    if isinstance(left, float) and isinstance(right, float):
+        return left + right
+    if isinstance(left, list):
+        return left + [right]
+    if isinstance(left, str) or isinstance(right, str):
+        return PyRuntime.stringify(left) + PyRuntime.stringify(right)
+    raise error(line, "Unsupported types for addition.")
+
+
+def divide(left: object, right: object, line: int) -> float:
+    if not isinstance(left, float) or not isinstance(right, float):
+        raise error(line, "Both Operands must be numbers.")
+    if right == 0: raise error(line, "Cannot divide by 0.")
+    return left / right
+
+
+# ------------- Variables ----------
+def assign_box(box: list, value: object) -> object:
+    """
+    Assign to a captured variable which is shared through a one item list.
+    """
+    box[0] = value
+    return value
+
+
+# ------------- Classes ----------
+def check_superclass(superclass: object, line: int) -> LoxPyClass:
+    if not isinstance(superclass, LoxPyClass):
+        raise error(line, "Superclass must be a class.")
+    return superclass
+
+
+def get_property(obj: object, name: str, line: int) -> object:
+    if not isinstance(obj, LoxPyInstance):
+        raise error(line, "Only instances have properties.")
+
+    value = getattr(obj, name, MISSING)
+    if value is MISSING: raise error(line, f"Undefined property {lox_name(name)}.")
+    return value
+
+
+def check_instance(obj: object, line: int) -> LoxPyInstance:
+    if not isinstance(obj, LoxPyInstance):
+        raise error(line, "Only instances have fields.")
+    return obj
+
+
+def set_property(obj: LoxPyInstance, name: str, value: object) -> object:
+    setattr(obj, name, value)
+    return value
+
+
+def get_super(superclass: LoxPyClass, instance: LoxPyInstance, name: str, line: int) -> MethodType:
+    method = getattr(superclass, name, None)
+    if method is None: raise error(line, f"Undefined property '{lox_name(name)}'.")
+    return MethodType(method, instance)
+
+
+# ------------- Lists ----------
+def check_index(lst: list, index: object, line: int) -> int:
+    """
+    :return: index as an int
+    :raises: LoxRuntimeError if index isn't a whole number in range
+    """
+    if not (isinstance(index, float) and index.is_integer()):
+        raise error(line, "Can only index with a whole number.")
+
+    length = len(lst)
+    if index >= length or index < -length:
+        raise error(line, "List index out of range.")
+
+    return int(index)
+
+
+def index(lst: list, index_: object, line: int) -> object:
+    return lst[check_index(lst, index_, line)]
+
+
+def store(lst: list, index_: int, value: object) -> list:
+    lst[index_] = value
+    return lst
+
+
+# ------------- REPL ----------
+def print_expr(value: object):
+    if value is not None: print(PyRuntime.stringify(value))
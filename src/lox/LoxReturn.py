@@ -1,3 +0,0 @@
-class LoxReturn(RuntimeError):
-    def __init__(self, value):
-        self.value = value
\ No newline at end of file
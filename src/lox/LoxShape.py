@@ -0,0 +1,45 @@
+class Shape:
+    """
+    The layout of an instance (a "hidden class"): which index of the instance's values holds each of its fields.
+    Instances of a class start out with the class's empty shape and move along a transition each time they get a new
+    field, so instances whose fields were added in the same order share their shapes, and only keep a list of values
+    each. Property accesses cache the shape they saw last and where the property was in it.
+    """
+
+    __slots__ = ('l_class', 'offsets', 'transitions')
+
+    def __init__(self, l_class: "LoxClass", offsets: dict[str, int] = None):
+        self.l_class = l_class
+        self.offsets: dict[str, int] = offsets if offsets is not None else {}
+        self.transitions: dict[str, Shape] = {}  # field name to the shape of instances which get that field next
+
+    def add(self, name: str) -> "Shape":
+        """
+        Get the shape of instances of this shape once they get a new field.
+        :param name: Name of the new field, which goes at the end of the values
+        :return: The shape with the field added
+        """
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = self.transitions[name] = Shape(self.l_class, {**self.offsets, name: len(self.offsets)})
+        return shape
+
+    def find(self, name: str) -> tuple[int | None, "LoxFunction | None"]:
+        """
+        Look up a property of instances of this shape. Fields shadow methods.
+        :param name: Name of the property
+        :return: The field's index in the values, or None and the method (None if there isn't one either)
+        """
+        offset = self.offsets.get(name)
+        if offset is not None: return offset, None
+        return None, self.l_class.find_method(name)
+
+    def place(self, name: str) -> tuple[int, "Shape | None"]:
+        """
+        Find where setting a field on instances of this shape stores its value.
+        :param name: Name of the field
+        :return: The field's index in the values, and the shape to move to if it's a new field (None otherwise)
+        """
+        offset = self.offsets.get(name)
+        if offset is not None: return offset, None
+        return len(self.offsets), self.add(name)
@@ -10,6 +10,8 @@ class StmtVisitor(ABC):
 	@abstractmethod
 	def visit_expression_stmt(self, stmt: "ExpressionStmt"): pass
 	@abstractmethod
+	def visit_for_stmt(self, stmt: "ForStmt"): pass
+	@abstractmethod
 	def visit_function_stmt(self, stmt: "FunctionStmt"): pass
 	@abstractmethod
 	def visit_if_stmt(self, stmt: "IfStmt"): pass
@@ -21,63 +23,123 @@ class StmtVisitor(ABC):
 	def visit_while_stmt(self, stmt: "WhileStmt"): pass
 
 class Stmt(ABC):
+	__slots__ = ()  # nodes only have the attributes they declare, rather than a __dict__ each
+
 	@abstractmethod
 	def accept(self, visitor: "StmtVisitor"): pass
 
 class BlockStmt(Stmt):
+	__slots__ = ('statements', 'frame_size', 'can_call', )
+
 	def __init__(self, statements: "list[Stmt]", ):
 		self.statements = statements
+		self.frame_size: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_block_stmt(self)
 
 class ClassStmt(Stmt):
+	__slots__ = ('name', 'superclass', 'methods', 'slot', 'captured', 'super_slot', 'frame_size', 'can_call', )
+
 	def __init__(self, name: "LoxToken", superclass: "VariableExpr", methods: "list[FunctionStmt]", ):
 		self.name = name
 		self.superclass = superclass
 		self.methods = methods
+		self.slot: "int" = None
+		self.captured: "bool" = None
+		self.super_slot: "int" = None
+		self.frame_size: "int" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_class_stmt(self)
 
 class ExpressionStmt(Stmt):
+	__slots__ = ('expression', 'can_call', )
+
 	def __init__(self, expression: "Expr", ):
 		self.expression = expression
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_expression_stmt(self)
 
+class ForStmt(Stmt):
+	__slots__ = ('initializer', 'condition', 'increment', 'body', 'step', 'iterations', 'compiled', 'can_call', )
+
+	def __init__(self, initializer: "Stmt", condition: "Expr", increment: "Expr", body: "Stmt", ):
+		self.initializer = initializer
+		self.condition = condition
+		self.increment = increment
+		self.body = body
+		self.step: "float" = None
+		self.iterations: "int" = None
+		self.compiled: "StmtFn" = None
+		self.can_call: "bool" = None
+	def accept(self, visitor: "StmtVisitor"):
+		return visitor.visit_for_stmt(self)
+
 class FunctionStmt(Stmt):
+	__slots__ = ('name', 'params', 'body', 'slot', 'captured', 'cells', 'upvalues', 'frame_size', 'lazy', 'calls', 'loops', 'compiled', 'can_call', )
+
 	def __init__(self, name: "LoxToken", params: "list[LoxToken]", body: "list[Stmt]", ):
 		self.name = name
 		self.params = params
 		self.body = body
+		self.slot: "int" = None
+		self.captured: "bool" = None
+		self.cells: "list[int]" = None
+		self.upvalues: "list[tuple[bool, int]]" = None
+		self.frame_size: "int" = None
+		self.lazy: "LazyBody" = None
+		self.calls: "int" = None
+		self.loops: "int" = None
+		self.compiled: "StmtFn" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_function_stmt(self)
 
 class IfStmt(Stmt):
+	__slots__ = ('condition', 'thenBranch', 'elseBranch', 'can_call', )
+
 	def __init__(self, condition: "Expr", thenBranch: "Stmt", elseBranch: "Stmt", ):
 		self.condition = condition
 		self.thenBranch = thenBranch
 		self.elseBranch = elseBranch
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_if_stmt(self)
 
 class ReturnStmt(Stmt):
+	__slots__ = ('keyword', 'value', 'tail_call', 'can_call', )
+
 	def __init__(self, keyword: "LoxToken", value: "Expr", ):
 		self.keyword = keyword
 		self.value = value
+		self.tail_call: "bool" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_return_stmt(self)
 
 class VarStmt(Stmt):
+	__slots__ = ('name', 'initializer', 'slot', 'captured', 'can_call', )
+
 	def __init__(self, name: "LoxToken", initializer: "Expr", ):
 		self.name = name
 		self.initializer = initializer
+		self.slot: "int" = None
+		self.captured: "bool" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_var_stmt(self)
 
 class WhileStmt(Stmt):
+	__slots__ = ('condition', 'body', 'iterations', 'compiled', 'can_call', )
+
 	def __init__(self, condition: "Expr", body: "Stmt", ):
 		self.condition = condition
 		self.body = body
+		self.iterations: "int" = None
+		self.compiled: "StmtFn" = None
+		self.can_call: "bool" = None
 	def accept(self, visitor: "StmtVisitor"):
 		return visitor.visit_while_stmt(self)
 
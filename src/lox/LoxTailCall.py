@@ -0,0 +1,12 @@
+class LoxTailCall:
+    """
+    Completion of a return statement whose value is a call to a Lox function (return f(...);). Instead of calling f
+    from inside the returning function, the function's call loop runs f in its place, so tail recursion doesn't grow
+    the Python stack.
+    """
+
+    __slots__ = ('function', 'arguments')
+
+    def __init__(self, function: "LoxFunction", arguments: list[object]):
+        self.function = function
+        self.arguments = arguments
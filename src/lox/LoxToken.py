@@ -63,6 +63,8 @@ class TokenType(Enum):
 
 
 class LoxToken:
+    __slots__ = ('t_type', 'lexeme', 'literal', 'line')
+
     def __init__(self, t_type: TokenType, lexeme: str, literal: object, line: int):
         self.t_type = t_type
         self.lexeme = lexeme
@@ -0,0 +1,73 @@
+import sys
+from array import array
+
+from lox.LoxToken import LoxToken, TokenType
+
+TOKEN_TYPES = (None, *TokenType)  # TokenType by value, which is what the buffer stores
+
+
+class TokenBuffer:
+    """
+    The tokens of a source, stored as a struct of arrays rather than a LoxToken each: every token takes a byte for
+    its type and four bytes each for where it starts and ends in the source and for its line. Lexemes and literals
+    are only cut out of the source when asked for, and LoxTokens only made for the tokens the parser keeps in the AST
+    (names, operators, ...), so punctuation and keywords never get an object.
+    """
+
+    __slots__ = ('source', 'types', 'starts', 'ends', 'lines')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.types = array('B')  # TokenType values
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def add(self, t_type: TokenType, start: int, end: int, line: int):
+        """
+        Add a token to the end of the buffer.
+        :param t_type: TokenType of the token
+        :param start: Offset of the token's first character in the source
+        :param end: Offset just past its last character
+        :param line: Line the token is on
+        """
+        self.types.append(t_type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def t_type(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def lexeme(self, index: int) -> str:
+        """
+        Get the text of a token. Every use of a name shares one string.
+        :param index: Index of the token
+        :return: The lexeme
+        """
+        return sys.intern(self.source[self.starts[index]:self.ends[index]])
+
+    def literal(self, index: int) -> object:
+        """
+        Get the value of a number or string token.
+        :param index: Index of the token
+        :return: The value, or None for other tokens
+        """
+        t_type = TOKEN_TYPES[self.types[index]]
+        if t_type is TokenType.NUMBER: return float(self.source[self.starts[index]:self.ends[index]])
+        if t_type is TokenType.STRING: return self.source[self.starts[index] + 1:self.ends[index] - 1]
+        return None
+
+    def token(self, index: int) -> LoxToken:
+        """
+        Make a LoxToken for a token, for nodes of the AST to keep.
+        :param index: Index of the token
+        :return: The LoxToken
+        """
+        return LoxToken(TOKEN_TYPES[self.types[index]], self.lexeme(index), self.literal(index), self.lines[index])
+
+    def __iter__(self):
+        return (self.token(index) for index in range(len(self.types)))
@@ -0,0 +1,780 @@
+import operator
+from typing import Callable
+
+from lox.LoxCallable import LoxCallable
+from lox.LoxClass import LoxClass
+from lox.LoxEnvironment import UNDEFINED, Cell
+from lox.LoxExpr import *
+from lox.LoxFunction import LoxFunction
+from lox.LoxTailCall import LoxTailCall
+from lox.LoxInstance import LoxInstance
+from lox.LoxRuntimeError import LoxRuntimeError
+from lox.LoxStmt import *
+from lox.LoxToken import TokenType as TT
+from run.Interpreter import Interpreter
+from run.Resolver import VariableAccess
+
+ExprFn = Callable[[list, list[Cell]], object]  # called with the current frame and upvalues
+StmtFn = Callable[[list, list[Cell]], "tuple[object] | None"]  # returns (value,) when a return statement ran
+
+NUMBERS_MESSAGE = "Both Operands must be numbers."
+
+
+class CompiledLoxFunction(LoxFunction):
+    """
+    LoxFunction whose body has been compiled into a closure.
+    """
+
+    __slots__ = ('body',)
+
+    def __init__(self, declaration: FunctionStmt, upvalues: list[Cell], is_initializer: bool, body: StmtFn,
+                 instance: "LoxInstance" = None):
+        super().__init__(declaration, upvalues, is_initializer, instance)
+        self.body = body
+
+    def bind(self, instance: "LoxInstance"):
+        return CompiledLoxFunction(self.declaration, self.upvalues, self.is_initializer, self.body, instance)
+
+    def call(self, interpreter: "Interpreter", arguments: list[object], instance: "LoxInstance" = None) -> object:
+        function = self
+        if instance is None: instance = self.instance
+        while True:  # runs again for each tail call the body ends with
+            declaration = function.declaration
+            frame = arguments  # parameters take the first slots, followed by 'this' for methods
+            if declaration.frame_size > len(arguments): frame += [None] * (declaration.frame_size - len(arguments))
+            if instance is not None: frame[len(declaration.params)] = instance
+            for slot in declaration.cells:
+                frame[slot] = Cell(frame[slot])
+
+            result = function.body(frame, function.upvalues)
+
+            if type(result) is not LoxTailCall: break
+            function, arguments = result.function, result.arguments
+            instance = function.instance
+
+        if function.is_initializer: return instance
+        return None if result is None else result[0]
+
+
+class ClosureCompiler(ExprVisitor, StmtVisitor):
+    """
+    Compiles each node once into a Python closure specialized for that node, using the resolver's frame slots and
+    upvalues for variable access. Running the closures skips the accept()/visit dispatch of the
+    tree-walking interpreter.
+    """
+
+    numeric_ops = {
+        TT.MINUS: operator.sub, TT.MINUS_EQUAL: operator.sub, TT.MINUS_MINUS: operator.sub,
+        TT.STAR: operator.mul, TT.STAR_EQUAL: operator.mul,
+        TT.CARAT: operator.pow,
+        TT.GREATER: operator.gt,
+        TT.GREATER_EQUAL: operator.ge,
+        TT.LESS: operator.lt,
+        TT.LESS_EQUAL: operator.le,
+    }
+
+    function_type = CompiledLoxFunction  # what compile_new_function makes, which tail calls are left to the caller for
+
+    def __init__(self, interpreter: "ClosureInterpreter"):
+        self.interpreter = interpreter
+
+    def compile_stmt(self, stmt: Stmt) -> StmtFn:
+        return stmt.accept(self)
+
+    def compile_expr(self, expr: Expr) -> ExprFn:
+        return expr.accept(self)
+
+    # --------- Stmt Visitor Methods ---------
+    def visit_block_stmt(self, stmt: "BlockStmt") -> StmtFn:
+        body = self.compile_sequence(stmt.statements)
+
+        if stmt.frame_size is not None:  # block in top level code, which has no frame of its own
+            frame_size = stmt.frame_size
+
+            def frame_block(frame, upvalues):
+                return body([None] * frame_size, upvalues)
+
+            return frame_block
+
+        return body
+
+    def visit_class_stmt(self, stmt: "ClassStmt") -> StmtFn:
+        name = stmt.name.lexeme
+        superclass_fn = self.compile_expr(stmt.superclass) if stmt.superclass else None
+        super_slot, frame_size = stmt.super_slot, stmt.frame_size
+        methods = [(method.name.lexeme, self.compile_capture(method),
+                    self.compile_new_function(method, method.name.lexeme == 'init'))
+                   for method in stmt.methods]
+
+        def make_class(frame, upvalues):
+            superclass = None
+            if superclass_fn:
+                superclass = superclass_fn(frame, upvalues)
+                if not isinstance(superclass, LoxClass):
+                    raise LoxRuntimeError(stmt.superclass.name, "Superclass must be a class.")
+
+                if frame_size is not None: frame = [None] * frame_size  # class in top level code
+                frame[super_slot] = Cell(superclass)
+
+            return LoxClass(name, superclass, {
+                method_name: new_function(capture(frame, upvalues)) for method_name, capture, new_function in methods
+            })
+
+        return self.compile_define(stmt, make_class)
+
+    def visit_expression_stmt(self, stmt: "ExpressionStmt") -> StmtFn:
+        expression = self.compile_expr(stmt.expression)
+
+        def expression_stmt(frame, upvalues):
+            expression(frame, upvalues)
+
+        return expression_stmt
+
+    def visit_for_stmt(self, stmt: "ForStmt") -> StmtFn:
+        loop = self.compile_for_loop(stmt)
+        if not stmt.initializer: return loop
+        initializer = self.compile_stmt(stmt.initializer)
+
+        def for_(frame, upvalues):
+            initializer(frame, upvalues)
+            return loop(frame, upvalues)
+
+        return for_
+
+    def visit_function_stmt(self, stmt: "FunctionStmt") -> StmtFn:
+        capture = self.compile_capture(stmt)
+        new_function = self.compile_new_function(stmt, False)
+
+        def make_function(frame, upvalues):
+            return new_function(capture(frame, upvalues))
+
+        return self.compile_define(stmt, make_function)
+
+    def visit_if_stmt(self, stmt: "IfStmt") -> StmtFn:
+        condition = self.compile_expr(stmt.condition)
+        then_branch = self.compile_stmt(stmt.thenBranch)
+
+        if not stmt.elseBranch:
+            def if_(frame, upvalues):
+                value = condition(frame, upvalues)
+                if value is not None and value is not False: return then_branch(frame, upvalues)
+
+            return if_
+
+        else_branch = self.compile_stmt(stmt.elseBranch)
+
+        def if_else(frame, upvalues):
+            value = condition(frame, upvalues)
+            if value is not None and value is not False: return then_branch(frame, upvalues)
+            return else_branch(frame, upvalues)
+
+        return if_else
+
+    def visit_return_stmt(self, stmt: "ReturnStmt") -> StmtFn:
+        if not stmt.value:
+            return lambda frame, upvalues: (None,)
+
+        if stmt.tail_call:
+            call = self.compile_call(stmt.value, tail=True)
+
+            def tail_return(frame, upvalues):
+                result = call(frame, upvalues)
+                return result if type(result) is LoxTailCall else (result,)
+
+            return tail_return
+
+        value = self.compile_expr(stmt.value)
+
+        def return_(frame, upvalues):
+            return (value(frame, upvalues),)
+
+        return return_
+
+    def visit_var_stmt(self, stmt: "VarStmt") -> StmtFn:
+        return self.compile_define(stmt, self.compile_expr(stmt.initializer or LiteralExpr(None)))
+
+    def visit_while_stmt(self, stmt: "WhileStmt") -> StmtFn:
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+
+        def while_(frame, upvalues):
+            while True:
+                value = condition(frame, upvalues)
+                if value is None or value is False: return None
+                result = body(frame, upvalues)
+                if result is not None: return result
+
+        return while_
+
+    # -------- Expr Visitor methods ---------
+    def visit_access_expr(self, expr: "AccessExpr") -> ExprFn:
+        index_list = self.compile_indexing(expr)
+
+        def access(frame, upvalues):
+            lst, index = index_list(frame, upvalues)
+            return lst[index]
+
+        return access
+
+    def visit_assign_expr(self, expr: "AssignExpr") -> ExprFn:
+        value_fn = self.compile_expr(expr.value)
+        name = expr.name.lexeme
+        slot = expr.slot
+
+        match expr.access:
+            case VariableAccess.FRAME:
+                def assign_local(frame, upvalues):
+                    value = frame[slot] = value_fn(frame, upvalues)
+                    return value
+
+                return assign_local
+            case VariableAccess.CELL:
+                def assign_cell(frame, upvalues):
+                    value = frame[slot].value = value_fn(frame, upvalues)
+                    return value
+
+                return assign_cell
+            case VariableAccess.UPVALUE:
+                def assign_upvalue(frame, upvalues):
+                    value = upvalues[slot].value = value_fn(frame, upvalues)
+                    return value
+
+                return assign_upvalue
+
+        token = expr.name
+        values = self.interpreter.globals.values
+
+        def assign_global(frame, upvalues):
+            value = value_fn(frame, upvalues)
+            if slot >= len(values) or values[slot] is UNDEFINED:
+                raise LoxRuntimeError(token, f"Undefined variable '{name}'.")
+            values[slot] = value
+            return value
+
+        return assign_global
+
+    def visit_binary_expr(self, expr: "BinaryExpr") -> ExprFn:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+        token = expr.operator
+        t_type = token.t_type
+        constant = self.float_constant(expr.right)
+
+        if t_type in (TT.PLUS, TT.PLUS_EQUAL, TT.PLUS_PLUS):
+            add = self.add
+            if constant is not None:
+                def add_constant(frame, upvalues):
+                    value = left(frame, upvalues)
+                    if type(value) is float: return value + constant
+                    return add(token, value, constant)
+
+                return add_constant
+
+            def plus(frame, upvalues):
+                left_value = left(frame, upvalues)
+                right_value = right(frame, upvalues)
+                if type(left_value) is float and type(right_value) is float: return left_value + right_value
+                return add(token, left_value, right_value)
+
+            return plus
+
+        if t_type in (TT.SLASH, TT.SLASH_EQUAL):
+            def divide(frame, upvalues):
+                left_value = left(frame, upvalues)
+                right_value = right(frame, upvalues)
+                if type(left_value) is not float or type(right_value) is not float:
+                    raise LoxRuntimeError(token, NUMBERS_MESSAGE)
+                if right_value == 0: raise LoxRuntimeError(token, "Cannot divide by 0.")
+                return left_value / right_value
+
+            return divide
+
+        if t_type == TT.EQUAL_EQUAL:
+            return lambda frame, upvalues: left(frame, upvalues) == right(frame, upvalues)
+
+        if t_type == TT.BANG_EQUAL:
+            return lambda frame, upvalues: left(frame, upvalues) != right(frame, upvalues)
+
+        op = self.numeric_ops[t_type]
+
+        if constant is not None:
+            def numeric_constant(frame, upvalues):
+                value = left(frame, upvalues)
+                if type(value) is float: return op(value, constant)
+                raise LoxRuntimeError(token, NUMBERS_MESSAGE)
+
+            return numeric_constant
+
+        def numeric(frame, upvalues):
+            left_value = left(frame, upvalues)
+            right_value = right(frame, upvalues)
+            if type(left_value) is float and type(right_value) is float: return op(left_value, right_value)
+            raise LoxRuntimeError(token, NUMBERS_MESSAGE)
+
+        return numeric
+
+    def visit_call_expr(self, expr: "CallExpr") -> ExprFn:
+        return self.compile_call(expr)
+
+    def visit_get_expr(self, expr: "GetExpr") -> ExprFn:
+        object_fn = self.compile_expr(expr.object)
+        name = expr.name
+        lexeme = name.lexeme
+        cached_shape = cached_offset = cached_method = None  # inline cache of the shape seen last time
+
+        def get(frame, upvalues):
+            nonlocal cached_shape, cached_offset, cached_method
+            obj = object_fn(frame, upvalues)
+            if not isinstance(obj, LoxInstance): raise LoxRuntimeError(name, "Only instances have properties.")
+
+            shape = obj.shape
+            if shape is not cached_shape:
+                cached_shape = shape
+                cached_offset, cached_method = shape.find(lexeme)
+
+            if cached_offset is not None: return obj.values[cached_offset]
+            if cached_method: return cached_method.bind(obj)
+            raise LoxRuntimeError(name, f"Undefined property {lexeme}.")
+
+        return get
+
+    def visit_grouping_expr(self, expr: "GroupingExpr") -> ExprFn:
+        return self.compile_expr(expr.expression)
+
+    def visit_list_expr(self, expr: "ListExpr") -> ExprFn:
+        items = [self.compile_expr(item) for item in expr.items]
+
+        def list_(frame, upvalues):
+            return [item(frame, upvalues) for item in items]
+
+        return list_
+
+    def visit_listassign_expr(self, expr: "ListAssignExpr") -> ExprFn:
+        index_list = self.compile_indexing(expr)
+        value_fn = self.compile_expr(expr.value)
+
+        def list_assign(frame, upvalues):
+            lst, index = index_list(frame, upvalues)
+            lst[index] = value_fn(frame, upvalues)
+            return lst
+
+        return list_assign
+
+    def visit_literal_expr(self, expr: "LiteralExpr") -> ExprFn:
+        value = expr.value
+        return lambda frame, upvalues: value
+
+    def visit_logical_expr(self, expr: "LogicalExpr") -> ExprFn:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if expr.operator.t_type == TT.OR:
+            def or_(frame, upvalues):
+                value = left(frame, upvalues)
+                if value is not None and value is not False: return value
+                return right(frame, upvalues)
+
+            return or_
+
+        def and_(frame, upvalues):
+            value = left(frame, upvalues)
+            if value is None or value is False: return value
+            return right(frame, upvalues)
+
+        return and_
+
+    def visit_set_expr(self, expr: "SetExpr") -> ExprFn:
+        object_fn = self.compile_expr(expr.object)
+        value_fn = self.compile_expr(expr.value)
+        name = expr.name
+        lexeme = name.lexeme
+        cached_shape = cached_offset = cached_transition = None  # inline cache of the shape seen last time
+
+        def set_(frame, upvalues):
+            nonlocal cached_shape, cached_offset, cached_transition
+            obj = object_fn(frame, upvalues)
+            if not isinstance(obj, LoxInstance): raise LoxRuntimeError(name, "Only instances have fields.")
+
+            value = value_fn(frame, upvalues)
+            shape = obj.shape  # only looked at now, evaluating the value could have added fields
+            if shape is not cached_shape:
+                cached_shape = shape
+                cached_offset, cached_transition = shape.place(lexeme)
+
+            if cached_transition is None:
+                obj.values[cached_offset] = value
+            else:  # a new field, which goes at the end
+                obj.shape = cached_transition
+                obj.values.append(value)
+            return value
+
+        return set_
+
+    def visit_super_expr(self, expr: "SuperExpr") -> ExprFn:
+        superclass_fn = self.compile_variable(expr, expr.keyword)
+        this_fn = self.compile_expr(expr.this)
+        method_token = expr.method
+        method_name = method_token.lexeme
+        cached_class = cached_method = None  # inline cache, only misses when the class declaration runs again
+
+        def super_(frame, upvalues):
+            nonlocal cached_class, cached_method
+            superclass: LoxClass = superclass_fn(frame, upvalues)
+            if superclass is not cached_class:
+                cached_class, cached_method = superclass, superclass.find_method(method_name)
+
+            if not cached_method: raise LoxRuntimeError(method_token, f"Undefined property '{method_name}'.")
+            return cached_method.bind(this_fn(frame, upvalues))
+
+        return super_
+
+    def visit_this_expr(self, expr: "ThisExpr") -> ExprFn:
+        return self.compile_variable(expr, expr.keyword)
+
+    def visit_unary_expr(self, expr: "UnaryExpr") -> ExprFn:
+        right = self.compile_expr(expr.right)
+        token = expr.operator
+
+        match token.t_type:
+            case TT.MINUS:
+                def negate(frame, upvalues):
+                    value = right(frame, upvalues)
+                    if type(value) is float: return -value
+                    raise LoxRuntimeError(token, "Operand must be a number.")
+
+                return negate
+            case TT.BANG:
+                def not_(frame, upvalues):
+                    value = right(frame, upvalues)
+                    return value is None or value is False
+
+                return not_
+            case TT.PLUS_PLUS | TT.MINUS_MINUS:
+                # only desugared at the start of an expression, elsewhere they evaluate their operand to nil as in
+                # Interpreter.unary_operation
+                def crement(frame, upvalues):
+                    right(frame, upvalues)
+
+                return crement
+
+    def visit_variable_expr(self, expr: "VariableExpr") -> ExprFn:
+        return self.compile_variable(expr, expr.name)
+
+    # ------------- Helper methods ----------
+    def compile_sequence(self, statements: list[Stmt]) -> StmtFn:
+        """
+        Compile statements which run one after the other in the same environment.
+        :param statements: Statements to compile
+        :return: Closure running all of them, stopping early at a return
+        """
+        compiled = [self.compile_stmt(statement) for statement in statements]
+
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def sequence(frame, upvalues):
+            for statement in compiled:
+                result = statement(frame, upvalues)
+                if result is not None: return result
+
+        return sequence
+
+    def compile_function(self, function: FunctionStmt) -> StmtFn:
+        """
+        Compile a function body once, no matter how many times its declaration runs, keeping it on the FunctionStmt.
+        :param function: FunctionStmt to compile
+        :return: The compiled body
+        """
+        if function.compiled is None:
+            if function.lazy is not None: function.lazy.parse(function)
+            function.compiled = self.compile_sequence(function.body)
+        return function.compiled
+
+    def compile_for_loop(self, stmt: ForStmt) -> StmtFn:
+        """
+        Compile the loop of a for statement, without its initializer. Counting loops keep their count in a Python
+        float like Interpreter.run_counting_loop does.
+        :param stmt: ForStmt to compile
+        :return: Closure running the loop, once the initializer has run
+        """
+        condition = self.compile_expr(stmt.condition)
+        body = self.compile_stmt(stmt.body)
+        increment = self.compile_expr(stmt.increment) if stmt.increment else None
+
+        def for_loop(frame, upvalues):
+            while True:
+                value = condition(frame, upvalues)
+                if value is None or value is False: return None
+                result = body(frame, upvalues)
+                if result is not None: return result
+                if increment is not None: increment(frame, upvalues)
+
+        if stmt.step is None: return for_loop
+
+        slot, captured, step = stmt.initializer.slot, stmt.initializer.captured, stmt.step
+        comparison = stmt.condition
+        compare = self.numeric_ops[comparison.operator.t_type]
+        bound = self.compile_expr(comparison.right)
+        interpreter = self.interpreter
+
+        def counting_loop(frame, upvalues):
+            cell = frame[slot] if captured else None
+            count = frame[slot] if cell is None else cell.value
+            if type(count) is not float: return for_loop(frame, upvalues)  # counting something else
+
+            while True:
+                limit = bound(frame, upvalues)
+                if type(limit) is float:
+                    if not compare(count, limit): return None
+                elif not interpreter.binary_operation(comparison, count, limit):  # reports non-numbers
+                    return None
+
+                result = body(frame, upvalues)
+                if result is not None: return result
+
+                count += step
+                if cell is None:
+                    frame[slot] = count
+                else:
+                    cell.value = count
+
+        return counting_loop
+
+    def compile_new_function(self, function: FunctionStmt, is_initializer: bool) -> Callable[[list[Cell]], LoxFunction]:
+        """
+        Compile the creation of the functions a declaration makes each time it runs.
+        :param function: FunctionStmt of the function or method
+        :param is_initializer: Whether the function is an init method
+        :return: Closure making a function from the cells it captured
+        """
+        body = self.compile_function(function)
+        return lambda upvalues: CompiledLoxFunction(function, upvalues, is_initializer, body)
+
+    def compile_call(self, expr: CallExpr, tail: bool = False) -> ExprFn:
+        """
+        Compile a call, checking the common callee kinds directly rather than going through the LoxCallable protocol.
+        :param expr: CallExpr to compile
+        :param tail: Whether the call is the value of a return, so calls to Lox functions are left to the caller
+        :return: Closure making the call, which for tail calls to Lox functions returns a LoxTailCall instead
+        """
+        argument_fns = [self.compile_expr(argument) for argument in expr.arguments]
+        num_args = len(argument_fns)
+        paren = expr.paren
+        interpreter = self.interpreter
+
+        match argument_fns:
+            case []:
+                def arguments(frame, upvalues): return []
+            case [first]:
+                def arguments(frame, upvalues): return [first(frame, upvalues)]
+            case [first, second]:
+                def arguments(frame, upvalues): return [first(frame, upvalues), second(frame, upvalues)]
+            case _:
+                def arguments(frame, upvalues): return [argument(frame, upvalues) for argument in argument_fns]
+
+        callee_expr = expr.callee
+        if type(callee_expr) is GetExpr and not tail:
+            object_fn = self.compile_expr(callee_expr.object)
+            name = callee_expr.name
+            lexeme = name.lexeme
+            cached_shape = cached_offset = cached_method = None  # inline cache of the shape seen last time
+
+            def method_call(frame, upvalues):  # obj.method(...) hands obj straight to the method rather than binding it
+                nonlocal cached_shape, cached_offset, cached_method
+                obj = object_fn(frame, upvalues)
+                if not isinstance(obj, LoxInstance): raise LoxRuntimeError(name, "Only instances have properties.")
+
+                shape = obj.shape
+                if shape is not cached_shape:
+                    cached_shape = shape
+                    cached_offset, cached_method = shape.find(lexeme)
+
+                if cached_offset is not None:
+                    return interpreter.call(expr, obj.values[cached_offset], arguments(frame, upvalues))
+                if not cached_method: raise LoxRuntimeError(name, f"Undefined property {lexeme}.")
+                args = arguments(frame, upvalues)
+
+                arity = len(cached_method.declaration.params)
+                if num_args != arity:
+                    raise LoxRuntimeError(paren, f"Expected {arity} arguments but got {num_args}.")
+
+                try:
+                    return cached_method.call(interpreter, args, obj)
+                except LoxRuntimeError as call_error:
+                    call_error.token = paren  # errors are reported at the outermost call
+                    raise
+
+            return method_call
+
+        callee_fn = self.compile_expr(callee_expr)
+        function_type = self.function_type
+
+        def call(frame, upvalues):
+            callee = callee_fn(frame, upvalues)
+            args = arguments(frame, upvalues)
+
+            callee_type = type(callee)
+            if callee_type is function_type:
+                arity = len(callee.declaration.params)
+                if tail and num_args == arity: return LoxTailCall(callee, args)
+            elif callee_type is LoxClass:
+                initializer = callee.initializer
+                arity = 0 if initializer is None else len(initializer.declaration.params)
+            elif isinstance(callee, LoxCallable):  # native functions
+                arity = callee.arity()
+            else:
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+            if num_args != arity:
+                raise LoxRuntimeError(paren, f"Expected {arity} arguments but got {num_args}.")
+
+            try:
+                return callee.call(interpreter, args)
+            except LoxRuntimeError as call_error:
+                call_error.token = paren  # errors are reported at the outermost call
+                raise
+
+        return call
+
+    def compile_define(self, declaration: ClassStmt | FunctionStmt | VarStmt, value_fn: ExprFn) -> StmtFn:
+        """
+        Compile defining a declared variable wherever the resolver put it.
+        :param declaration: Statement declaring the variable
+        :param value_fn: Closure computing the variable's value
+        :return: Closure defining the variable
+        """
+        slot = declaration.slot
+
+        if declaration.captured:
+            def define_cell(frame, upvalues):
+                cell = frame[slot] = Cell(None)  # created first, so functions and classes can capture themselves
+                cell.value = value_fn(frame, upvalues)
+
+            return define_cell
+
+        if slot is not None:
+            def define_local(frame, upvalues):
+                frame[slot] = value_fn(frame, upvalues)
+
+            return define_local
+
+        globals_ = self.interpreter.globals
+        name = declaration.name.lexeme
+
+        def define_global(frame, upvalues):
+            globals_.define(name, value_fn(frame, upvalues))
+
+        return define_global
+
+    @classmethod
+    def compile_capture(cls, function: FunctionStmt) -> Callable[[list, list[Cell]], list[Cell]]:
+        """
+        Compile collecting the cells a function uses from its enclosing functions.
+        :param function: FunctionStmt to collect upvalues for
+        :return: Closure returning the function's upvalues
+        """
+        captures = function.upvalues
+
+        if not captures:
+            return lambda frame, upvalues: []
+
+        def capture(frame, upvalues):
+            return [frame[index] if from_frame else upvalues[index] for from_frame, index in captures]
+
+        return capture
+
+    def compile_variable(self, expr: SuperExpr | ThisExpr | VariableExpr, name: "LoxToken") -> ExprFn:
+        """
+        Compile a variable read into a direct access to where the resolver found it.
+        :param expr: SuperExpr, ThisExpr or VariableExpr
+        :param name: Token holding the variable name
+        """
+        slot = expr.slot
+
+        match expr.access:
+            case VariableAccess.FRAME:
+                return lambda frame, upvalues: frame[slot]
+            case VariableAccess.CELL:
+                return lambda frame, upvalues: frame[slot].value
+            case VariableAccess.UPVALUE:
+                return lambda frame, upvalues: upvalues[slot].value
+
+        values = self.interpreter.globals.values
+        lexeme = name.lexeme
+
+        def global_variable(frame, upvalues):
+            try:
+                value = values[slot]
+                if value is not UNDEFINED: return value
+            except IndexError:  # named after the globals last grew, so not defined either
+                pass
+
+            raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'.")
+
+        return global_variable
+
+    def compile_indexing(self, expr: AccessExpr | ListAssignExpr) -> Callable[[list, list[Cell]], tuple[list, int]]:
+        """
+        Compile the list and index of an indexing expression along with the interpreter's checks.
+        """
+        list_fn = self.compile_expr(expr.lst)
+        index_fn = self.compile_expr(expr.index)
+        name = expr.name
+
+        def index_list(frame, upvalues):
+            lst = list_fn(frame, upvalues)
+            if not isinstance(lst, list):
+                raise LoxRuntimeError(name, "Can only access index of lists.")
+
+            index = index_fn(frame, upvalues)
+            if not (isinstance(index, float) and index.is_integer()):
+                raise LoxRuntimeError(name, "Can only index with a whole number.")
+
+            length = len(lst)
+            if index >= length or index < -length:
+                raise LoxRuntimeError(name, "List index out of range.")
+
+            return lst, int(index)
+
+        return index_list
+
+    @classmethod
+    def add(cls, token: "LoxToken", left: object, right: object) -> object:
+        """
+        Addition for anything other than two numbers: lists append, strings concatenate.
+        """
+        if isinstance(left, float) and isinstance(right, float):
+            return left + right
+        if isinstance(left, list):
+            return left + [right]
+        if isinstance(left, str) or isinstance(right, str):
+            return Interpreter.stringify(left) + Interpreter.stringify(right)
+        raise LoxRuntimeError(token, "Unsupported types for addition.")
+
+    @classmethod
+    def float_constant(cls, expr: Expr) -> float | None:
+        """
+        :return: The value of expr if it is a number literal, else None
+        """
+        if isinstance(expr, LiteralExpr) and type(expr.value) is float:
+            return expr.value
+        return None
+
+
+class ClosureInterpreter(Interpreter):
+    """
+    Interpreter which compiles every statement into closures before running it.
+    """
+
+    def interpret(self, statements: list[Stmt], repl: bool = False):
+        compiler = ClosureCompiler(self)
+        try:
+            for stmt in statements:
+                if repl and isinstance(stmt, ExpressionStmt):
+                    value = compiler.compile_expr(stmt.expression)(None, [])
+                    if value is not None: print(self.stringify(value))  # print the return of expressions in repl
+                else:
+                    compiler.compile_stmt(stmt)(None, [])
+        except LoxRuntimeError as error:
+            from lox.Lox import Lox
+            Lox.runtime_error(error)
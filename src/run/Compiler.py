@@ -0,0 +1,439 @@
+from lox.LoxChunk import Chunk, OpCode as Op
+from lox.LoxClosure import LoxFunctionProto
+from lox.LoxExpr import *
+from lox.LoxStmt import *
+from lox.LoxToken import TokenType as TT
+from run.Resolver import FunctionType
+
+
+class Local:
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class FunctionState:
+    """
+    Compile-time state for the function currently being compiled.
+    """
+
+    def __init__(self, enclosing: "FunctionState | None", function: LoxFunctionProto, f_type: FunctionType):
+        self.enclosing = enclosing
+        self.function = function
+        self.f_type = f_type
+        self.scope_depth = 0
+
+        # slot 0 holds the callee, or the receiver for methods
+        is_method = f_type in (FunctionType.METHOD, FunctionType.INITIALIZER)
+        self.locals: list[Local] = [Local('this' if is_method else '', 0)]
+
+
+class Compiler(ExprVisitor, StmtVisitor):
+    """
+    Compiles resolved statements into bytecode for the VM. Locals live in stack slots and captured variables are
+    accessed through upvalues, like in clox.
+    """
+
+    binary_ops = {
+        TT.MINUS: Op.SUBTRACT, TT.MINUS_EQUAL: Op.SUBTRACT, TT.MINUS_MINUS: Op.SUBTRACT,
+        TT.SLASH: Op.DIVIDE, TT.SLASH_EQUAL: Op.DIVIDE,
+        TT.STAR: Op.MULTIPLY, TT.STAR_EQUAL: Op.MULTIPLY,
+        TT.CARAT: Op.POWER,
+        TT.PLUS: Op.ADD, TT.PLUS_EQUAL: Op.ADD, TT.PLUS_PLUS: Op.ADD,
+        TT.GREATER: Op.GREATER,
+        TT.GREATER_EQUAL: Op.GREATER_EQUAL,
+        TT.LESS: Op.LESS,
+        TT.LESS_EQUAL: Op.LESS_EQUAL,
+        TT.EQUAL_EQUAL: Op.EQUAL,
+        TT.BANG_EQUAL: Op.NOT_EQUAL,
+    }
+
+    def __init__(self):
+        self.state: FunctionState | None = None
+
+    def compile(self, statements: list[Stmt], repl: bool = False) -> LoxFunctionProto:
+        """
+        Compile a program into the function for its top level script.
+        :param statements: Resolved statements to compile
+        :param repl: Whether to print the value of top level expression statements
+        :return: Compiled script function
+        """
+        self.state = FunctionState(None, LoxFunctionProto('script'), FunctionType.NONE)
+
+        for stmt in statements:
+            if repl and isinstance(stmt, ExpressionStmt):
+                self.compile_expr(stmt.expression)
+                self.emit(Op.PRINT_EXPR)
+            else:
+                self.compile_stmt(stmt)
+
+        self.emit_return()
+        return self.state.function
+
+    # --------- Stmt Visitor Methods ---------
+    def visit_block_stmt(self, stmt: "BlockStmt"):
+        self.begin_scope()
+        for statement in stmt.statements:
+            self.compile_stmt(statement)
+        self.end_scope()
+
+    def visit_class_stmt(self, stmt: "ClassStmt"):
+        name = stmt.name.lexeme
+
+        slot = None
+        if self.state.scope_depth > 0:
+            self.emit(Op.NIL)  # reserve the class's slot below the 'super' slot
+            slot = self.add_local(name)
+
+        if stmt.superclass:
+            self.compile_expr(stmt.superclass)
+            self.begin_scope()
+            self.add_local('super')
+
+        self.emit(Op.CLASS, self.chunk().add_constant(name), stmt.name)
+
+        if stmt.superclass:
+            self.emit(Op.INHERIT, 0, stmt.superclass.name)
+
+        for method in stmt.methods:
+            f_type = FunctionType.INITIALIZER if method.name.lexeme == 'init' else FunctionType.METHOD
+            self.compile_function(method, f_type)
+            self.emit(Op.METHOD, self.chunk().add_constant(method.name.lexeme))
+
+        if slot is None:
+            self.emit(Op.DEFINE_GLOBAL, self.chunk().add_constant(name), stmt.name)
+        else:
+            self.emit(Op.SET_LOCAL, slot)
+            self.emit(Op.POP)
+
+        if stmt.superclass: self.end_scope()
+
+    def visit_expression_stmt(self, stmt: "ExpressionStmt"):
+        self.compile_expr(stmt.expression)
+        self.emit(Op.POP)
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: self.compile_stmt(stmt.initializer)
+        self.compile_loop(stmt.condition, stmt.body, stmt.increment)
+
+    def visit_function_stmt(self, stmt: "FunctionStmt"):
+        if self.state.scope_depth > 0:
+            self.add_local(stmt.name.lexeme)  # declared first so the function can refer to itself
+            self.compile_function(stmt, FunctionType.FUNCTION)
+        else:
+            self.compile_function(stmt, FunctionType.FUNCTION)
+            self.emit(Op.DEFINE_GLOBAL, self.chunk().add_constant(stmt.name.lexeme), stmt.name)
+
+    def visit_if_stmt(self, stmt: "IfStmt"):
+        self.compile_expr(stmt.condition)
+        then_jump = self.emit(Op.POP_JUMP_IF_FALSE)
+        self.compile_stmt(stmt.thenBranch)
+
+        if stmt.elseBranch:
+            else_jump = self.emit(Op.JUMP)
+            self.patch_jump(then_jump)
+            self.compile_stmt(stmt.elseBranch)
+            self.patch_jump(else_jump)
+        else:
+            self.patch_jump(then_jump)
+
+    def visit_return_stmt(self, stmt: "ReturnStmt"):
+        if stmt.value:
+            self.compile_expr(stmt.value)
+            self.emit(Op.RETURN)
+        else:
+            self.emit_return()
+
+    def visit_var_stmt(self, stmt: "VarStmt"):
+        if stmt.initializer:
+            self.compile_expr(stmt.initializer)
+        else:
+            self.emit(Op.NIL)
+
+        if self.state.scope_depth > 0:
+            self.add_local(stmt.name.lexeme)  # the value is already sitting in the new slot
+        else:
+            self.emit(Op.DEFINE_GLOBAL, self.chunk().add_constant(stmt.name.lexeme), stmt.name)
+
+    def visit_while_stmt(self, stmt: "WhileStmt"):
+        self.compile_loop(stmt.condition, stmt.body)
+
+    # -------- Expr Visitor methods ---------
+    def visit_access_expr(self, expr: "AccessExpr"):
+        self.compile_expr(expr.lst)
+        if not self.is_pure(expr.index):
+            self.emit(Op.CHECK_LIST, 0, expr.name)
+        self.compile_expr(expr.index)
+        self.emit(Op.INDEX_GET, 0, expr.name)
+
+    def visit_assign_expr(self, expr: "AssignExpr"):
+        self.compile_expr(expr.value)
+        self.named_variable(expr.name.lexeme, expr.name, assign=True)
+
+    def visit_binary_expr(self, expr: "BinaryExpr"):
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        self.emit(self.binary_ops[expr.operator.t_type], 0, expr.operator)
+
+    def visit_call_expr(self, expr: "CallExpr"):
+        callee = expr.callee
+        if isinstance(callee, GetExpr):  # look the method up without allocating a bound method
+            self.compile_expr(callee.object)
+            self.emit(Op.LOAD_METHOD, self.chunk().add_constant(callee.name.lexeme), callee.name)
+            call_op = Op.CALL_METHOD
+        elif isinstance(callee, SuperExpr):
+            self.named_variable('this', callee.keyword)
+            self.named_variable('super', callee.keyword)
+            self.emit(Op.SUPER_METHOD, self.chunk().add_constant(callee.method.lexeme), callee.method)
+            call_op = Op.CALL_METHOD
+        else:
+            self.compile_expr(callee)
+            call_op = Op.CALL
+
+        for argument in expr.arguments:
+            self.compile_expr(argument)
+
+        self.emit(call_op, len(expr.arguments), expr.paren)
+
+    def visit_get_expr(self, expr: "GetExpr"):
+        self.compile_expr(expr.object)
+        self.emit(Op.GET_PROPERTY, self.chunk().add_constant(expr.name.lexeme), expr.name)
+
+    def visit_grouping_expr(self, expr: "GroupingExpr"):
+        self.compile_expr(expr.expression)
+
+    def visit_list_expr(self, expr: "ListExpr"):
+        for item in expr.items:
+            self.compile_expr(item)
+        self.emit(Op.BUILD_LIST, len(expr.items))
+
+    def visit_listassign_expr(self, expr: "ListAssignExpr"):
+        self.compile_expr(expr.lst)
+        if not self.is_pure(expr.index):
+            self.emit(Op.CHECK_LIST, 0, expr.name)
+        self.compile_expr(expr.index)
+        if not self.is_pure(expr.value):
+            self.emit(Op.CHECK_INDEX, 0, expr.name)
+        self.compile_expr(expr.value)
+        self.emit(Op.INDEX_SET, 0, expr.name)
+
+    def visit_literal_expr(self, expr: "LiteralExpr"):
+        if expr.value is None:
+            self.emit(Op.NIL)
+        elif expr.value is True:
+            self.emit(Op.TRUE)
+        elif expr.value is False:
+            self.emit(Op.FALSE)
+        else:
+            self.emit(Op.CONSTANT, self.chunk().add_constant(expr.value))
+
+    def visit_logical_expr(self, expr: "LogicalExpr"):
+        self.compile_expr(expr.left)
+        end_jump = self.emit(Op.JUMP_IF_TRUE if expr.operator.t_type == TT.OR else Op.JUMP_IF_FALSE)
+        self.emit(Op.POP)
+        self.compile_expr(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_set_expr(self, expr: "SetExpr"):
+        self.compile_expr(expr.object)
+        if not self.is_pure(expr.value):
+            self.emit(Op.CHECK_INSTANCE, 0, expr.name)
+        self.compile_expr(expr.value)
+        self.emit(Op.SET_PROPERTY, self.chunk().add_constant(expr.name.lexeme), expr.name)
+
+    def visit_super_expr(self, expr: "SuperExpr"):
+        self.named_variable('this', expr.keyword)
+        self.named_variable('super', expr.keyword)
+        self.emit(Op.GET_SUPER, self.chunk().add_constant(expr.method.lexeme), expr.method)
+
+    def visit_this_expr(self, expr: "ThisExpr"):
+        self.named_variable('this', expr.keyword)
+
+    def visit_unary_expr(self, expr: "UnaryExpr"):
+        self.compile_expr(expr.right)
+
+        match expr.operator.t_type:
+            case TT.MINUS:
+                self.emit(Op.NEGATE, 0, expr.operator)
+            case TT.BANG:
+                self.emit(Op.NOT)
+            case _:  # the tree-walker evaluates prefix ++/-- in unary position to nil
+                self.emit(Op.POP)
+                self.emit(Op.NIL)
+
+    def visit_variable_expr(self, expr: "VariableExpr"):
+        self.named_variable(expr.name.lexeme, expr.name)
+
+    def compile_stmt(self, stmt: Stmt):
+        stmt.accept(self)
+
+    def compile_expr(self, expr: Expr):
+        expr.accept(self)
+
+    # ------------- Helper methods ----------
+    def chunk(self) -> Chunk:
+        return self.state.function.chunk
+
+    def emit(self, op: Op, arg: int = 0, token: "LoxToken" = None) -> int:
+        """
+        Write an instruction to the chunk of the function being compiled.
+        :return: Offset of the argument, for patching jumps
+        """
+        return self.chunk().write(op, arg, token)
+
+    def emit_return(self):
+        """
+        Emit an implicit return. Initializers always return 'this'.
+        """
+        if self.state.f_type == FunctionType.INITIALIZER:
+            self.emit(Op.GET_LOCAL, 0)
+        else:
+            self.emit(Op.NIL)
+        self.emit(Op.RETURN)
+
+    def patch_jump(self, offset: int):
+        """
+        Point the jump whose argument is at offset to the next instruction.
+        :param offset: Offset of the jump's argument
+        """
+        code = self.chunk().code
+        code[offset] = len(code)
+
+    def compile_loop(self, condition: Expr, body: Stmt, increment: Expr = None):
+        """
+        Compile a while loop, or the loop of a for statement.
+        :param condition: Expression checked before each iteration
+        :param body: Statement run each iteration
+        :param increment: Expression evaluated after each iteration, if any
+        """
+        loop_start = len(self.chunk().code)
+
+        exit_jump = None
+        always_true = isinstance(condition, LiteralExpr) and condition.value not in (None, False)
+        if not always_true:
+            self.compile_expr(condition)
+            exit_jump = self.emit(Op.POP_JUMP_IF_FALSE)
+
+        self.compile_stmt(body)
+        if increment:
+            self.compile_expr(increment)
+            self.emit(Op.POP)
+        self.emit(Op.JUMP, loop_start)
+
+        if exit_jump is not None: self.patch_jump(exit_jump)
+
+    def compile_function(self, function: FunctionStmt, f_type: FunctionType):
+        """
+        Compile a function declaration and emit the instruction which creates its closure.
+        :param function: FunctionStmt to compile
+        :param f_type: type of function (function, method, etc)
+        """
+        proto = LoxFunctionProto(function.name.lexeme, len(function.params), f_type == FunctionType.INITIALIZER)
+        self.state = FunctionState(self.state, proto, f_type)
+
+        self.begin_scope()
+        for param in function.params:
+            self.add_local(param.lexeme)
+        if function.lazy is not None: function.lazy.parse(function)
+        for stmt in function.body:
+            self.compile_stmt(stmt)
+        self.emit_return()
+
+        self.state = self.state.enclosing
+        self.emit(Op.CLOSURE, self.chunk().add_constant(proto))
+
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        """
+        Leave a scope, discarding its locals and closing the ones captured by closures.
+        """
+        state = self.state
+        state.scope_depth -= 1
+
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            self.emit(Op.CLOSE_UPVALUE if state.locals[-1].is_captured else Op.POP)
+            state.locals.pop()
+
+    def add_local(self, name: str) -> int:
+        """
+        Declare a local in the current scope. Its value is whatever is on top of the stack.
+        :param name: Variable name
+        :return: Stack slot of the local
+        """
+        self.state.locals.append(Local(name, self.state.scope_depth))
+        return len(self.state.locals) - 1
+
+    def named_variable(self, name: str, token: "LoxToken", assign: bool = False):
+        """
+        Emit a read or write of a variable, which is a local, an upvalue or a global.
+        :param name: Variable name
+        :param token: Token to blame for undefined globals
+        :param assign: Whether to store the value on top of the stack instead of reading
+        """
+        arg = self.resolve_local(self.state, name)
+        if arg != -1:
+            self.emit(Op.SET_LOCAL if assign else Op.GET_LOCAL, arg)
+            return
+
+        arg = self.resolve_upvalue(self.state, name)
+        if arg != -1:
+            self.emit(Op.SET_UPVALUE if assign else Op.GET_UPVALUE, arg)
+            return
+
+        self.emit(Op.SET_GLOBAL if assign else Op.GET_GLOBAL, self.chunk().add_constant(name), token)
+
+    @classmethod
+    def resolve_local(cls, state: FunctionState, name: str) -> int:
+        """
+        Find the stack slot of a local in the given function.
+        :return: Slot index, or -1 if the function has no such local
+        """
+        for i in range(len(state.locals) - 1, -1, -1):
+            if state.locals[i].name == name:
+                return i
+        return -1
+
+    @classmethod
+    def resolve_upvalue(cls, state: FunctionState, name: str) -> int:
+        """
+        Find (and add if needed) the upvalue through which the given function reaches an enclosing local.
+        :return: Upvalue index, or -1 if no enclosing function has such a local
+        """
+        if state.enclosing is None: return -1
+
+        local = cls.resolve_local(state.enclosing, name)
+        if local != -1:
+            state.enclosing.locals[local].is_captured = True
+            return cls.add_upvalue(state, True, local)
+
+        upvalue = cls.resolve_upvalue(state.enclosing, name)
+        if upvalue != -1:
+            return cls.add_upvalue(state, False, upvalue)
+
+        return -1
+
+    @classmethod
+    def add_upvalue(cls, state: FunctionState, is_local: bool, index: int) -> int:
+        upvalues = state.function.upvalues
+        if (is_local, index) in upvalues:
+            return upvalues.index((is_local, index))
+
+        upvalues.append((is_local, index))
+        return len(upvalues) - 1
+
+    def is_pure(self, expr: Expr) -> bool:
+        """
+        Check if evaluating expr can neither fail nor have side effects, so a type check that the tree-walker does
+        before evaluating it may be folded into the instruction that follows.
+        :param expr: Expression to check
+        :return: True or False
+        """
+        if isinstance(expr, (LiteralExpr, ThisExpr)): return True
+        if isinstance(expr, GroupingExpr): return self.is_pure(expr.expression)
+        if isinstance(expr, VariableExpr):
+            name = expr.name.lexeme
+            return self.resolve_local(self.state, name) != -1 or self.resolve_upvalue(self.state, name) != -1
+        return False
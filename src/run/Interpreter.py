@@ -1,26 +1,46 @@
 import abc
 import inspect
 import math
+import operator
+from typing import Callable
 
-from lox.LoxEnvironment import Environment
+from lox.LoxEnvironment import Cell, Environment
 from lox.LoxExpr import *
 from lox.LoxCallable import LoxCallable
 from lox.LoxClass import LoxClass
 from lox.LoxFunction import LoxFunction
 from lox.LoxInstance import LoxInstance
 from lox.LoxRuntimeError import LoxRuntimeError
-from lox.LoxReturn import LoxReturn
+from lox.LoxShape import Shape
 from lox.LoxStmt import *
+from lox.LoxTailCall import LoxTailCall
 from lox.LoxToken import TokenType as TT
 import lox.NativeFunctions
 from lox.NativeFunctions import NativeFunction
+from run.Resolver import VariableAccess
+
+# enum member lookups are slow, and variable accesses are the hottest path in the interpreter
+FRAME, CELL, UPVALUE = VariableAccess.FRAME, VariableAccess.CELL, VariableAccess.UPVALUE
+
+# what binary operator sites specialize themselves to once they have seen two numbers (see specialize_binary)
+NUMBER_OPERATIONS = {
+    TT.MINUS: operator.sub, TT.MINUS_EQUAL: operator.sub, TT.MINUS_MINUS: operator.sub,
+    TT.SLASH: operator.truediv, TT.SLASH_EQUAL: operator.truediv,
+    TT.STAR: operator.mul, TT.STAR_EQUAL: operator.mul,
+    TT.CARAT: operator.pow,
+    TT.PLUS: operator.add, TT.PLUS_EQUAL: operator.add, TT.PLUS_PLUS: operator.add,
+    TT.GREATER: operator.gt, TT.GREATER_EQUAL: operator.ge, TT.LESS: operator.lt, TT.LESS_EQUAL: operator.le
+}
+ADDITIONS = {TT.PLUS, TT.PLUS_EQUAL, TT.PLUS_PLUS}
+EQUALITIES = {TT.EQUAL_EQUAL: operator.eq, TT.BANG_EQUAL: operator.ne}  # any operands
+MAX_REWRITES = 4  # times an operator site respecializes to new operand types before leaving the rest to the generic path
 
 
 class Interpreter(ExprVisitor, StmtVisitor):
     def __init__(self):
         self.globals = Environment()
-        self.environment = self.globals
-        self.locals: dict[Expr, int] = {}
+        self.frame: list[object] | None = None  # flat frame holding the current function's locals
+        self.upvalues: list[Cell] | None = None  # cells of enclosing functions' locals used by the current function
 
         self.define_global_constants()
         self.define_native_functions()
@@ -43,15 +63,25 @@ class Interpreter(ExprVisitor, StmtVisitor):
         """
         try:
             for stmt in statements:
-                ret = self.execute(stmt)
-                if ret is not None and repl: print(self.stringify(ret))  # print the return of expressions in repl
+                if repl and isinstance(stmt, ExpressionStmt):
+                    value = self.evaluate(stmt.expression)
+                    if value is not None: print(self.stringify(value))  # print the return of expressions in repl
+                else:
+                    self.execute(stmt)
         except LoxRuntimeError as error:
             from lox.Lox import Lox
             Lox.runtime_error(error)
 
     # --------- Stmt Visitor Methods ---------
+    # Statements return None when they complete normally, and (value,) when a return statement ran, which every
+    # enclosing statement passes on until it reaches the function call.
     def visit_block_stmt(self, stmt: "BlockStmt"):
-        self.execute_block(stmt.statements, Environment(self.environment))
+        if stmt.frame_size is not None:  # block in top level code, which has no frame of its own
+            return self.execute_block(stmt.statements, [None] * stmt.frame_size, self.upvalues)
+
+        for statement in stmt.statements:  # the block's locals are already in the function's frame
+            result = self.execute(statement)
+            if result is not None: return result
 
     def visit_class_stmt(self, stmt: "ClassStmt"):
         superclass = None
@@ -60,65 +90,167 @@ class Interpreter(ExprVisitor, StmtVisitor):
             if not isinstance(superclass, LoxClass):
                 raise LoxRuntimeError(stmt.superclass.name, "Superclass must be a class.")
 
-        self.environment.define(stmt.name.lexeme, None)
+        cell = self.declare(stmt)
 
+        frame = self.frame
         if stmt.superclass:
-            self.environment = Environment(self.environment)
-            self.environment.define("super", superclass)
+            if stmt.frame_size is not None: frame = [None] * stmt.frame_size  # class in top level code
+            frame[stmt.super_slot] = Cell(superclass)
 
         methods = {
-            method.name.lexeme: LoxFunction(method, self.environment, method.name.lexeme == 'init')
+            method.name.lexeme: LoxFunction(method, self.capture(method, frame), method.name.lexeme == 'init')
             for method in stmt.methods
         }
 
-        l_class = LoxClass(stmt.name.lexeme, superclass, methods)
-
-        if stmt.superclass:
-            self.environment = self.environment.enclosing
-
-        self.environment.assign(stmt.name, l_class)
+        self.define(stmt, LoxClass(stmt.name.lexeme, superclass, methods), cell)
 
     def visit_expression_stmt(self, stmt: "ExpressionStmt"):
-        return self.evaluate(stmt.expression)  # return the value here so it can be printed when in REPL
+        self.evaluate(stmt.expression)
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: self.execute(stmt.initializer)
+        if stmt.step is not None: return self.run_counting_loop(stmt)
+        return self.run_for_loop(stmt)
 
     def visit_function_stmt(self, stmt: "FunctionStmt"):
-        function = LoxFunction(stmt, self.environment)
-        self.environment.define(stmt.name.lexeme, function)
+        cell = self.declare(stmt)
+        self.define(stmt, LoxFunction(stmt, self.capture(stmt, self.frame)), cell)
 
     def visit_var_stmt(self, stmt: "VarStmt"):
         initializer = stmt.initializer
         value = None if initializer is None else self.evaluate(initializer)
 
-        self.environment.define(stmt.name.lexeme, value)
+        self.define(stmt, value, self.declare(stmt))
 
     def visit_if_stmt(self, stmt: "IfStmt"):
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.thenBranch)
+            return self.execute(stmt.thenBranch)
         elif stmt.elseBranch:
-            self.execute(stmt.elseBranch)
+            return self.execute(stmt.elseBranch)
 
     def visit_return_stmt(self, stmt: "ReturnStmt"):
+        if stmt.tail_call:
+            call = stmt.value
+            callee = self.evaluate(call.callee)
+            arguments = [self.evaluate(argument) for argument in call.arguments]
+
+            if type(callee) is LoxFunction and len(arguments) == len(callee.declaration.params):
+                return LoxTailCall(callee, arguments)  # LoxFunction.call makes the call once this one is done
+            return self.call(call, callee, arguments),
+
         value = None
         if stmt.value:
             value = self.evaluate(stmt.value)
 
-        raise LoxReturn(value)
+        return value,
 
     def visit_while_stmt(self, stmt: "WhileStmt"):
-        while self.is_truthy(self.evaluate(stmt.condition)): self.execute(stmt.body)
+        while self.is_truthy(self.evaluate(stmt.condition)):
+            result = self.execute(stmt.body)
+            if result is not None: return result
 
     def execute(self, stmt: Stmt):
         return stmt.accept(self)
 
-    def execute_block(self, statements: list[Stmt], environment: Environment):
-        previous = self.environment
+    def execute_block(self, statements: list[Stmt], frame: list[object], upvalues: list[Cell],
+                      function: FunctionStmt | None = None) -> tuple | None:
+        """
+        Execute statements with their own frame.
+        :param statements: Statements to execute
+        :param frame: Frame holding the statements' locals
+        :param upvalues: Cells the statements use from enclosing functions
+        :param function: Declaration of the function whose body the statements are, None for top level blocks
+        :return: (value,) if a return statement ran, otherwise None
+        """
+        previous_frame, previous_upvalues = self.frame, self.upvalues
 
         try:
-            self.environment = environment
+            self.frame, self.upvalues = frame, upvalues
             for stmt in statements:
-                self.execute(stmt)
+                result = self.execute(stmt)
+                if result is not None: return result
         finally:
-            self.environment = previous
+            self.frame, self.upvalues = previous_frame, previous_upvalues
+
+    def run_for_loop(self, stmt: ForStmt) -> tuple | None:
+        """
+        Run a for loop whose initializer has run.
+        :param stmt: ForStmt to run
+        :return: (value,) if a return statement ran, otherwise None
+        """
+        condition, body, increment = stmt.condition, stmt.body, stmt.increment
+        while self.is_truthy(self.evaluate(condition)):
+            result = self.execute(body)
+            if result is not None: return result
+            if increment: self.evaluate(increment)
+
+    def run_counting_loop(self, stmt: ForStmt) -> tuple | None:
+        """
+        Run a for loop the Resolver found counts its variable by a constant step. The count is kept in a Python float
+        rather than by evaluating the condition and increment nodes, and stored back to the variable after each
+        increment, where the body and closures it creates read it. The bound is still evaluated every iteration.
+        :param stmt: ForStmt with a step, whose initializer has run
+        :return: (value,) if a return statement ran, otherwise None
+        """
+        declaration, condition, body, step = stmt.initializer, stmt.condition, stmt.body, stmt.step
+        frame, slot = self.frame, declaration.slot
+        cell = frame[slot] if declaration.captured else None
+        count = frame[slot] if cell is None else cell.value
+        if type(count) is not float: return self.run_for_loop(stmt)  # counting something else
+
+        compare = NUMBER_OPERATIONS[condition.operator.t_type]
+        bound = condition.right
+        while True:
+            limit = self.evaluate(bound)
+            if type(limit) is float:
+                if not compare(count, limit): return None
+            elif not self.binary_operation(condition, count, limit):  # reports non-numbers
+                return None
+
+            result = self.execute(body)
+            if result is not None: return result
+
+            count += step
+            if cell is None:
+                frame[slot] = count
+            else:
+                cell.value = count
+
+    def declare(self, declaration: ClassStmt | FunctionStmt | VarStmt) -> Cell | None:
+        """
+        Create a fresh cell for a captured variable each time its declaration runs. This happens before a function
+        or class is created, so that it can capture itself.
+        :param declaration: Statement declaring the variable
+        :return: The variable's cell, or None if it isn't captured
+        """
+        if not declaration.captured: return None
+
+        cell = self.frame[declaration.slot] = Cell(None)
+        return cell
+
+    def define(self, declaration: ClassStmt | FunctionStmt | VarStmt, value: object, cell: Cell | None):
+        """
+        Define a declared variable wherever the Resolver put it.
+        :param declaration: Statement declaring the variable
+        :param value: Variable's value
+        :param cell: The variable's cell from declare
+        """
+        if cell:
+            cell.value = value
+        elif declaration.slot is not None:
+            self.frame[declaration.slot] = value
+        else:
+            self.globals.define(declaration.name.lexeme, value)
+
+    def capture(self, function: FunctionStmt, frame: list[object]) -> list[Cell]:
+        """
+        Collect the cells a function uses from its enclosing functions, as the Resolver found them.
+        :param function: Function being created
+        :param frame: Frame of the enclosing function
+        :return: The function's upvalues
+        """
+        upvalues = self.upvalues
+        return [frame[index] if from_frame else upvalues[index] for from_frame, index in function.upvalues]
 
     # -------- Expr Visitor methods ---------
     def visit_access_expr(self, expr: "AccessExpr"):
@@ -127,19 +259,29 @@ class Interpreter(ExprVisitor, StmtVisitor):
 
     def visit_assign_expr(self, expr: "AssignExpr"):
         value = self.evaluate(expr.value)
-
-        distance = self.locals.get(expr)
-        if distance is not None:
-            self.environment.assign_at(distance, expr.name, value)
-        else:
-            self.globals.assign(expr.name, value)
-
+        self.assign_variable(expr, value)
         return value
 
     def visit_binary_expr(self, expr: "BinaryExpr"):
         left = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
 
+        if type(left) is expr.left_type and type(right) is expr.right_type:  # the types the site specialized to
+            try:
+                return expr.operation(left, right)
+            except ZeroDivisionError:  # the generic path reports it
+                pass
+        return self.specialize_binary(expr, left, right)
+
+    def binary_operation(self, expr: "BinaryExpr", left: object, right: object) -> object:
+        """
+        Apply a binary operator to any operands, checking their types.
+        :param expr: The operator's expression
+        :param left: Value of the left operand
+        :param right: Value of the right operand
+        :return: The result
+        :raises: LoxRuntimeError if the operator can't be applied to the operands
+        """
         match expr.operator.t_type:
             case TT.MINUS | TT.MINUS_EQUAL | TT.MINUS_MINUS:
                 self.check_number_operands(expr.operator, left, right)
@@ -182,34 +324,44 @@ class Interpreter(ExprVisitor, StmtVisitor):
                 return left != right
 
     def visit_call_expr(self, expr: "CallExpr"):
-        callee = self.evaluate(expr.callee)
-
-        arguments = []
-        for argument in expr.arguments:
-            arguments.append(self.evaluate(argument))
-
-        if not isinstance(callee, LoxCallable):
-            raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
-
-        num_args = len(arguments)
-        arity = callee.arity()
-
-        if num_args != arity:
-            raise LoxRuntimeError(expr.paren, f"Expected {arity} arguments but got {num_args}.")
+        callee_expr = expr.callee
+        callee_type = type(callee_expr)
+        if callee_type is GetExpr:  # obj.method(...) hands obj straight to the method rather than binding it
+            obj = self.evaluate(callee_expr.object)
+            if not isinstance(obj, LoxInstance):
+                raise LoxRuntimeError(callee_expr.name, "Only instances have properties.")
+
+            shape = obj.shape
+            if shape is not callee_expr.cached_shape: self.cache_property(callee_expr, shape)  # inline cache miss
+
+            offset = callee_expr.cached_offset
+            if offset is None:
+                method = self.cached_method(callee_expr)
+                return self.call(expr, method, [self.evaluate(argument) for argument in expr.arguments], obj)
+            callee = obj.values[offset]
+        elif callee_type is SuperExpr:  # likewise for super.method(...)
+            method = self.look_up_super_method(callee_expr)
+            obj = self.evaluate(callee_expr.this)
+            return self.call(expr, method, [self.evaluate(argument) for argument in expr.arguments], obj)
+        else:
+            callee = self.evaluate(callee_expr)
 
-        try:
-            retval = callee.call(self, arguments)
-            return retval
-        except LoxRuntimeError as call_error:
-            raise LoxRuntimeError(expr.paren, call_error.message)
+        arguments = [self.evaluate(argument) for argument in expr.arguments]
+        return self.call(expr, callee, arguments)
 
     def visit_get_expr(self, expr: "GetExpr"):
         obj = self.evaluate(expr.object)
 
-        if isinstance(obj, LoxInstance):
-            return obj.get(expr.name)
+        if not isinstance(obj, LoxInstance):
+            raise LoxRuntimeError(expr.name, "Only instances have properties.")
+
+        shape = obj.shape
+        if shape is not expr.cached_shape: self.cache_property(expr, shape)  # inline cache miss
+
+        offset = expr.cached_offset
+        if offset is not None: return obj.values[offset]
 
-        raise LoxRuntimeError(expr.name, "Only instances have properties.")
+        return self.cached_method(expr).bind(obj)  # the method escapes, so it needs its own 'this'
 
     def visit_grouping_expr(self, expr: "GroupingExpr"):
         return self.evaluate(expr.expression)
@@ -228,11 +380,11 @@ class Interpreter(ExprVisitor, StmtVisitor):
     def visit_logical_expr(self, expr: "LogicalExpr"):
         left = self.evaluate(expr.left)
 
-        # attempt to short circuit
-        if expr.operator.t_type == TT.OR:
-            if self.is_truthy(left): return left  # for OR, if first is true, return it
-        else:
-            if not self.is_truthy(left): return left  # for AND, if first is false, return it
+        # attempt to short circuit: OR returns the first operand if it is true, AND if it is false
+        short_circuit = expr.short_circuit
+        if short_circuit is None:  # the first time the site runs, it specializes to its operator
+            short_circuit = expr.short_circuit = expr.operator.t_type == TT.OR
+        if (left is not None and left is not False) is short_circuit: return left  # inlined is_truthy
 
         return self.evaluate(expr.right)  # have to evaluate the second operand_
 
@@ -243,19 +395,23 @@ class Interpreter(ExprVisitor, StmtVisitor):
             raise LoxRuntimeError(expr.name, "Only instances have fields.")
 
         value = self.evaluate(expr.value)
-        obj.set(expr.name, value)
+
+        shape = obj.shape  # only looked at now, evaluating the value could have added fields
+        if shape is not expr.cached_shape:  # inline cache miss
+            expr.cached_shape = shape
+            expr.cached_offset, expr.cached_transition = shape.place(expr.name.lexeme)
+
+        transition = expr.cached_transition
+        if transition is None:
+            obj.values[expr.cached_offset] = value
+        else:  # a new field, which goes at the end
+            obj.shape = transition
+            obj.values.append(value)
         return value
 
     def visit_super_expr(self, expr: "SuperExpr"):
-        distance = self.locals.get(expr)
-        superclass: LoxClass = self.environment.get_at(distance, "super")
-
-        obj: LoxInstance = self.environment.get_at(distance - 1, "this")  # get current instance
-
-        method = superclass.find_method(expr.method.lexeme)
-
-        if not method:
-            raise LoxRuntimeError(expr.method, f"Undefined property '{expr.method.lexeme}'.")
+        method = self.look_up_super_method(expr)
+        obj: LoxInstance = self.evaluate(expr.this)  # get current instance
         return method.bind(obj)
 
     def visit_this_expr(self, expr: "ThisExpr"):
@@ -264,6 +420,17 @@ class Interpreter(ExprVisitor, StmtVisitor):
     def visit_unary_expr(self, expr: "UnaryExpr"):
         right = self.evaluate(expr.right)
 
+        if type(right) is expr.operand_type: return expr.operation(right)  # the type the site specialized to
+        return self.specialize_unary(expr, right)
+
+    def unary_operation(self, expr: "UnaryExpr", right: object) -> object:
+        """
+        Apply a unary operator to any operand, checking its type.
+        :param expr: The operator's expression
+        :param right: Value of the operand
+        :return: The result
+        :raises: LoxRuntimeError if the operator can't be applied to the operand
+        """
         match expr.operator.t_type:
             case TT.MINUS:
                 self.check_number_operand(expr.operator, right)
@@ -277,6 +444,37 @@ class Interpreter(ExprVisitor, StmtVisitor):
     def evaluate(self, expr: Expr) -> object:
         return expr.accept(self)
 
+    def call(self, expr: "CallExpr", callee: object, arguments: list[object], instance: LoxInstance = None) -> object:
+        """
+        Call a Lox value, checking that it is callable with the arguments.
+        :param expr: The call, to blame for errors
+        :param callee: Value being called
+        :param arguments: Evaluated arguments
+        :param instance: 'this' for a method which hasn't been bound
+        :return: The call's result
+        """
+        # check the common callee kinds directly rather than going through the LoxCallable protocol
+        callee_type = type(callee)
+        if callee_type is LoxFunction:
+            arity = len(callee.declaration.params)
+        elif callee_type is LoxClass:
+            initializer = callee.initializer
+            arity = 0 if initializer is None else len(initializer.declaration.params)
+        elif isinstance(callee, LoxCallable):  # native functions
+            arity = callee.arity()
+        else:
+            raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
+
+        if len(arguments) != arity:
+            raise LoxRuntimeError(expr.paren, f"Expected {arity} arguments but got {len(arguments)}.")
+
+        try:
+            if instance is not None: return callee.call(self, arguments, instance)
+            return callee.call(self, arguments)
+        except LoxRuntimeError as call_error:
+            call_error.token = expr.paren  # errors are reported at the outermost call
+            raise
+
     # ------------- Helper methods ----------
     @classmethod
     def is_truthy(cls, obj: object) -> bool:
@@ -332,10 +530,16 @@ class Interpreter(ExprVisitor, StmtVisitor):
 
     def validate_list_indexing(self, expr: AccessExpr | ListAssignExpr) -> tuple[list, int]:
         lst = self.evaluate(expr.lst)
+        self.check_list(expr, lst)
+        return lst, self.check_list_index(expr, lst, self.evaluate(expr.index))
+
+    @classmethod
+    def check_list(cls, expr: AccessExpr | ListAssignExpr, lst: object):
         if not isinstance(lst, list):
             raise LoxRuntimeError(expr.name, "Can only access index of lists.")
 
-        index = self.evaluate(expr.index)
+    @classmethod
+    def check_list_index(cls, expr: AccessExpr | ListAssignExpr, lst: list, index: object) -> int:
         if not (isinstance(index, float) and float(index).is_integer()):
             raise LoxRuntimeError(expr.name, "Can only index with a whole number.")
 
@@ -343,24 +547,145 @@ class Interpreter(ExprVisitor, StmtVisitor):
         if index >= length or index < -length:
             raise LoxRuntimeError(expr.name, "List index out of range.")
 
-        return lst, int(index)
+        return int(index)
 
-    def resolve(self, expr: Expr, depth: int):
+    def look_up_variable(self, name: LoxToken, expr: SuperExpr | ThisExpr | VariableExpr) -> object:
         """
-        Mark the resolution depth for a given expr, for use when looking up variable exprs.
-        :param expr: Expression to resolve depth of
-        :param depth: how many environments deep is the expr
+        Look up variable where the Resolver found it.
+        :param name: Variable name Token to look for
+        :param expr: Expr holding the access and slot the Resolver found the variable at
         """
-        self.locals[expr] = depth
+        access = expr.access
+        if access is FRAME:
+            return self.frame[expr.slot]
+        elif access is CELL:
+            return self.frame[expr.slot].value
+        elif access is UPVALUE:
+            return self.upvalues[expr.slot].value
+        else:
+            return self.globals.get(name, expr.slot)
 
-    def look_up_variable(self, name: LoxToken, expr: Expr) -> object:
+    def assign_variable(self, expr: AssignExpr, value: object):
         """
-        Look up variable in environment hierarchy.
-        :param name: Variable name Token to look for
-        :param expr: Expr to fetch distance from self.locals for (to tell how deep to search environment hierarchy)
+        Assign variable where the Resolver found it.
+        :param expr: AssignExpr holding the access and slot the Resolver found the variable at
+        :param value: Value to assign
         """
-        distance = self.locals.get(expr)
-        if distance is not None:
-            return self.environment.get_at(distance, name.lexeme)
+        access = expr.access
+        if access is FRAME:
+            self.frame[expr.slot] = value
+        elif access is CELL:
+            self.frame[expr.slot].value = value
+        elif access is UPVALUE:
+            self.upvalues[expr.slot].value = value
         else:
-            return self.globals.get(name)
+            self.globals.assign(expr.name, expr.slot, value)
+
+    @classmethod
+    def cache_property(cls, expr: GetExpr, shape: Shape):
+        """
+        Fill a property access's inline cache with where the property is for instances of a shape.
+        :param expr: GetExpr to cache the property on
+        :param shape: Shape of the instance being accessed
+        """
+        expr.cached_shape = shape
+        expr.cached_offset, expr.cached_method = shape.find(expr.name.lexeme)
+
+    @classmethod
+    def cached_method(cls, expr: GetExpr) -> LoxFunction:
+        """
+        Get the method a property access's inline cache found, for properties which aren't fields.
+        :param expr: GetExpr whose cache is filled
+        :return: The unbound method
+        :raises: LoxRuntimeError if the class has no such method
+        """
+        method = expr.cached_method
+        if not method: raise LoxRuntimeError(expr.name, f"Undefined property {expr.name.lexeme}.")
+        return method
+
+    def look_up_super_method(self, expr: SuperExpr) -> LoxFunction:
+        """
+        Find the method super.method names, through the access's inline cache.
+        :param expr: SuperExpr caching the method it found last time
+        :return: The unbound method
+        :raises: LoxRuntimeError if the superclass has no such method
+        """
+        superclass: LoxClass = self.look_up_variable(expr.keyword, expr)
+        if superclass is not expr.cached_class:  # inline cache miss, only when the class declaration runs again
+            expr.cached_class, expr.cached_method = superclass, superclass.find_method(expr.method.lexeme)
+
+        method = expr.cached_method
+        if not method: raise LoxRuntimeError(expr.method, f"Undefined property '{expr.method.lexeme}'.")
+        return method
+
+    def specialize_binary(self, expr: BinaryExpr, left: object, right: object) -> object:
+        """
+        Generic path of a binary operator site, for operands its specialization doesn't cover (or before it has one).
+        Applies the operator, then rewrites the site to an operation for exactly these operand types, guarded by
+        visit_binary_expr, so it skips dispatching on the operator and checking types while the types stay the same.
+        After MAX_REWRITES the site keeps its last specialization and other types stay on this path.
+        :param expr: The operator's expression
+        :param left: Value of the left operand
+        :param right: Value of the right operand
+        :return: The result
+        """
+        result = self.binary_operation(expr, left, right)  # raises for operands the operator can't take
+
+        rewrites = expr.rewrites or 0
+        if rewrites < MAX_REWRITES:
+            operation = self.binary_specialization(expr.operator.t_type, type(left), type(right))
+            if operation is not None:
+                expr.left_type, expr.right_type, expr.operation = type(left), type(right), operation
+                expr.rewrites = rewrites + 1
+        return result
+
+    @classmethod
+    def binary_specialization(cls, t_type: TT, left_type: type, right_type: type) -> Callable | None:
+        """
+        Find the operation a binary operator site can specialize to, mirroring binary_operation.
+        :param t_type: The operator
+        :param left_type: Type of the left operand
+        :param right_type: Type of the right operand
+        :return: Function of the operands which applies the operator, or None if they are an error
+        """
+        if t_type in EQUALITIES: return EQUALITIES[t_type]
+        if left_type is float and right_type is float: return NUMBER_OPERATIONS[t_type]
+        if t_type not in ADDITIONS: return None
+
+        stringify = cls.stringify
+        if left_type is list: return lambda left, right: [*left, right]
+        if left_type is str and right_type is str: return operator.add
+        if left_type is str: return lambda left, right: left + stringify(right)
+        if right_type is str: return lambda left, right: stringify(left) + right
+        return None
+
+    def specialize_unary(self, expr: UnaryExpr, right: object) -> object:
+        """
+        Generic path of a unary operator site, which rewrites the site like specialize_binary.
+        :param expr: The operator's expression
+        :param right: Value of the operand
+        :return: The result
+        """
+        result = self.unary_operation(expr, right)  # raises for operands the operator can't take
+
+        rewrites = expr.rewrites or 0
+        if rewrites < MAX_REWRITES:
+            operation = self.unary_specialization(expr.operator.t_type, type(right))
+            if operation is not None:
+                expr.operand_type, expr.operation, expr.rewrites = type(right), operation, rewrites + 1
+        return result
+
+    @classmethod
+    def unary_specialization(cls, t_type: TT, operand_type: type) -> Callable | None:
+        """
+        Find the operation a unary operator site can specialize to, mirroring unary_operation.
+        :param t_type: The operator
+        :param operand_type: Type of the operand
+        :return: Function of the operand which applies the operator, or None if it is an error
+        """
+        if t_type == TT.MINUS: return operator.neg if operand_type is float else None
+        if t_type != TT.BANG: return None
+
+        if operand_type is bool: return operator.not_
+        falsey = operand_type is type(None)  # anything else is truthy, so ! of it is constant
+        return lambda right: falsey
@@ -0,0 +1,120 @@
+import gc
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+from lox.LoxEnvironment import Environment
+from lox.LoxStmt import Stmt
+
+VERSION = 4  # bumped whenever the AST or what the Resolver stores in it changes, so old files are ignored
+DIRECTORY = '__loxcache__'
+MAX_SIZE = 64 * 1024 * 1024  # bytes of cache files a directory may hold before the least recently used are removed
+
+
+class ParseCache:
+    """
+    Resolved ASTs of scripts, pickled to .loxc files in a __loxcache__ directory next to the script, much like
+    __pycache__, so running a script again skips scanning, parsing and resolving. Files are named by a hash of the
+    source, the cache's and Python's versions and whether function bodies were pre-parsed, so changing any of them
+    just misses the cache.
+
+    Anything that can write to the directory can already change the script, so unpickling its files is no riskier.
+    """
+
+    @classmethod
+    def load(cls, path: str, source: str, lazy: bool) -> list[Stmt] | None:
+        """
+        Get the resolved statements of a script, if they have been cached.
+        :param path: Path of the script
+        :param source: Source of the script
+        :param lazy: Whether function bodies were only pre-parsed
+        :return: The statements, or None if they aren't cached or the file can't be used
+        """
+        file_path = cls.file_path(path, source, lazy)
+        collecting = gc.isenabled()
+        gc.disable()  # as when parsing, collections triggered by making the nodes would find nothing
+        try:
+            with open(file_path, 'rb') as file:
+                names, statements = pickle.load(file)
+            os.utime(file_path)  # the modification time orders files for eviction
+        except Exception:  # missing, or written by a different version and somehow named the same
+            return None
+        finally:
+            if collecting: gc.enable()
+
+        # the Resolver numbered the globals, and the natives the interpreter defines have slots already, so the
+        # slots must agree with that numbering
+        if names[:len(Environment.slots)] != list(Environment.slots): return None
+        for name in names[len(Environment.slots):]:
+            Environment.slot(name)
+        return statements
+
+    @classmethod
+    def save(cls, path: str, source: str, lazy: bool, statements: list[Stmt]):
+        """
+        Cache the resolved statements of a script. The file is written under a temporary name and then renamed, so
+        other runs never see it half written, and scripts are still run if it can't be written at all.
+        :param path: Path of the script
+        :param source: Source of the script
+        :param lazy: Whether function bodies were only pre-parsed, which are cached as their tokens
+        :param statements: The script's resolved statements, before running
+        """
+        file_path = cls.file_path(path, source, lazy)
+        directory = os.path.dirname(file_path)
+        try:
+            data = pickle.dumps((list(Environment.slots), statements), pickle.HIGHEST_PROTOCOL)
+            os.makedirs(directory, exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(descriptor, 'wb') as file:
+                    file.write(data)
+                os.chmod(temporary, 0o644)  # readable like the script, rather than only by this user
+                os.replace(temporary, file_path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+        except (OSError, RecursionError, pickle.PicklingError):  # e.g. a read only directory, or a very deep AST
+            return
+
+        cls.evict(directory)
+
+    @classmethod
+    def evict(cls, directory: str, max_size: int = MAX_SIZE):
+        """
+        Remove the least recently used cache files of a directory until they take at most max_size bytes.
+        :param directory: The __loxcache__ directory
+        :param max_size: Bytes the files may take
+        """
+        files = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.loxc'): continue
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        size = sum(file[1] for file in files)
+        for _, file_size, file_path in sorted(files):
+            if size <= max_size: break
+            try:
+                os.unlink(file_path)
+            except OSError:  # e.g. already removed by another run evicting at the same time
+                pass
+            size -= file_size
+
+    @classmethod
+    def file_path(cls, path: str, source: str, lazy: bool) -> str:
+        """
+        Get the cache file for a version of a script.
+        :param path: Path of the script
+        :param source: Source of the script
+        :param lazy: Whether function bodies are only pre-parsed
+        :return: Path of its .loxc file
+        """
+        key = hashlib.sha256(f'{VERSION} {sys.implementation.cache_tag} {lazy}\n{source}'.encode()).hexdigest()
+        directory, name = os.path.split(os.path.abspath(path))
+        return os.path.join(directory, DIRECTORY, f'{name}.{key[:32]}.loxc')
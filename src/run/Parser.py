@@ -1,14 +1,51 @@
+import gc
+import re
+
 from lox.LoxExpr import *
+from lox.LoxLazyBody import LazyBody
 from lox.LoxStmt import *
 from lox.LoxToken import LoxToken, TokenType as TT
+from lox.LoxTokenBuffer import TOKEN_TYPES, TokenBuffer
+
+EOF = TT.EOF.value
+
+# how tightly the operators of each level of expression bind, loosest first
+OR, AND, EQUALITY, COMPARISON, TERM, FACTOR, UNARY, POWER, CALL = range(1, 10)
+PRIMARY = CALL
+
+
+# closing bracket type codes by opening ones, and a pattern finding any bracket in the type codes of a TokenBuffer
+CLOSERS = {TT.LEFT_PAREN.value: TT.RIGHT_PAREN.value, TT.LEFT_BRACE.value: TT.RIGHT_BRACE.value,
+           TT.LEFT_BRACKET.value: TT.RIGHT_BRACKET.value}
+BRACKETS = re.compile(b'[' + re.escape(bytes([*CLOSERS, *CLOSERS.values()])) + b']')
+SUPER = bytes([TT.SUPER.value])
+
+
+def rule_table(rules: dict[TT, tuple]) -> tuple:
+    """
+    Lay out parse rules keyed by TokenType as a tuple indexed by the type codes of a TokenBuffer.
+    :param rules: Rules by TokenType
+    :return: Rule or None for each type code
+    """
+    return tuple(rules.get(t_type) for t_type in TOKEN_TYPES)
 
 
 class Parser:
+    """
+    Recursive descent parser over a TokenBuffer, with the operators of expressions parsed by a table of Pratt rules
+    rather than a method per level of precedence. Tokens are looked at by their type code, and only made into
+    LoxTokens where a node of the AST keeps them or an error reports them. When lazy, the bodies of functions in top
+    level code are only pre-parsed.
+    """
     MAX_FUNC_ARGS = 255
 
-    def __init__(self, tokens: list[LoxToken]):
+    def __init__(self, tokens: TokenBuffer, lazy: bool = False):
         self.tokens = tokens
+        self.types = tokens.types
         self.current = 0
+        self.lazy = lazy  # whether to only pre-parse the bodies of functions and methods in top level code
+        self.type_codes: bytes | None = None  # types as bytes, for pre-parsing
+        self.depth = 0  # blocks being parsed
 
     class ParseError(RuntimeError):
         pass
@@ -18,11 +55,16 @@ class Parser:
         Parse the tokens.
         :return: List of statements
         """
-        statements = []
-        while not self.is_at_end():
-            statements.append(self.declaration())
+        collecting = gc.isenabled()
+        gc.disable()  # the AST is a tree, so collections triggered by making its nodes would find nothing
+        try:
+            statements = []
+            while not self.is_at_end():
+                statements.append(self.declaration())
 
-        return statements
+            return statements
+        finally:
+            if collecting: gc.enable()
 
     # ---------- Methods for CFG productions -------------
     def expression(self) -> Expr:
@@ -63,11 +105,11 @@ class Parser:
         return self.augmented_assign()
 
     def augmented_assign(self) -> Expr:
-        left = self.logic_or()
+        left = self.parse_precedence(OR)
 
         if self.match(TT.MINUS_EQUAL, TT.PLUS_EQUAL, TT.SLASH_EQUAL, TT.STAR_EQUAL):
             assign_op = self.previous()
-            right = self.logic_or()
+            right = self.parse_precedence(OR)
 
             if isinstance(left, VariableExpr):
                 return AssignExpr(left.name, BinaryExpr(left, assign_op, right))
@@ -80,123 +122,85 @@ class Parser:
 
         return left
 
-    def logic_or(self) -> Expr:
-        expr = self.logic_and()
-
-        while self.match(TT.OR):
-            operator = self.previous()
-            right = self.logic_and()
-            expr = LogicalExpr(expr, operator, right)
-
-        return expr
-
-    def logic_and(self) -> Expr:
-        expr = self.equality()
-
-        while self.match(TT.AND):
-            operator = self.previous()
-            right = self.equality()
-            expr = LogicalExpr(expr, operator, right)
-
-        return expr
-
-    def equality(self) -> Expr:
-        expr = self.comparison()
-
-        while self.match(TT.BANG_EQUAL, TT.EQUAL_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def comparison(self) -> Expr:
-        expr = self.term()
-
-        while self.match(TT.GREATER, TT.GREATER_EQUAL, TT.LESS, TT.LESS_EQUAL):
-            operator = self.previous()
-            right = self.term()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def term(self) -> Expr:
-        expr = self.factor()
-
-        while self.match(TT.MINUS, TT.PLUS):
-            operator = self.previous()
-            right = self.factor()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def factor(self) -> Expr:
-        expr = self.unary()
-
-        while self.match(TT.SLASH, TT.STAR):
-            operator = self.previous()
-            right = self.unary()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def unary(self) -> Expr:
-        if self.match(TT.BANG, TT.MINUS, TT.PLUS_PLUS, TT.MINUS_MINUS):
-            operator = self.previous()
-            right = self.unary()
-            return UnaryExpr(operator, right)
-
-        return self.power()
-
-    def power(self) -> Expr:
-        expr = self.call()
-
-        while self.match(TT.CARAT):
-            operator = self.previous()
-            right = self.power()
-            expr = BinaryExpr(expr, operator, right)
-
-        return expr
-
-    def call(self) -> Expr:
-        expr = self.primary()
-
+    def parse_precedence(self, precedence: int) -> Expr:
+        """
+        Parse an expression whose operators bind at least as tightly as precedence, Pratt style: the prefix rule of
+        its first token, then the infix rule of each following token, for as long as that binds tightly enough.
+        :param precedence: Loosest binding the expression may contain
+        :return: The expression
+        """
+        types = self.types
+        rule = self.prefix_rules[types[self.current]]
+        if rule is None or rule[0] < precedence:  # a unary operator can't start the right operand of '^'
+            raise self.error(self.peek(), "Expect expression.")
+        self.current += 1
+        expr = rule[1](self)
+
+        infix_rules = self.infix_rules
         while True:
-            if self.match(TT.LEFT_PAREN):
-                expr = self.finish_call(expr)
-            elif self.match(TT.DOT):
-                name = self.consume(TT.IDENTIFIER, "Expect property name after '.'.")
-                expr = GetExpr(expr, name)
-            elif self.match(TT.LEFT_BRACKET):
-                expr = self.finish_access(expr, expr.name)
-            else:
-                break
+            rule = infix_rules[types[self.current]]
+            if rule is None or rule[0] < precedence: return expr
+            self.current += 1
+            expr = rule[1](self, expr, rule[0])
 
-        return expr
+    # ---------- Pratt rules, called with their token consumed -------------
+    def binary(self, left: Expr, precedence: int) -> BinaryExpr:
+        operator = self.previous()
+        return BinaryExpr(left, operator, self.parse_precedence(precedence + 1))
 
-    def primary(self) -> Expr:
-        if self.match(TT.FALSE): return LiteralExpr(False)
-        if self.match(TT.TRUE): return LiteralExpr(True)
-        if self.match(TT.NIL): return LiteralExpr(None)
-        if self.match(TT.NUMBER, TT.STRING): return LiteralExpr(self.previous().literal)
-        if self.match(TT.THIS): return ThisExpr(self.previous())
-        if self.match(TT.IDENTIFIER): return VariableExpr(self.previous())
+    def power(self, left: Expr, precedence: int) -> BinaryExpr:
+        operator = self.previous()
+        return BinaryExpr(left, operator, self.parse_precedence(precedence))  # right associative
 
-        if self.match(TT.SUPER):
-            keyword = self.previous()
-            self.consume(TT.DOT, "Expect '.' after 'super'.")
-            method = self.consume(TT.IDENTIFIER, "Expect superclass method name.")
-            return SuperExpr(keyword, method)
+    def logical(self, left: Expr, precedence: int) -> LogicalExpr:
+        operator = self.previous()
+        return LogicalExpr(left, operator, self.parse_precedence(precedence + 1))
 
-        if self.match(TT.LEFT_PAREN):
-            expr = self.expression()
-            self.consume(TT.RIGHT_PAREN, "Expect ')' after expression.")
-            return GroupingExpr(expr)
+    def get(self, left: Expr, precedence: int) -> GetExpr:
+        name = self.consume(TT.IDENTIFIER, "Expect property name after '.'.")
+        return GetExpr(left, name)
 
-        if self.match(TT.LEFT_BRACKET):
-            return self.list_expr()
+    def unary(self) -> UnaryExpr:
+        operator = self.previous()
+        return UnaryExpr(operator, self.parse_precedence(UNARY))
 
-        raise self.error(self.peek(), "Expect expression.")
+    def super_expr(self) -> SuperExpr:
+        keyword = self.previous()
+        self.expect(TT.DOT, "Expect '.' after 'super'.")
+        method = self.consume(TT.IDENTIFIER, "Expect superclass method name.")
+        return SuperExpr(keyword, method)
+
+    def grouping(self) -> GroupingExpr:
+        expr = self.expression()
+        self.expect(TT.RIGHT_PAREN, "Expect ')' after expression.")
+        return GroupingExpr(expr)
+
+    # (precedence, rule) for the tokens that can start an expression, and for those that can continue one
+    prefix_rules = rule_table({
+        TT.BANG: (UNARY, unary), TT.MINUS: (UNARY, unary), TT.PLUS_PLUS: (UNARY, unary), TT.MINUS_MINUS: (UNARY, unary),
+        TT.FALSE: (PRIMARY, lambda parser: LiteralExpr(False)),
+        TT.TRUE: (PRIMARY, lambda parser: LiteralExpr(True)),
+        TT.NIL: (PRIMARY, lambda parser: LiteralExpr(None)),
+        TT.NUMBER: (PRIMARY, lambda parser: LiteralExpr(parser.tokens.literal(parser.current - 1))),
+        TT.STRING: (PRIMARY, lambda parser: LiteralExpr(parser.tokens.literal(parser.current - 1))),
+        TT.THIS: (PRIMARY, lambda parser: ThisExpr(parser.previous())),
+        TT.IDENTIFIER: (PRIMARY, lambda parser: VariableExpr(parser.previous())),
+        TT.SUPER: (PRIMARY, super_expr),
+        TT.LEFT_PAREN: (PRIMARY, grouping),
+        TT.LEFT_BRACKET: (PRIMARY, lambda parser: parser.list_expr()),
+    })
+    infix_rules = rule_table({
+        TT.OR: (OR, logical), TT.AND: (AND, logical),
+        TT.BANG_EQUAL: (EQUALITY, binary), TT.EQUAL_EQUAL: (EQUALITY, binary),
+        TT.GREATER: (COMPARISON, binary), TT.GREATER_EQUAL: (COMPARISON, binary),
+        TT.LESS: (COMPARISON, binary), TT.LESS_EQUAL: (COMPARISON, binary),
+        TT.MINUS: (TERM, binary), TT.PLUS: (TERM, binary),
+        TT.SLASH: (FACTOR, binary), TT.STAR: (FACTOR, binary),
+        TT.CARAT: (POWER, power),
+        TT.LEFT_PAREN: (CALL, lambda parser, left, precedence: parser.finish_call(left)),
+        TT.DOT: (CALL, get),
+        TT.LEFT_BRACKET: (CALL, lambda parser, left, precedence: parser.finish_access(left, left.name)),
+    })
 
     def finish_call(self, callee: Expr) -> CallExpr:
         arguments = []
@@ -214,13 +218,13 @@ class Parser:
 
     def finish_access(self, lst: Expr, name: LoxToken) -> AccessExpr:
         if self.match(TT.NUMBER):
-            idx = LiteralExpr(self.previous().literal)
+            idx = LiteralExpr(self.tokens.literal(self.current - 1))
         elif self.match(TT.IDENTIFIER):
             idx = VariableExpr(self.previous())
         else:
-            idx = self.term()
+            idx = self.parse_precedence(TERM)
 
-        self.consume(TT.RIGHT_BRACKET, "Expect ']' after index.")
+        self.expect(TT.RIGHT_BRACKET, "Expect ']' after index.")
 
         return AccessExpr(name, lst, idx)
 
@@ -231,11 +235,11 @@ class Parser:
             return ListExpr(items)
 
         while not self.is_at_end():  # 1 or more items
-            items.append(self.logic_or())
+            items.append(self.parse_precedence(OR))
             if self.check(TT.RIGHT_BRACKET): break
-            self.consume(TT.COMMA, "Expect ',' between list items.")
+            self.expect(TT.COMMA, "Expect ',' between list items.")
 
-        self.consume(TT.RIGHT_BRACKET, "Expect ']' after list items.")
+        self.expect(TT.RIGHT_BRACKET, "Expect ']' after list items.")
         return ListExpr(items)
 
     def statement(self) -> Stmt:
@@ -250,14 +254,16 @@ class Parser:
     def block(self) -> list[Stmt]:
         statements = []
 
+        self.depth += 1
         while not self.check(TT.RIGHT_BRACE) and not self.is_at_end():
             statements.append(self.declaration())
+        self.depth -= 1
 
-        self.consume(TT.RIGHT_BRACE, "Expect '}' after block.")
+        self.expect(TT.RIGHT_BRACE, "Expect '}' after block.")
         return statements
 
     def for_statement(self) -> Stmt:
-        self.consume(TT.LEFT_PAREN, "Expect '(' after 'for'.")
+        self.expect(TT.LEFT_PAREN, "Expect '(' after 'for'.")
 
         if self.match(TT.SEMICOLON):
             initializer = None
@@ -269,30 +275,24 @@ class Parser:
         condition = None
         if not self.check(TT.SEMICOLON):
             condition = self.expression()
-        self.consume(TT.SEMICOLON, "Expect ';' after 'for' condition.")
+        self.expect(TT.SEMICOLON, "Expect ';' after 'for' condition.")
 
         increment = None
         if not self.check(TT.RIGHT_PAREN):
             increment = self.expression()
-        self.consume(TT.RIGHT_PAREN, "Expect ')' after 'for' clauses.")
+        self.expect(TT.RIGHT_PAREN, "Expect ')' after 'for' clauses.")
 
         body = self.statement()
 
-        # de-sugar the for loop syntax
-        if increment:
-            body = BlockStmt([body, ExpressionStmt(increment)])
-
-        body = WhileStmt(condition if condition else LiteralExpr(True), body)
+        loop = ForStmt(initializer, condition if condition else LiteralExpr(True), increment, body)
 
-        if initializer:
-            body = BlockStmt([initializer, body])
-
-        return body
+        # the block scopes a variable declared by the initializer to the loop
+        return BlockStmt([loop]) if initializer else loop
 
     def if_statement(self) -> IfStmt:
-        self.consume(TT.LEFT_PAREN, "Expect '(' after 'if'.")
+        self.expect(TT.LEFT_PAREN, "Expect '(' after 'if'.")
         condition = self.expression()
-        self.consume(TT.RIGHT_PAREN, "Expect ')' after 'if' condition.")
+        self.expect(TT.RIGHT_PAREN, "Expect ')' after 'if' condition.")
 
         thenBranch = self.statement()
         elseBranch = None
@@ -309,13 +309,13 @@ class Parser:
         if not self.check(TT.SEMICOLON):
             value = self.expression()
 
-        self.consume(TT.SEMICOLON, "Expect ';' after return value.")
+        self.expect(TT.SEMICOLON, "Expect ';' after return value.")
         return ReturnStmt(keyword, value)
 
     def while_statement(self) -> WhileStmt:
-        self.consume(TT.LEFT_PAREN, "Expect '(' after 'while'.")
+        self.expect(TT.LEFT_PAREN, "Expect '(' after 'while'.")
         condition = self.expression()
-        self.consume(TT.RIGHT_PAREN, "Expect ')' after 'while' condition.")
+        self.expect(TT.RIGHT_PAREN, "Expect ')' after 'while' condition.")
 
         body = self.statement()
 
@@ -323,7 +323,7 @@ class Parser:
 
     def expression_statement(self) -> ExpressionStmt:
         expr = self.expression()
-        self.consume(TT.SEMICOLON, "Expect ';' after expression.")
+        self.expect(TT.SEMICOLON, "Expect ';' after expression.")
         return ExpressionStmt(expr)
 
     def declaration(self) -> Stmt | None:
@@ -341,23 +341,23 @@ class Parser:
 
         superclass = None
         if self.match(TT.LESS):
-            self.consume(TT.IDENTIFIER, "Expect superclass name.")
+            self.expect(TT.IDENTIFIER, "Expect superclass name.")
             superclass = VariableExpr(self.previous())
 
-        self.consume(TT.LEFT_BRACE, "Expect '{' before class body.")
+        self.expect(TT.LEFT_BRACE, "Expect '{' before class body.")
 
         methods = []
         while not self.check(TT.RIGHT_BRACE) and not self.is_at_end():
             methods.append(self.function("method"))
 
-        self.consume(TT.RIGHT_BRACE, "Expect '}' after class body.")
+        self.expect(TT.RIGHT_BRACE, "Expect '}' after class body.")
 
         return ClassStmt(name, superclass, methods)
 
     def function(self, kind: str) -> FunctionStmt:
         name = self.consume(TT.IDENTIFIER, f'Expect {kind} name.')
 
-        self.consume(TT.LEFT_PAREN, f"Expect '(' after {kind} name.")
+        self.expect(TT.LEFT_PAREN, f"Expect '(' after {kind} name.")
         parameters = []
         if not self.check(TT.RIGHT_PAREN):
             while True:
@@ -365,19 +365,50 @@ class Parser:
                     self.error(self.peek(), "Can't have more than 255 parameters.")
                 parameters.append(self.consume(TT.IDENTIFIER, "Expect parameter name."))
                 if not self.match(TT.COMMA): break
-        self.consume(TT.RIGHT_PAREN, f"Expect ')' after {kind} parameters.")
+        self.expect(TT.RIGHT_PAREN, f"Expect ')' after {kind} parameters.")
 
-        self.consume(TT.LEFT_BRACE, f"Expect '{{' before {kind} body.")
+        self.expect(TT.LEFT_BRACE, f"Expect '{{' before {kind} body.")
+        if self.lazy and self.depth == 0:
+            function = self.pre_parse(name, parameters)
+            if function is not None: return function
         body = self.block()
 
         return FunctionStmt(name, parameters, body)
 
+    def pre_parse(self, name: LoxToken, parameters: list[LoxToken]) -> FunctionStmt | None:
+        """
+        Skip over a function body by matching its brackets, leaving it to be parsed when it is first needed (see
+        LazyBody). Bodies using 'super' can capture it, and so are parsed in full, as are bodies whose brackets don't
+        match, which reports the error just as parsing in full always would.
+        :param name: Name of the function
+        :param parameters: Its parameters
+        :return: FunctionStmt whose body is still to be parsed, or None if it should be parsed now
+        """
+        if self.type_codes is None: self.type_codes = self.types.tobytes()
+        type_codes, start = self.type_codes, self.current
+
+        closers = [TT.RIGHT_BRACE.value]
+        for bracket in BRACKETS.finditer(type_codes, start):
+            end = bracket.start()
+            code = type_codes[end]
+            if code in CLOSERS:
+                closers.append(CLOSERS[code])
+            elif code != closers.pop():
+                return None
+            elif not closers:
+                if type_codes.find(SUPER, start, end) != -1: return None
+                self.current = end + 1
+                function = FunctionStmt(name, parameters, [])
+                function.lazy = LazyBody(self.tokens, start)
+                return function
+        return None
+
     def var_declaration(self) -> VarStmt:
         name = self.consume(TT.IDENTIFIER, "Expect variable name.")
 
         initializer = None if not self.match(TT.EQUAL) else self.expression()
 
-        self.consume(TT.SEMICOLON, "Expect ';' after variable declaration.")
+        self.expect(TT.SEMICOLON, "Expect ';' after variable declaration.")
         return VarStmt(name, initializer)
 
     # ----------- Helper methods ---------------
@@ -387,10 +418,10 @@ class Parser:
         :param t_types: TokenTypes to check for.
         :return: True if match found, else false
         """
-        for t_type in t_types:
-            if self.check(t_type):
-                self.advance()
-                return True
+        t_type = TOKEN_TYPES[self.types[self.current]]
+        if t_type in t_types and t_type is not TT.EOF:
+            self.current += 1
+            return True
         return False
 
     def check(self, t_type: TT):
@@ -399,37 +430,34 @@ class Parser:
         :param t_type: TokenType to check for
         :return: True if types match, else false
         """
-        if self.is_at_end(): return False
-        return self.peek().t_type == t_type
+        return TOKEN_TYPES[self.types[self.current]] is t_type and t_type is not TT.EOF
 
     def peek(self) -> LoxToken:
         """
         Get the current token. Do not advance/consume.
         :return: LoxToken at current
         """
-        return self.tokens[self.current]
+        return self.tokens.token(self.current)
 
     def is_at_end(self) -> bool:
         """
         Check if parser hit end of file.
         :return: True if at EOF token, else False
         """
-        return self.peek().t_type == TT.EOF
+        return self.types[self.current] == EOF
 
     def previous(self) -> LoxToken:
         """
         Get LoxToken at current - 1
         :return: LoxToken at current - 1
         """
-        return self.tokens[self.current - 1]
+        return self.tokens.token(self.current - 1)
 
-    def advance(self) -> LoxToken:
+    def advance(self):
         """
-        Get current LoxToken and advance current pointer.
-        :return: LoxToken at current
+        Advance current pointer, unless at the end.
         """
-        if not self.is_at_end(): self.current += 1
-        return self.previous()
+        if self.types[self.current] != EOF: self.current += 1
 
     def consume(self, t_type: TT, error_message: str) -> LoxToken:
         """
@@ -440,8 +468,18 @@ class Parser:
         :return: current LoxToken
         :raises: ParseError if current token doesn't match t_type
         """
-        if self.check(t_type): return self.advance()
-        raise self.error(self.peek(), error_message)
+        self.expect(t_type, error_message)
+        return self.previous()
+
+    def expect(self, t_type: TT, error_message: str):
+        """
+        Like consume, for tokens the AST doesn't keep, so no LoxToken is made.
+        :param t_type: TokenType to match at current
+        :param error_message: Error message to raise if no match
+        :raises: ParseError if current token doesn't match t_type
+        """
+        if not self.check(t_type): raise self.error(self.peek(), error_message)
+        self.current += 1
 
     def error(self, token: LoxToken, message: str) -> ParseError:
         """
@@ -461,7 +499,7 @@ class Parser:
         self.advance()
 
         while not self.is_at_end():
-            if self.previous().t_type == TT.SEMICOLON: return
-            while self.peek().t_type in {TT.CLASS, TT.FUN, TT.VAR, TT.FOR, TT.IF, TT.WHILE, TT.RETURN}:
+            if self.tokens.t_type(self.current - 1) == TT.SEMICOLON: return
+            while self.tokens.t_type(self.current) in {TT.CLASS, TT.FUN, TT.VAR, TT.FOR, TT.IF, TT.WHILE, TT.RETURN}:
                 return
             self.advance()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import sys
+
+from lox.LoxClass import LoxClass
+from lox.LoxExpr import *
+from lox.LoxFunction import LoxFunction
+from lox.LoxInstance import LoxInstance
+from lox.LoxStmt import *
+from run.Interpreter import Interpreter, MAX_REWRITES
+
+VERSION = 4  # bumped whenever the layout of profile files changes, so old files are ignored
+
+# operand types a specialization can be restored for, by the name profiles store them under
+TYPES = {t.__name__: t for t in (float, str, bool, list, type(None), LoxInstance, LoxFunction, LoxClass)}
+
+
+class Profile:
+    """
+    Type feedback of a run of a script, saved to a file so later runs of the same script can start with their
+    operator sites specialized instead of warming up (see Interpreter.specialize_binary).
+
+    Nodes are identified by their position in a walk of the resolved AST, and the file by a hash of the source, so a
+    profile is only applied to exactly the script it was recorded for and ignored otherwise. Function bodies which
+    were still only pre-parsed when the profile was saved are left out of the walk, so saving a profile never parses
+    a body and applying it only parses those the recorded run did.
+    """
+
+    @classmethod
+    def save(cls, path: str, source: str, statements: list[Stmt]):
+        """
+        Write the feedback the nodes of a script have collected to a profile file. The script has already run, so
+        failing to write the file is only reported.
+        :param path: File to write
+        :param source: Source of the script
+        :param statements: The script's statements, after running
+        """
+        nodes, unparsed = {}, []
+        for position, node in enumerate(cls.walk(statements)):
+            node_type = type(node)
+            if node_type is FunctionStmt and node.lazy is not None:
+                unparsed.append(position)
+            elif node_type is BinaryExpr and node.operation is not None:
+                nodes[position] = {'types': [node.left_type.__name__, node.right_type.__name__],
+                                   'rewrites': node.rewrites}
+            elif node_type is UnaryExpr and node.operation is not None:
+                nodes[position] = {'types': [node.operand_type.__name__], 'rewrites': node.rewrites}
+
+        try:
+            with open(path, 'w') as file:
+                json.dump({'version': VERSION, 'source': cls.hash(source), 'unparsed': unparsed, 'nodes': nodes}, file,
+                          indent=1)
+        except OSError as error:  # e.g. a missing directory, which mustn't be blamed on the script
+            print(f"Couldn't write profile '{path}': {error}", file=sys.stderr)
+
+    @classmethod
+    def apply(cls, path: str, source: str, statements: list[Stmt]):
+        """
+        Specialize the operator sites of a script as a profile file recorded them. Files which can't be read, were
+        recorded for a different script or are damaged are ignored, leaving every site to warm up as usual.
+        :param path: File to read
+        :param source: Source of the script
+        :param statements: The script's resolved statements
+        """
+        try:
+            with open(path) as file:
+                profile = json.load(file)
+        except (OSError, ValueError) as error:
+            print(f"Ignoring profile '{path}': {error}", file=sys.stderr)
+            return
+
+        if type(profile) is not dict:
+            print(f"Ignoring profile '{path}': not a profile", file=sys.stderr)
+            return
+        if profile.get('version') != VERSION or profile.get('source') != cls.hash(source):
+            print(f"Ignoring profile '{path}', which was recorded for a different script.", file=sys.stderr)
+            return
+
+        # check the whole file before specializing anything, so a damaged one leaves no site half specialized
+        specializations = []
+        try:
+            nodes = profile['nodes']
+            for position, node in enumerate(cls.walk(statements, set(profile['unparsed']))):
+                feedback = nodes.get(str(position))
+                if feedback is None: continue
+
+                types = [TYPES.get(name) for name in feedback['types']]
+                rewrites = min(feedback['rewrites'], MAX_REWRITES)  # sites which kept changing don't start over
+                if None in types: continue  # e.g. native functions, whose types vary
+
+                node_type = type(node)
+                if node_type is BinaryExpr and len(types) == 2:
+                    operation = Interpreter.binary_specialization(node.operator.t_type, *types)
+                elif node_type is UnaryExpr and len(types) == 1:
+                    operation = Interpreter.unary_specialization(node.operator.t_type, *types)
+                else:
+                    continue
+                if operation is not None: specializations.append((node, types, operation, rewrites))
+        except (KeyError, TypeError, AttributeError) as error:
+            print(f"Ignoring profile '{path}': damaged ({type(error).__name__}: {error})", file=sys.stderr)
+            return
+
+        for node, types, operation, rewrites in specializations:
+            if type(node) is BinaryExpr:
+                node.left_type, node.right_type = types
+            else:
+                node.operand_type, = types
+            node.operation, node.rewrites = operation, rewrites
+
+    @classmethod
+    def walk(cls, statements: list[Stmt], unparsed: set[int] | None = None):
+        """
+        Visit every node of a script in a fixed order, giving each node its position in a profile. The bodies of
+        functions which haven't been parsed yet are skipped, or when applying a profile those of the functions which
+        hadn't been when it was saved. The others had been called by then, so they are parsed to number their nodes
+        the same way.
+        :param statements: The script's statements
+        :param unparsed: Positions of the functions whose bodies to skip, None to skip those not parsed yet
+        :return: Generator of the nodes
+        """
+        stack = list(reversed(statements))
+        position = -1
+        while stack:
+            node = stack.pop()
+            position += 1
+            yield node
+
+            if type(node) is FunctionStmt:
+                skip = node.lazy is not None if unparsed is None else position in unparsed
+                if skip: continue
+                if node.lazy is not None: node.lazy.parse(node)
+
+            children = []
+            for attribute in node.__slots__:
+                child = getattr(node, attribute)
+                if isinstance(child, (Expr, Stmt)):
+                    children.append(child)
+                elif isinstance(child, list):
+                    children.extend(c for c in child if isinstance(c, (Expr, Stmt)))
+            stack.extend(reversed(children))
+
+    @classmethod
+    def hash(cls, source: str) -> str:
+        return hashlib.sha256(source.encode()).hexdigest()
@@ -1,8 +1,12 @@
 from enum import Enum, auto
 
+from lox.LoxEnvironment import Environment
 from lox.LoxExpr import *
-from run.Interpreter import Interpreter
 from lox.LoxStmt import *
+from lox.LoxToken import TokenType as TT
+
+
+COMPARISONS = {TT.LESS, TT.LESS_EQUAL, TT.GREATER, TT.GREATER_EQUAL}  # conditions a counting for loop can have
 
 
 class FunctionType(Enum):
@@ -18,26 +22,68 @@ class ClassType(Enum):
     SUBCLASS = auto()
 
 
+class VariableAccess(Enum):
+    """
+    Where the interpreter finds a resolved local variable.
+    """
+    FRAME = auto()  # frame[slot]
+    CELL = auto()  # frame[slot].value, a local captured by a closure
+    UPVALUE = auto()  # upvalues[slot].value, a local of an enclosing function
+
+
+class Variable:
+    """
+    A local variable. Every local has a slot in its function's flat frame. Variables used from inside a nested
+    function are captured, so the slot holds a Cell which the nested function shares.
+    """
+
+    def __init__(self, declaration: "ClassStmt | FunctionStmt | VarStmt | None", slot: int):
+        self.declaration = declaration
+        self.slot = slot
+        self.defined = False
+        self.captured = False
+        self.assignments = 0  # assignments to the variable anywhere in its scope, including from nested functions
+        self.uses: list[Expr] = []  # uses from the declaring function, which go through the cell if captured
+
+
+class FunctionState:
+    """
+    Resolver state for the function currently being resolved, or for a frame of top level code.
+    """
+
+    def __init__(self, enclosing: "FunctionState | None", scope_base: int):
+        self.enclosing = enclosing
+        self.scope_base = scope_base  # index of the function's outermost scope in Resolver.scopes
+        self.frame_size = 0
+        self.upvalues: list[tuple[bool, int]] = []  # (captured from the enclosing frame, slot or upvalue index)
+
+
 class Resolver(ExprVisitor, StmtVisitor):
-    def __init__(self, interpreter: Interpreter):
-        self.interpreter = interpreter
-        self.scopes: list[dict[str, bool]] = []
+    def __init__(self):
+        self.scopes: list[dict[str, Variable]] = []
+        self.function: FunctionState | None = None  # None in top level code
         self.current_function = FunctionType.NONE
         self.current_class = ClassType.NONE
 
     # -------- Stmt Visitor methods -------
     def visit_block_stmt(self, stmt: "BlockStmt"):
+        outermost = self.function is None  # blocks in top level code get a frame of their own
+        if outermost: self.function = FunctionState(None, len(self.scopes))
+
         self.begin_scope()
         self.resolve_all(stmt.statements)
         self.end_scope()
 
+        if outermost: stmt.frame_size, self.function = self.function.frame_size, None
+
     def visit_class_stmt(self, stmt: "ClassStmt"):
         enclosing_class = self.current_class
         self.current_class = ClassType.CLASS
 
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name)
 
+        outermost = False
         if stmt.superclass:
             if stmt.name.lexeme == stmt.superclass.name.lexeme:
                 self.error(stmt.superclass.name, "A class can't inherit from itself.")
@@ -45,27 +91,35 @@ class Resolver(ExprVisitor, StmtVisitor):
             self.current_class = ClassType.SUBCLASS
             self.resolve(stmt.superclass)
 
-            self.begin_scope()  # scope to look up 'super' keyword
-            self.peek_scope()["super"] = True
+            outermost = self.function is None  # classes in top level code need a frame to hold 'super'
+            if outermost: self.function = FunctionState(None, len(self.scopes))
 
-        self.begin_scope()  # scope to look up 'this' keyword
-        self.peek_scope()['this'] = True
+            self.begin_scope()  # scope to look up 'super' keyword
+            stmt.super_slot = self.declare_keyword("super")
 
         for method in stmt.methods:
             declaration = FunctionType.INITIALIZER if method.name.lexeme == "init" else FunctionType.METHOD
             self.resolve_function(method, declaration)
 
-        self.end_scope()  # end 'this' scope
-
         if stmt.superclass: self.end_scope()  # end 'super' scope
 
+        if outermost: stmt.frame_size, self.function = self.function.frame_size, None
+
         self.current_class = enclosing_class
 
     def visit_expression_stmt(self, stmt: "ExpressionStmt"):
         self.resolve(stmt.expression)
 
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: self.resolve(stmt.initializer)
+        self.resolve(stmt.condition)
+        self.resolve(stmt.body)
+        if stmt.increment: self.resolve(stmt.increment)
+
+        stmt.step = self.counting_step(stmt)
+
     def visit_function_stmt(self, stmt: "FunctionStmt"):
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
         self.define(stmt.name)
 
         self.resolve_function(stmt, FunctionType.FUNCTION)
@@ -85,8 +139,10 @@ class Resolver(ExprVisitor, StmtVisitor):
 
             self.resolve(stmt.value)
 
+        stmt.tail_call = isinstance(stmt.value, CallExpr)
+
     def visit_var_stmt(self, stmt: "VarStmt"):
-        self.declare(stmt.name)
+        self.declare(stmt.name, stmt)
 
         if stmt.initializer:
             self.resolve(stmt.initializer)
@@ -149,6 +205,9 @@ class Resolver(ExprVisitor, StmtVisitor):
             self.error(expr.keyword, "Can't use 'super' in a class with no superclass.")
         self.resolve_local(expr, expr.keyword)
 
+        expr.this = ThisExpr(LoxToken(TT.THIS, "this", None, expr.keyword.line))  # the instance to bind to
+        self.resolve_local(expr.this, expr.this.keyword)
+
     def visit_this_expr(self, expr: "ThisExpr"):
         if self.current_class == ClassType.NONE:
             self.error(expr.keyword, "Can't use 'this' outside of a class.")
@@ -160,7 +219,8 @@ class Resolver(ExprVisitor, StmtVisitor):
         self.resolve(expr.right)
 
     def visit_variable_expr(self, expr: "VariableExpr"):
-        if self.scopes and self.peek_scope().get(expr.name.lexeme) is False:
+        variable = self.peek_scope().get(expr.name.lexeme) if self.scopes else None
+        if variable and not variable.defined:
             self.error(expr.name, "Can't read local variable in its own initializer.")
 
         self.resolve_local(expr, expr.name)
@@ -174,56 +234,153 @@ class Resolver(ExprVisitor, StmtVisitor):
             self.resolve(thing)
 
     # ------- Helper methods ---------
-    def declare(self, name: "LoxToken"):
+    def declare(self, name: "LoxToken", declaration: "ClassStmt | FunctionStmt | VarStmt" = None) -> int | None:
         """
-        Declare a variable in the scope, i.e. put it in scope dict and mark with False (uninitialized).
+        Declare a variable in the scope, i.e. put it in scope dict as not yet defined (uninitialized), and give it
+        the next slot in the frame.
         :param name: Variable name Token
+        :param declaration: Statement declaring the variable, None for parameters
+        :return: The variable's slot, or None for globals
         """
-        if not self.scopes: return
+        if not self.scopes: return None
 
         scope = self.peek_scope()
         if name.lexeme in scope:
             self.error(name, "Already a variable with this name in this scope.")
 
-        scope[name.lexeme] = False
+        slot = self.function.frame_size
+        self.function.frame_size += 1
+        scope[name.lexeme] = Variable(declaration, slot)
+        return slot
 
     def define(self, name: "LoxToken"):
         """
-        Define a variable in the scope, i.e. mark with True in scope dict
+        Define a variable in the scope, i.e. mark it as defined in scope dict
         :param name: Variable name Token
         """
         if not self.scopes: return
 
-        self.peek_scope()[name.lexeme] = True
+        self.peek_scope()[name.lexeme].defined = True
 
-    def resolve_local(self, expr: "Expr", name: "LoxToken"):
+    def declare_keyword(self, keyword: str) -> int:
+        """
+        Declare and define 'this' or 'super' in the scope.
+        :param keyword: "this" or "super"
+        :return: The keyword's slot
         """
-        Find the innermost environment where local variable exists and mark its depth in the interpreter.
-        :param expr: Expression to mark depth of
+        slot = self.declare(LoxToken(TT.IDENTIFIER, keyword, None, 0))
+        self.peek_scope()[keyword].defined = True
+        return slot
+
+    def resolve_local(self, expr: "AssignExpr | SuperExpr | ThisExpr | VariableExpr", name: "LoxToken"):
+        """
+        Find the innermost scope where local variable exists and mark where to access it on expr. Whether a local
+        of the current function is captured is only known once its scope ends. Globals are left with no access and
+        their slot in the global table.
+        :param expr: Expression to mark location of
         :param name: Variable name Token
         """
-        for i, scope in enumerate(reversed(self.scopes)):
-            if name.lexeme in scope:
-                self.interpreter.resolve(expr, i)
-                return
+        for i in range(len(self.scopes) - 1, -1, -1):
+            variable = self.scopes[i].get(name.lexeme)
+            if not variable: continue
+            if type(expr) is AssignExpr: variable.assignments += 1
+
+            if i >= self.function.scope_base:
+                expr.slot = variable.slot
+                variable.uses.append(expr)
+            else:
+                variable.captured = True
+                expr.access = VariableAccess.UPVALUE
+                expr.slot = self.resolve_upvalue(self.function, variable, i)
+            return
+
+        expr.slot = Environment.slot(name.lexeme)
+
+    def resolve_upvalue(self, function: FunctionState, variable: Variable, scope: int) -> int:
+        """
+        Find (and add if needed) the upvalue through which a function reaches a local of an enclosing function.
+        :param function: Function using the variable
+        :param variable: Variable being captured
+        :param scope: Index of the scope declaring the variable
+        :return: Upvalue index
+        """
+        enclosing = function.enclosing
+        if scope >= enclosing.scope_base:
+            return self.add_upvalue(function, True, variable.slot)
+
+        return self.add_upvalue(function, False, self.resolve_upvalue(enclosing, variable, scope))
+
+    @classmethod
+    def add_upvalue(cls, function: FunctionState, from_frame: bool, index: int) -> int:
+        upvalues = function.upvalues
+        if (from_frame, index) in upvalues:
+            return upvalues.index((from_frame, index))
+
+        upvalues.append((from_frame, index))
+        return len(upvalues) - 1
 
     def resolve_function(self, function: FunctionStmt, f_type: FunctionType):
         """
         Resolve a function declaration. This differs from variables because functions can call themselves.
+        Parameters take the first slots of the function's frame, followed by 'this' for methods.
         :param function: FunctionStmt to resolve.
         :param f_type: type of function (function, method, etc)
         """
+        if function.lazy is not None:  # resolved when its body is parsed, knowing it can't capture anything
+            function.lazy.function_type, function.lazy.class_type = f_type, self.current_class
+            function.cells, function.upvalues = [], []
+            return
+
         enclosing_function = self.current_function
         self.current_function = f_type
+        self.function = FunctionState(self.function, len(self.scopes))
 
         self.begin_scope()
         for param in function.params:
             self.declare(param)
             self.define(param)
+        if f_type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            self.declare_keyword("this")
+        scope = self.peek_scope()
         self.resolve_all(function.body)
         self.end_scope()
 
+        # parameters and 'this' are put in cells on entry when captured, declared variables when they are defined
+        function.cells = [variable.slot for variable in scope.values()
+                          if variable.captured and not variable.declaration]
+        function.upvalues = self.function.upvalues
+        function.frame_size = self.function.frame_size
+
         self.current_function = enclosing_function
+        self.function = self.function.enclosing
+
+    def counting_step(self, stmt: ForStmt) -> float | None:
+        """
+        Recognize a for loop which counts a variable it declares up or down to a bound, by a constant step, e.g.
+        for (var i = 0; i < n; i += 1). Only the increment may assign the variable, so the interpreter can keep the
+        count itself (see Interpreter.run_counting_loop). The variable's scope is the loop, so every assignment to it
+        has been resolved by now.
+        :param stmt: Resolved ForStmt
+        :return: The step, or None if the loop isn't a counting loop
+        """
+        initializer, condition, increment = stmt.initializer, stmt.condition, stmt.increment
+        if not (type(initializer) is VarStmt and initializer.initializer and type(increment) is AssignExpr): return None
+
+        name = initializer.name.lexeme
+        variable = self.peek_scope().get(name)
+        if variable is None or variable.declaration is not initializer or variable.assignments != 1: return None
+
+        if not (type(condition) is BinaryExpr and condition.operator.t_type in COMPARISONS
+                and type(condition.left) is VariableExpr and condition.left.name.lexeme == name): return None
+
+        value = increment.value
+        if not (increment.name.lexeme == name and type(value) is BinaryExpr
+                and type(value.left) is VariableExpr and value.left.name.lexeme == name
+                and type(value.right) is LiteralExpr and type(value.right.value) is float): return None
+
+        if value.operator.t_type in (TT.PLUS, TT.PLUS_EQUAL, TT.PLUS_PLUS): return value.right.value
+        if value.operator.t_type in (TT.MINUS, TT.MINUS_EQUAL, TT.MINUS_MINUS): return -value.right.value
+        return None
 
     def begin_scope(self):
         """
@@ -233,14 +390,21 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     def end_scope(self):
         """
-        Pop a scope from the stack.
+        Pop a scope from the stack, and mark on its declarations and uses whether each variable was captured.
         """
-        self.scopes.pop()
+        for variable in self.scopes.pop().values():
+            if variable.declaration:
+                variable.declaration.slot = variable.slot
+                variable.declaration.captured = variable.captured
+
+            access = VariableAccess.CELL if variable.captured else VariableAccess.FRAME
+            for expr in variable.uses:
+                expr.access = access
 
-    def peek_scope(self) -> dict[str, bool]:
+    def peek_scope(self) -> dict[str, Variable]:
         """
         Peek at top of scope stack.
-        :return: topmost scope (which is a dict of str -> bool)
+        :return: topmost scope (which is a dict of str -> Variable)
         """
         return self.scopes[-1]
 
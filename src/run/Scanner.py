@@ -1,7 +1,16 @@
-from lox.LoxToken import LoxToken, TokenType as TT
+import gc
+import re
+
+from lox.LoxToken import TokenType as TT
+from lox.LoxTokenBuffer import TokenBuffer
 
 
 class Scanner:
+    """
+    Splits source into tokens with one compiled regex, whose named groups tell what kind of text each match is,
+    rather than going through the source one character at a time.
+    """
+
     keywords = {
         "and": TT.AND,
         "class": TT.CLASS,
@@ -20,228 +29,101 @@ class Scanner:
         "while": TT.WHILE
     }
 
+    operators = {
+        '(': TT.LEFT_PAREN, ')': TT.RIGHT_PAREN, '{': TT.LEFT_BRACE, '}': TT.RIGHT_BRACE,
+        '[': TT.LEFT_BRACKET, ']': TT.RIGHT_BRACKET, ',': TT.COMMA, '.': TT.DOT, ';': TT.SEMICOLON, '^': TT.CARAT,
+        '-': TT.MINUS, '-=': TT.MINUS_EQUAL, '--': TT.MINUS_MINUS,
+        '+': TT.PLUS, '+=': TT.PLUS_EQUAL, '++': TT.PLUS_PLUS,
+        '*': TT.STAR, '*=': TT.STAR_EQUAL, '/': TT.SLASH, '/=': TT.SLASH_EQUAL,
+        '!': TT.BANG, '!=': TT.BANG_EQUAL, '=': TT.EQUAL, '==': TT.EQUAL_EQUAL,
+        '<': TT.LESS, '<=': TT.LESS_EQUAL, '>': TT.GREATER, '>=': TT.GREATER_EQUAL
+    }
+
+    # each match is the whitespace before a token and then the token, with one group per kind of token. The groups
+    # are tried in order, so comments come before '/' and two character operators before one character ones, and
+    # every character is matched by something, if only as an unexpected character.
+    token_pattern = re.compile(r'''
+        ([ \t\r\n]*)
+        (?:
+            ([A-Za-z_][A-Za-z0-9_]*)          # identifier or keyword
+          | ([0-9]+(?:\.[0-9]+)?)              # number
+          | ("[^"]*")                          # string
+          | (//[^\n]*)                         # comment
+          | (/\*(?:[^*](?!/))*+..)              # block comment, see scan_tokens
+          | (/\*.*|"[^"]*)                     # unterminated block comment or string
+          | ([-+*/!=<>]=|--|\+\+|[(){}\[\],.;^\-+*/!=<>])  # operator
+          | (.)                                # unexpected character
+        )?
+    ''', re.VERBOSE | re.DOTALL)
+
     def __init__(self, source: str):
         self.source = source
-        self.source_len = len(source)
-        self.tokens = list()  # list[TokenType]
-        self.start = 0
-        self.current = 0
+        self.tokens = TokenBuffer(source)
         self.line = 1
 
-    def scan(self) -> list[LoxToken]:
-        """
-        Scan the characters from source and form tokens.
-        :return: List of tokens.
-        """
-        while not self.is_at_end():
-            self.start = self.current
-            self.scan_token()
-
-        self.tokens.append(LoxToken(TT.EOF, '', None, self.line))
-        return self.tokens
-
-    def scan_token(self):
-        """
-        Find Token that corresponds to the character at curr and add to tokens.
-        """
-        c = self.advance()
-        match c:
-            case '(':
-                self.add_token(TT.LEFT_PAREN)
-            case ')':
-                self.add_token(TT.RIGHT_PAREN)
-            case '{':
-                self.add_token(TT.LEFT_BRACE)
-            case '}':
-                self.add_token(TT.RIGHT_BRACE)
-            case '[':
-                self.add_token(TT.LEFT_BRACKET)
-            case ']':
-                self.add_token(TT.RIGHT_BRACKET)
-            case ',':
-                self.add_token(TT.COMMA)
-            case '.':
-                self.add_token(TT.DOT)
-            case ';':
-                self.add_token(TT.SEMICOLON)
-            case '^':
-                self.add_token(TT.CARAT)
-            case '-':
-                self.add_token(TT.MINUS_EQUAL if self.match('=') else TT.MINUS_MINUS if self.match('-') else TT.MINUS)
-            case '+':
-                self.add_token(TT.PLUS_EQUAL if self.match('=') else TT.PLUS_PLUS if self.match('+') else TT.PLUS)
-            case '*':
-                self.add_token(TT.STAR_EQUAL if self.match('=') else TT.STAR)
-            case '!':
-                self.add_token(TT.BANG_EQUAL if self.match('=') else TT.BANG)
-            case '=':
-                self.add_token(TT.EQUAL_EQUAL if self.match('=') else TT.EQUAL)
-            case '<':
-                self.add_token(TT.LESS_EQUAL if self.match('=') else TT.LESS)
-            case '>':
-                self.add_token(TT.GREATER_EQUAL if self.match('=') else TT.GREATER)
-            case '/':
-                if self.match('/'):  # found a '//' (comment)
-                    self.comment()
-                elif self.match('*'):  # found a '/*' (block comment)
-                    self.block_comment()
-                else:
-                    self.add_token(TT.SLASH_EQUAL if self.match('=') else TT.SLASH)
-            case ' ' | '\r' | '\t':  # ignore whitespace
-                pass
-            case '\n':
-                self.line += 1
-            case '"':
-                self.string()
-            case _:
-                if self.is_digit(c):  # number literal
-                    self.number()
-                elif self.is_alpha(c):  # identifier or keyword
-                    self.identifier()
-                else:
-                    self.error(self.line, f'Unexpected character: {c}')
-
-    def advance(self) -> str:
-        """
-        Consume and return a character, advancing to the next in self.source.
-        :return: character at current
-        """
-        c = self.source[self.current]
-        self.current += 1
-        return c
-
-    def add_token(self, t_type: TT, literal: object = None):
-        """
-        Add a token to the current list of tokens.
-        :param t_type: TokenType of the token
-        :param literal: literal value associated with Token
-        """
-        text = self.source[self.start:self.current]
-        self.tokens.append(LoxToken(t_type, text, literal, self.line))
-
-    def is_at_end(self) -> bool:
-        """
-        Check if scanner hit end of source.
-        :return: True if current greater-equal than length of source
-        """
-        return self.current >= self.source_len
-
-    def match(self, expected: str) -> bool:
-        """
-        Check if the next character matches expected. If so, consume it.
-        :param expected: the character to check for
-        :return: True if match found, False if not
-        """
-        if self.is_at_end(): return False
-        if self.source[self.current] != expected: return False
-
-        self.advance()
-        return True
-
-    def peek(self) -> str:
-        """
-        Peek at the current character in source. Do not advance/consume.
-        :return:
-        """
-        if self.is_at_end(): return '\0'
-        return self.source[self.current]
-
-    def peek_next(self) -> str:
-        """
-        Peek at the next character in source. Do not advance/consume.
-        """
-        if self.current + 1 >= self.source_len: return '\0'
-        return self.source[self.current + 1]
-
-    def string(self):
-        """
-        Consume a string from source
-        """
-        while self.peek() != '"' and not self.is_at_end():
-            if self.peek() == '\n': self.line += 1
-            self.advance()
-
-        if self.is_at_end():
-            self.error(self.line, "Unterminated string.")
-            return
-
-        self.advance()  # eat closing "
-
-        string = self.source[self.start + 1: self.current - 1]
-        self.add_token(TT.STRING, string)
-
-    def number(self):
-        """
-        Consume a number literal from source.
-        """
-        while self.is_digit(self.peek()): self.advance()
-
-        if self.peek() == '.' and self.is_digit(self.peek_next()):
-            self.advance()  # eat .
-
-        while self.is_digit(self.peek()): self.advance()
-
-        number = float(self.source[self.start:self.current])
-        self.add_token(TT.NUMBER, number)
-
-    def identifier(self):
-        """
-        Consume an identifier from source.
-        :return:
-        """
-        while self.is_alpha_numeric(self.peek()): self.advance()
-
-        text = self.source[self.start:self.current]
-        self.add_token(self.keywords.get(text, TT.IDENTIFIER))
-
-    def comment(self):
-        """
-        Consume a comment from source.
-        """
-        while self.peek() != '\n' and not self.is_at_end():
-            self.advance()
-
-    def block_comment(self):
-        """
-        Consume a block comment from source
-        """
-        while (self.peek() != "*" and self.peek_next() != '/') and not self.is_at_end():
-            if self.peek() == '\n': self.line += 1
-            self.advance()
-
-        if self.is_at_end():
-            self.error(self.line, "Unterminated block comment.")
-            return
-
-        self.advance()
-        self.advance()  # consume closing */
-
-    @classmethod
-    def is_digit(cls, c: str) -> bool:
-        """
-        Check if c is a digit (for our purposes)
-        :param c: character to check
-        :return: True or False
-        """
-        return ord('0') <= ord(c) <= ord('9')
-
-    @classmethod
-    def is_alpha(cls, c: str) -> bool:
-        """
-        Check if c is an alphabet character (for our purposes)
-        :param c: character to check
-        :return: True or False
-        """
-        return ('a' <= c <= 'z') or ('A' <= c <= 'Z') or c == '_'
-
-    @classmethod
-    def is_alpha_numeric(cls, c: str) -> bool:
-        """
-        Check if c is an alphanumeric character (for our purposes)
-        :param c: character to check
-        :return: True or False
-        """
-        return cls.is_alpha(c) or cls.is_digit(c)
+    def scan(self) -> TokenBuffer:
+        """
+        Scan the characters from source and form tokens. The regex finds all the tokens in one go, so only filling
+        the TokenBuffer and counting lines is left to Python.
+        :return: Buffer of tokens.
+        """
+        collecting = gc.isenabled()
+        gc.disable()  # no objects are made that could form reference cycles, so collections would find nothing
+        try:
+            return self.scan_tokens()
+        finally:
+            if collecting: gc.enable()
+
+    def scan_tokens(self) -> TokenBuffer:
+        """
+        Turn the regex's matches into tokens. The matches cover the source end to end, so where each token starts
+        is found by adding up the lengths of everything before it.
+        :return: Buffer of tokens.
+        """
+        tokens, line, position = self.tokens, self.line, 0
+        types, starts, ends, lines = tokens.types.append, tokens.starts.append, tokens.ends.append, tokens.lines.append
+        operators = {operator: t_type.value for operator, t_type in self.operators.items()}
+        keywords = {keyword: t_type.value for keyword, t_type in self.keywords.items()}
+        identifier, number, string = TT.IDENTIFIER.value, TT.NUMBER.value, TT.STRING.value
+
+        for space, name, digits, text, comment, block_comment, unterminated, operator, unexpected \
+                in self.token_pattern.findall(self.source):
+            if space:
+                position += len(space)
+                if '\n' in space: line += space.count('\n')
+
+            if name:
+                t_type, lexeme = keywords.get(name, identifier), name
+            elif operator:
+                t_type, lexeme = operators[operator], operator
+            elif digits:
+                t_type, lexeme = number, digits
+            elif text:
+                line += text.count('\n')
+                t_type, lexeme = string, text
+            else:
+                if block_comment:
+                    # the comment ends two characters after the first '*', or the first character followed by '/',
+                    # which is how block comments have always been scanned (and lines are only counted before those)
+                    line += block_comment.count('\n', 0, -2)
+                elif unterminated:
+                    line += unterminated.count('\n')
+                    kind = "string" if unterminated[0] == '"' else "block comment"
+                    self.error(line, f"Unterminated {kind}.")
+                elif unexpected:
+                    self.error(line, f'Unexpected character: {unexpected}')
+                position += len(comment or block_comment or unterminated or unexpected)
+                continue
+
+            types(t_type)
+            starts(position)
+            position += len(lexeme)
+            ends(position)
+            lines(line)
+
+        self.line = line
+        tokens.add(TT.EOF, position, position, line)
+        return tokens
 
     @classmethod
     def error(cls, line: int, message: str):
@@ -0,0 +1,397 @@
+from types import GeneratorType
+
+from lox.LoxClass import LoxClass
+from lox.LoxExpr import *
+from lox.LoxFunction import LoxFunction
+from lox.LoxInstance import LoxInstance
+from lox.LoxRuntimeError import LoxRuntimeError
+from lox.LoxStmt import *
+from lox.LoxTailCall import LoxTailCall
+from lox.LoxToken import TokenType as TT
+from run.Interpreter import Interpreter, NUMBER_OPERATIONS
+
+
+class StackInterpreter(Interpreter):
+    """
+    Tree-walking interpreter which keeps Lox calls off the Python stack, so recursion depth is only limited by memory
+    and max_call_depth.
+
+    Nodes which can call Lox code are run by the StackEvaluator, whose visit methods are generators: they yield the
+    child nodes they need, and run() evaluates those and sends the values back. The suspended generators form a
+    stack on the heap in place of nested Python calls. All other nodes can only nest as deep as the source does, so
+    they are run directly by the recursive Interpreter, which is faster.
+    """
+
+    max_call_depth = 100_000  # Lox calls which can be active at once before a "Stack overflow." error
+
+    def __init__(self):
+        super().__init__()
+        self.evaluator = StackEvaluator(self)
+        self.call_depth = 0
+
+    def interpret(self, statements: list[Stmt], repl: bool = False):
+        """
+        Run the interpreter on input statements.
+        :param statements: list of statements to run through interpreter
+        :param repl: whether to print the output of expressions immediately after running (for repl)
+        """
+        try:
+            for stmt in statements:
+                if repl and isinstance(stmt, ExpressionStmt):
+                    value = self.run(stmt.expression)
+                    if value is not None: print(self.stringify(value))  # print the return of expressions in repl
+                else:
+                    self.run(stmt)
+        except LoxRuntimeError as error:
+            from lox.Lox import Lox
+            Lox.runtime_error(error)
+
+    def run(self, node: Expr | Stmt) -> object:
+        """
+        Evaluate an expression or execute a statement, keeping suspended evaluations on a stack of generators.
+        :param node: Expr or Stmt to run
+        :return: The value of an expression, or the completion of a statement
+        """
+        stack = []
+        request, value, error = node, None, None
+
+        try:
+            while True:
+                if request is not None:  # a node or a generator, which starts on the stack
+                    try:
+                        value = self.step(request)
+                    except LoxRuntimeError as step_error:
+                        value, error = None, step_error
+                    if type(value) is GeneratorType:
+                        stack.append(value)
+                        value = None
+                    request = None
+
+                if not stack:
+                    if error: raise error
+                    return value
+
+                try:
+                    request = stack[-1].throw(error) if error else stack[-1].send(value)
+                    error = None
+                except StopIteration as stop:
+                    stack.pop()
+                    value = stop.value
+                except LoxRuntimeError as generator_error:
+                    stack.pop()
+                    value, error = None, generator_error
+        finally:
+            for generator in reversed(stack):  # only left over if something other than Lox code failed
+                generator.close()
+
+    def step(self, request: Expr | Stmt | GeneratorType) -> object:
+        """
+        Run a request yielded by the StackEvaluator.
+        :param request: A node, or a generator to resume
+        :return: The node's value or completion, or a generator to put on the stack
+        """
+        if not isinstance(request, (Expr, Stmt)): return request
+        if self.contains_call(request): return request.accept(self.evaluator)
+        return request.accept(self)
+
+    def contains_call(self, node: Expr | Stmt) -> bool:
+        """
+        Whether running a node can call Lox code, i.e. whether the node or one of its children is a call. Function
+        and class declarations only create their functions, so they don't count. The answer is kept on the node.
+        :param node: Expr or Stmt to check
+        :return: Whether the StackEvaluator has to run the node
+        """
+        calls = node.can_call
+        if calls is not None: return calls
+
+        calls = False
+        if isinstance(node, CallExpr):
+            calls = True
+        elif not isinstance(node, (ClassStmt, FunctionStmt)):
+            for attribute in node.__slots__:
+                child = getattr(node, attribute)
+                children = child if isinstance(child, list) else [child]
+                if any(isinstance(c, (Expr, Stmt)) and self.contains_call(c) for c in children):
+                    calls = True
+                    break
+
+        node.can_call = calls
+        return calls
+
+
+class StackEvaluator(ExprVisitor, StmtVisitor):
+    """
+    Generator visitor for nodes which can call Lox code, see StackInterpreter. Each visit method yields the child
+    nodes (or generators) it needs, gets back their values and returns its own. Nodes which can't call Lox code are
+    passed straight to the interpreter.
+    """
+
+    def __init__(self, interpreter: StackInterpreter):
+        self.interpreter = interpreter
+
+    # --------- Stmt Visitor Methods ---------
+    def visit_block_stmt(self, stmt: "BlockStmt"):
+        if stmt.frame_size is not None:  # block in top level code, which has no frame of its own
+            return (yield self.run_block(stmt.statements, [None] * stmt.frame_size, self.interpreter.upvalues))
+
+        for statement in stmt.statements:
+            result = yield statement
+            if result is not None: return result
+
+    def visit_class_stmt(self, stmt: "ClassStmt"):
+        return self.interpreter.visit_class_stmt(stmt)
+
+    def visit_expression_stmt(self, stmt: "ExpressionStmt"):
+        yield stmt.expression
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: yield stmt.initializer
+
+        interpreter = self.interpreter
+        condition, body, increment = stmt.condition, stmt.body, stmt.increment
+        if stmt.step is not None:  # like Interpreter.run_counting_loop
+            declaration, step = stmt.initializer, stmt.step
+            frame, slot = interpreter.frame, declaration.slot
+            cell = frame[slot] if declaration.captured else None
+            count = frame[slot] if cell is None else cell.value
+
+            if type(count) is float:
+                compare = NUMBER_OPERATIONS[condition.operator.t_type]
+                while True:
+                    limit = yield condition.right
+                    if type(limit) is float:
+                        if not compare(count, limit): return None
+                    elif not interpreter.binary_operation(condition, count, limit):
+                        return None
+
+                    result = yield body
+                    if result is not None: return result
+
+                    count += step
+                    if cell is None:
+                        frame[slot] = count
+                    else:
+                        cell.value = count
+
+        while interpreter.is_truthy((yield condition)):
+            result = yield body
+            if result is not None: return result
+            if increment: yield increment
+
+    def visit_function_stmt(self, stmt: "FunctionStmt"):
+        return self.interpreter.visit_function_stmt(stmt)
+
+    def visit_var_stmt(self, stmt: "VarStmt"):
+        value = None if stmt.initializer is None else (yield stmt.initializer)
+
+        interpreter = self.interpreter
+        interpreter.define(stmt, value, interpreter.declare(stmt))
+
+    def visit_if_stmt(self, stmt: "IfStmt"):
+        if self.interpreter.is_truthy((yield stmt.condition)):
+            return (yield stmt.thenBranch)
+        elif stmt.elseBranch:
+            return (yield stmt.elseBranch)
+
+    def visit_return_stmt(self, stmt: "ReturnStmt"):
+        if stmt.tail_call:
+            call = stmt.value
+            callee = yield call.callee
+            arguments = []
+            for argument in call.arguments:
+                arguments.append((yield argument))
+
+            if type(callee) is LoxFunction and len(arguments) == len(callee.declaration.params):
+                return LoxTailCall(callee, arguments)  # call() makes the call once this one is done
+            return (yield self.call(call, callee, arguments)),
+
+        return (None if stmt.value is None else (yield stmt.value)),
+
+    def visit_while_stmt(self, stmt: "WhileStmt"):
+        while self.interpreter.is_truthy((yield stmt.condition)):
+            result = yield stmt.body
+            if result is not None: return result
+
+    # -------- Expr Visitor methods ---------
+    def visit_access_expr(self, expr: "AccessExpr"):
+        lst, index = yield self.list_indexing(expr)
+        return lst[index]
+
+    def visit_assign_expr(self, expr: "AssignExpr"):
+        value = yield expr.value
+        self.interpreter.assign_variable(expr, value)
+        return value
+
+    def visit_binary_expr(self, expr: "BinaryExpr"):
+        left = yield expr.left
+        right = yield expr.right
+
+        if type(left) is expr.left_type and type(right) is expr.right_type:  # like Interpreter.visit_binary_expr
+            try:
+                return expr.operation(left, right)
+            except ZeroDivisionError:
+                pass
+        return self.interpreter.specialize_binary(expr, left, right)
+
+    def visit_call_expr(self, expr: "CallExpr"):
+        callee_expr = expr.callee
+        instance = None
+        if type(callee_expr) is GetExpr:  # obj.method(...) hands obj straight to the method, like the Interpreter
+            obj = yield callee_expr.object
+            if not isinstance(obj, LoxInstance):
+                raise LoxRuntimeError(callee_expr.name, "Only instances have properties.")
+
+            interpreter = self.interpreter
+            shape = obj.shape
+            if shape is not callee_expr.cached_shape: interpreter.cache_property(callee_expr, shape)
+
+            offset = callee_expr.cached_offset
+            if offset is None:
+                callee, instance = interpreter.cached_method(callee_expr), obj
+            else:
+                callee = obj.values[offset]
+        else:
+            callee = yield callee_expr
+
+        arguments = []
+        for argument in expr.arguments:
+            arguments.append((yield argument))
+
+        return (yield self.call(expr, callee, arguments, instance))
+
+    def visit_get_expr(self, expr: "GetExpr"):
+        obj = yield expr.object
+
+        if isinstance(obj, LoxInstance):
+            return obj.get(expr.name)
+
+        raise LoxRuntimeError(expr.name, "Only instances have properties.")
+
+    def visit_grouping_expr(self, expr: "GroupingExpr"):
+        return (yield expr.expression)
+
+    def visit_list_expr(self, expr: "ListExpr"):
+        items = []
+        for item in expr.items:
+            items.append((yield item))
+        return items
+
+    def visit_listassign_expr(self, expr: "ListAssignExpr"):
+        lst, index = yield self.list_indexing(expr)
+        lst[index] = yield expr.value
+        return lst
+
+    def visit_literal_expr(self, expr: "LiteralExpr"):
+        return expr.value
+
+    def visit_logical_expr(self, expr: "LogicalExpr"):
+        left = yield expr.left
+
+        # attempt to short circuit
+        if expr.operator.t_type == TT.OR:
+            if self.interpreter.is_truthy(left): return left
+        else:
+            if not self.interpreter.is_truthy(left): return left
+
+        return (yield expr.right)
+
+    def visit_set_expr(self, expr: "SetExpr"):
+        obj = yield expr.object
+
+        if not isinstance(obj, LoxInstance):
+            raise LoxRuntimeError(expr.name, "Only instances have fields.")
+
+        value = yield expr.value
+        obj.set(expr.name, value)
+        return value
+
+    def visit_super_expr(self, expr: "SuperExpr"):
+        return self.interpreter.visit_super_expr(expr)
+
+    def visit_this_expr(self, expr: "ThisExpr"):
+        return self.interpreter.visit_this_expr(expr)
+
+    def visit_unary_expr(self, expr: "UnaryExpr"):
+        right = yield expr.right
+
+        if type(right) is expr.operand_type: return expr.operation(right)  # like Interpreter.visit_unary_expr
+        return self.interpreter.specialize_unary(expr, right)
+
+    def visit_variable_expr(self, expr: "VariableExpr"):
+        return self.interpreter.visit_variable_expr(expr)
+
+    # ------------- Helper methods ----------
+    def call(self, expr: CallExpr, callee: object, arguments: list[object], instance: LoxInstance = None):
+        """
+        Call a Lox value. Lox functions and initializers run their bodies on the heap stack, anything else is called
+        by the interpreter as usual.
+        :param expr: The call, to blame for errors
+        :param callee: Value being called
+        :param arguments: Evaluated arguments
+        :param instance: 'this' for a method which hasn't been bound
+        :return: Generator returning the call's result
+        """
+        interpreter = self.interpreter
+
+        callee_type = type(callee)
+        if callee_type is LoxFunction:
+            function = callee
+            if instance is None: instance = function.instance
+        elif callee_type is LoxClass and callee.initializer is not None:
+            function, instance = callee.initializer, LoxInstance(callee)
+        else:  # native functions and classes without initializers don't run Lox code
+            return interpreter.call(expr, callee, arguments)
+
+        arity = len(function.declaration.params)
+        if len(arguments) != arity:
+            raise LoxRuntimeError(expr.paren, f"Expected {arity} arguments but got {len(arguments)}.")
+
+        if interpreter.call_depth >= interpreter.max_call_depth:
+            raise LoxRuntimeError(expr.paren, "Stack overflow.")
+
+        interpreter.call_depth += 1
+        try:
+            while True:  # runs again for each tail call the body ends with
+                frame = function.new_frame(arguments, instance)
+                result = yield self.run_block(function.declaration.body, frame, function.upvalues)
+
+                if type(result) is not LoxTailCall: break
+                function, arguments = result.function, result.arguments
+                instance = function.instance
+        except LoxRuntimeError as call_error:
+            call_error.token = expr.paren  # errors are reported at the outermost call
+            raise
+        finally:
+            interpreter.call_depth -= 1
+
+        if function.is_initializer: return instance
+        return None if result is None else result[0]
+
+    def run_block(self, statements: list[Stmt], frame: list[object], upvalues: list["Cell"]):
+        """
+        Execute statements with their own frame, like Interpreter.execute_block.
+        :param statements: Statements to execute
+        :param frame: Frame holding the statements' locals
+        :param upvalues: Cells the statements use from enclosing functions
+        :return: Generator returning (value,) if a return statement ran, otherwise None
+        """
+        interpreter = self.interpreter
+        previous_frame, previous_upvalues = interpreter.frame, interpreter.upvalues
+
+        try:
+            interpreter.frame, interpreter.upvalues = frame, upvalues
+            for statement in statements:
+                result = yield statement
+                if result is not None: return result
+        finally:
+            interpreter.frame, interpreter.upvalues = previous_frame, previous_upvalues
+
+    def list_indexing(self, expr: AccessExpr | ListAssignExpr):
+        """
+        Evaluate and check the list and index of a list access, like Interpreter.validate_list_indexing.
+        :param expr: AccessExpr or ListAssignExpr
+        :return: Generator returning the list and the index
+        """
+        lst = yield expr.lst
+        self.interpreter.check_list(expr, lst)
+        return lst, self.interpreter.check_list_index(expr, lst, (yield expr.index))
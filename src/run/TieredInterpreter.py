@@ -0,0 +1,157 @@
+import sys
+from typing import Callable
+
+from lox.LoxEnvironment import Cell
+from lox.LoxFunction import LoxFunction
+from lox.LoxStmt import *
+from run.ClosureCompiler import ClosureCompiler, StmtFn
+from run.Interpreter import Interpreter
+
+
+class TieredCompiler(ClosureCompiler):
+    """
+    ClosureCompiler for code the TieredInterpreter promotes. Functions declared in compiled code are plain
+    LoxFunctions, which start out interpreted and get promoted on their own, so all functions are called the same way
+    whichever tier made them, and tail calls between tiers run in constant stack.
+    """
+
+    function_type = LoxFunction
+
+    def compile_new_function(self, function: FunctionStmt, is_initializer: bool) -> Callable[[list[Cell]], LoxFunction]:
+        self.interpreter.track(function)
+        return lambda upvalues: LoxFunction(function, upvalues, is_initializer)
+
+
+class TieredInterpreter(Interpreter):
+    """
+    Tree-walking interpreter which compiles the code that turns out to be hot with the ClosureCompiler, so one-off
+    code doesn't pay for compiling and hot code doesn't pay for tree-walking.
+
+    Functions start out interpreted, and are promoted once their declaration has been called hot_calls times or its
+    loops have run hot_loops iterations, counted on the FunctionStmt across every closure created from it. Functions
+    already created from the declaration keep their LoxFunction, and their calls switch to the compiled body in
+    execute_block. A loop which has run hot_loops iterations is compiled
+    on its own and continues compiled from the iteration it was at, so hot loops in top level code or in a function
+    which is only called once don't stay interpreted.
+    """
+
+    hot_calls = 100  # calls of a function before it is compiled
+    hot_loops = 1000  # loop iterations, of a function's loops or of a single loop, before it is compiled
+    tier_stats = False  # print what was compiled once the program is done
+
+    def __init__(self):
+        super().__init__()
+        self.compiler = TieredCompiler(self)
+        self.function: FunctionStmt | None = None  # function whose interpreted body is running
+        self.functions = 0  # function declarations which have run
+        self.promoted: list[tuple[str, int, int, int]] = []  # name, line, calls and loop iterations at promotion
+        self.compiled_loops: list[tuple[str | None, int]] = []  # enclosing function's name and iterations
+
+    def interpret(self, statements: list[Stmt], repl: bool = False):
+        super().interpret(statements, repl)
+        if self.tier_stats: self.print_stats()
+
+    def visit_class_stmt(self, stmt: "ClassStmt"):
+        for method in stmt.methods:
+            self.track(method)
+        super().visit_class_stmt(stmt)
+
+    def visit_function_stmt(self, stmt: "FunctionStmt"):
+        self.track(stmt)
+        super().visit_function_stmt(stmt)
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: self.execute(stmt.initializer)
+        return self.run_loop(stmt)
+
+    def visit_while_stmt(self, stmt: "WhileStmt"):
+        return self.run_loop(stmt)
+
+    def execute_block(self, statements: list[Stmt], frame: list[object], upvalues: list[Cell],
+                      function: FunctionStmt | None = None) -> tuple | None:
+        if function is None:  # a block in top level code
+            return super().execute_block(statements, frame, upvalues)
+
+        if function.compiled is None:
+            function.calls += 1
+            if function.calls >= self.hot_calls or function.loops >= self.hot_loops: self.promote(function)
+        if function.compiled is not None: return function.compiled(frame, upvalues)
+
+        # super().execute_block inlined, calls nest deep enough as they are
+        previous_frame, previous_upvalues, previous_function = self.frame, self.upvalues, self.function
+        try:
+            self.frame, self.upvalues, self.function = frame, upvalues, function
+            for stmt in statements:
+                result = self.execute(stmt)
+                if result is not None: return result
+        finally:
+            self.frame, self.upvalues, self.function = previous_frame, previous_upvalues, previous_function
+
+    def track(self, declaration: FunctionStmt):
+        """
+        Start counting the calls of a function declaration, the first time it runs.
+        :param declaration: FunctionStmt of a function or method
+        """
+        if declaration.calls is None:
+            declaration.calls = declaration.loops = 0
+            self.functions += 1
+
+    def run_loop(self, stmt: ForStmt | WhileStmt) -> tuple | None:
+        """
+        Run a loop, or the loop of a for statement once its initializer has run, counting its iterations.
+        :param stmt: ForStmt or WhileStmt to run
+        :return: (value,) if a return statement ran, otherwise None
+        """
+        if stmt.compiled is not None: return stmt.compiled(self.frame, self.upvalues)
+
+        condition, body = stmt.condition, stmt.body
+        increment = stmt.increment if type(stmt) is ForStmt else None
+        iterations = start = stmt.iterations or 0
+        try:
+            while self.is_truthy(self.evaluate(condition)):
+                result = self.execute(body)
+                if result is not None: return result
+                if increment: self.evaluate(increment)
+
+                iterations += 1
+                if iterations == self.hot_loops:  # carry on from here with the loop compiled
+                    return self.compile_loop(stmt, iterations)(self.frame, self.upvalues)
+        finally:
+            stmt.iterations = iterations
+            if self.function is not None: self.function.loops += iterations - start
+
+    def promote(self, function: FunctionStmt):
+        """
+        Compile a function, so all its later calls run the compiled body.
+        :param function: The function's declaration
+        """
+        self.compiler.compile_function(function)  # which keeps the body in function.compiled
+        name = function.name
+        self.promoted.append((name.lexeme, name.line, function.calls, function.loops))
+
+    def compile_loop(self, stmt: ForStmt | WhileStmt, iterations: int) -> StmtFn:
+        """
+        Compile a loop on its own, so it and later runs of it run compiled. For statements are compiled without their
+        initializer, which has already run.
+        :param stmt: ForStmt or WhileStmt to compile
+        :param iterations: Iterations the loop ran before it got hot
+        :return: The compiled loop
+        """
+        compiler = self.compiler
+        loop = compiler.compile_for_loop(stmt) if type(stmt) is ForStmt else compiler.compile_stmt(stmt)
+        stmt.compiled = loop
+        self.compiled_loops.append((None if self.function is None else self.function.name.lexeme,
+                                    iterations))
+        return loop
+
+    def print_stats(self):
+        """
+        Report the functions and loops which were compiled, in the order they were.
+        """
+        print(f"Promoted {len(self.promoted)} of {self.functions} functions:", file=sys.stderr)
+        for name, line, calls, loops in self.promoted:
+            print(f"  {name} (line {line}) after {calls} calls and {loops} loop iterations", file=sys.stderr)
+        print(f"Compiled {len(self.compiled_loops)} loops on their own:", file=sys.stderr)
+        for name, iterations in self.compiled_loops:
+            where = 'top level code' if name is None else name
+            print(f"  loop in {where} after {iterations} iterations", file=sys.stderr)
@@ -0,0 +1,741 @@
+from lox.LoxExpr import *
+from lox.LoxPyRuntime import PyRuntime
+from lox.LoxRuntimeError import LoxRuntimeError
+from lox.LoxStmt import *
+from lox.LoxToken import TokenType as TT
+
+
+class FunctionScope:
+    """
+    A Lox function (or the top level of the program) as seen by the transpiler.
+    """
+
+    def __init__(self, enclosing: "FunctionScope | None"):
+        self.enclosing = enclosing
+        self.free: dict[Variable, None] = {}  # variables of enclosing functions used in here, in order
+        self.assigned_globals: dict[str, None] = {}  # Python names of globals assigned in here
+
+
+class Variable:
+    """
+    A local Lox variable and the Python name it is transpiled to.
+    """
+
+    def __init__(self, name: str, function: FunctionScope):
+        self.name = name
+        self.function = function
+        self.captured = False  # used by a nested function
+        self.assigned = False  # assigned after its declaration
+        self.defining = False  # its function or class declaration is being analyzed
+        self.early = False  # used by a nested function before its declaration finished, e.g. recursive functions
+
+    @property
+    def boxed(self) -> bool:
+        """
+        Nested functions receive captured variables as keyword-only defaults, which copies their value. A captured
+        variable whose value can still change afterwards is shared through a one item list (a box) instead.
+        """
+        return self.captured and (self.assigned or self.early)
+
+
+class ScopeAnalyzer(ExprVisitor, StmtVisitor):
+    """
+    Works out which Python name every Lox variable maps to, and which variables are captured by nested functions.
+    Lox scoping is followed exactly like the Resolver does it, so the results line up with resolution.
+    """
+
+    def __init__(self):
+        self.scopes: list[dict[str, Variable]] = []
+        self.module = FunctionScope(None)
+        self.function = self.module
+        self.count = 0
+
+        self.declarations: dict[Stmt, Variable | None] = {}  # None for globals
+        self.parameters: dict[FunctionStmt, list[Variable]] = {}
+        self.functions: dict[FunctionStmt, FunctionScope] = {}
+        self.super_variables: dict[ClassStmt, Variable] = {}
+        self.references: dict[Expr, Variable | None] = {}  # None for globals
+        self.receivers: dict[SuperExpr, Variable] = {}  # 'this' for each super expression
+
+    def analyze(self, statements: list[Stmt]):
+        for stmt in statements:
+            stmt.accept(self)
+
+    # --------- Stmt Visitor Methods ---------
+    def visit_block_stmt(self, stmt: "BlockStmt"):
+        self.scopes.append({})
+        self.analyze(stmt.statements)
+        self.scopes.pop()
+
+    def visit_class_stmt(self, stmt: "ClassStmt"):
+        variable = self.declarations[stmt] = self.declare(stmt.name.lexeme)
+        if variable: variable.defining = True
+
+        if stmt.superclass:
+            stmt.superclass.accept(self)
+            self.super_variables[stmt] = self.new_variable('s', 'super', self.function)
+            self.scopes.append({'super': self.super_variables[stmt]})
+
+        for method in stmt.methods:
+            function = FunctionScope(self.function)
+            self.scopes.append({'this': Variable('this', function)})
+            self.analyze_function(method, function)
+            self.scopes.pop()
+
+        if stmt.superclass: self.scopes.pop()
+        if variable: variable.defining = False
+
+    def visit_expression_stmt(self, stmt: "ExpressionStmt"):
+        stmt.expression.accept(self)
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: stmt.initializer.accept(self)
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+        if stmt.increment: stmt.increment.accept(self)
+
+    def visit_function_stmt(self, stmt: "FunctionStmt"):
+        variable = self.declarations[stmt] = self.declare(stmt.name.lexeme)
+        if variable: variable.defining = True
+
+        self.analyze_function(stmt, FunctionScope(self.function))
+
+        if variable: variable.defining = False
+
+    def visit_if_stmt(self, stmt: "IfStmt"):
+        stmt.condition.accept(self)
+        stmt.thenBranch.accept(self)
+        if stmt.elseBranch: stmt.elseBranch.accept(self)
+
+    def visit_return_stmt(self, stmt: "ReturnStmt"):
+        if stmt.value: stmt.value.accept(self)
+
+    def visit_var_stmt(self, stmt: "VarStmt"):
+        if stmt.initializer: stmt.initializer.accept(self)
+        self.declarations[stmt] = self.declare(stmt.name.lexeme)
+
+    def visit_while_stmt(self, stmt: "WhileStmt"):
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+
+    # -------- Expr Visitor methods ---------
+    def visit_access_expr(self, expr: "AccessExpr"):
+        expr.lst.accept(self)
+        expr.index.accept(self)
+
+    def visit_assign_expr(self, expr: "AssignExpr"):
+        expr.value.accept(self)
+
+        variable = self.references[expr] = self.look_up(expr.name.lexeme)
+        if variable:
+            variable.assigned = True
+        elif self.function is not self.module:
+            self.function.assigned_globals[f'g_{expr.name.lexeme}'] = None
+
+    def visit_binary_expr(self, expr: "BinaryExpr"):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_call_expr(self, expr: "CallExpr"):
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_get_expr(self, expr: "GetExpr"):
+        expr.object.accept(self)
+
+    def visit_grouping_expr(self, expr: "GroupingExpr"):
+        expr.expression.accept(self)
+
+    def visit_list_expr(self, expr: "ListExpr"):
+        for item in expr.items:
+            item.accept(self)
+
+    def visit_listassign_expr(self, expr: "ListAssignExpr"):
+        expr.lst.accept(self)
+        expr.index.accept(self)
+        expr.value.accept(self)
+
+    def visit_literal_expr(self, expr: "LiteralExpr"):
+        pass
+
+    def visit_logical_expr(self, expr: "LogicalExpr"):
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_set_expr(self, expr: "SetExpr"):
+        expr.object.accept(self)
+        expr.value.accept(self)
+
+    def visit_super_expr(self, expr: "SuperExpr"):
+        self.references[expr] = self.look_up('super')
+        self.receivers[expr] = self.look_up('this')
+
+    def visit_this_expr(self, expr: "ThisExpr"):
+        self.references[expr] = self.look_up('this')
+
+    def visit_unary_expr(self, expr: "UnaryExpr"):
+        expr.right.accept(self)
+
+    def visit_variable_expr(self, expr: "VariableExpr"):
+        self.references[expr] = self.look_up(expr.name.lexeme)
+
+    # ------------- Helper methods ----------
+    def analyze_function(self, function: FunctionStmt, scope: FunctionScope):
+        """
+        Analyze a function's parameters and body.
+        :param function: FunctionStmt to analyze
+        :param scope: FunctionScope of the function
+        """
+        enclosing = self.function
+        self.function = self.functions[function] = scope
+
+        self.scopes.append({})
+        self.parameters[function] = [self.declare(param.lexeme) for param in function.params]
+        if function.lazy is not None: function.lazy.parse(function)
+        self.analyze(function.body)
+        self.scopes.pop()
+
+        self.function = enclosing
+
+    def new_variable(self, prefix: str, name: str, function: FunctionScope) -> Variable:
+        self.count += 1
+        return Variable(f'{prefix}{self.count}_{name}', function)
+
+    def declare(self, name: str) -> Variable | None:
+        """
+        Declare a variable in the innermost scope.
+        :param name: Lox name of the variable
+        :return: The new Variable, or None for globals
+        """
+        if not self.scopes: return None
+
+        variable = self.scopes[-1][name] = self.new_variable('v', name, self.function)
+        return variable
+
+    def look_up(self, name: str) -> Variable | None:
+        """
+        Find the variable a name refers to, and note when a nested function captures it.
+        :param name: Lox name of the variable
+        :return: The Variable, or None for globals
+        """
+        for scope in reversed(self.scopes):
+            if name not in scope: continue
+
+            variable = scope[name]
+            if variable.function is not self.function:
+                variable.captured = True
+                if variable.defining: variable.early = True
+
+                function = self.function
+                while function is not variable.function:
+                    function.free[variable] = None
+                    function = function.enclosing
+
+            return variable
+
+        return None
+
+
+class Transpiler(ExprVisitor, StmtVisitor):
+    """
+    Translates resolved Lox statements into Python source code. Expressions become Python expressions which check
+    operand types inline and only call into lox.LoxPyRuntime when something unusual (or an error) happens.
+    """
+
+    HEADER = "from lox.LoxPyRuntime import *\n\nlox_globals = globals()\nlox_globals.update(native_globals())\n\n"
+
+    comparisons = {TT.GREATER: '>', TT.GREATER_EQUAL: '>=', TT.LESS: '<', TT.LESS_EQUAL: '<='}
+    arithmetic = {
+        TT.MINUS: '-', TT.MINUS_EQUAL: '-', TT.MINUS_MINUS: '-',
+        TT.STAR: '*', TT.STAR_EQUAL: '*',
+        TT.CARAT: '**',
+        **comparisons,
+    }
+
+    def __init__(self):
+        self.analyzer = ScopeAnalyzer()
+        self.function = self.analyzer.module
+        self.lines: list[str] = []
+        self.indent = 0
+        self.temps = 0
+        self.calls = 0
+        self.initializer = False
+
+    def transpile(self, statements: list[Stmt], repl: bool = False) -> str:
+        """
+        Translate statements into a Python module.
+        :param statements: Resolved statements to translate
+        :param repl: whether to print the value of top level expression statements
+        :return: Python source, to be run after HEADER
+        """
+        self.analyzer = ScopeAnalyzer()
+        self.analyzer.analyze(statements)
+        self.function = self.analyzer.module
+        self.lines = []
+
+        for stmt in statements:
+            if repl and isinstance(stmt, ExpressionStmt):
+                self.emit(f'print_expr({self.expr(stmt.expression)})')
+            else:
+                stmt.accept(self)
+
+        return '\n'.join(self.lines) + '\n'
+
+    # --------- Stmt Visitor Methods ---------
+    def visit_block_stmt(self, stmt: "BlockStmt"):
+        for statement in stmt.statements:
+            statement.accept(self)
+
+    def visit_class_stmt(self, stmt: "ClassStmt"):
+        lexeme = stmt.name.lexeme
+        variable = self.analyzer.declarations[stmt]
+
+        base = 'LoxPyInstance'
+        if stmt.superclass:
+            base = self.analyzer.super_variables[stmt].name
+            self.emit(f'{base} = check_superclass({self.expr(stmt.superclass)}, {stmt.superclass.name.line})')
+
+        if variable is None:
+            class_name = f'g_{lexeme}'
+        elif variable.boxed:
+            self.emit(f'{variable.name} = [None]')
+            class_name = f'c{variable.name[1:]}'
+        else:
+            class_name = variable.name
+
+        self.emit(f'class {class_name}({base}):')
+        self.indent += 1
+        self.emit(f'lox_name = {lexeme!r}')
+        for method in stmt.methods:
+            self.emit_function(method, f'm_{method.name.lexeme}', is_method=True,
+                               is_initializer=method.name.lexeme == 'init')
+        self.indent -= 1
+
+        if variable and variable.boxed: self.emit(f'{variable.name}[0] = {class_name}')
+
+    def visit_expression_stmt(self, stmt: "ExpressionStmt"):
+        self.emit_expression(stmt.expression)
+
+    def visit_for_stmt(self, stmt: "ForStmt"):
+        if stmt.initializer: stmt.initializer.accept(self)
+
+        self.emit(f'while {self.condition(stmt.condition)}:')
+        self.emit_suite(stmt.body, stmt.increment)
+
+    def visit_function_stmt(self, stmt: "FunctionStmt"):
+        lexeme = stmt.name.lexeme
+        variable = self.analyzer.declarations[stmt]
+
+        if variable is None:
+            self.emit_function(stmt, f'g_{lexeme}')
+        elif variable.boxed:
+            self.emit(f'{variable.name} = [None]')
+            self.emit_function(stmt, f'f{variable.name[1:]}')
+            self.emit(f'{variable.name}[0] = f{variable.name[1:]}')
+        else:
+            self.emit_function(stmt, variable.name)
+
+    def visit_if_stmt(self, stmt: "IfStmt"):
+        self.emit(f'if {self.condition(stmt.condition)}:')
+        self.emit_suite(stmt.thenBranch)
+
+        else_branch = stmt.elseBranch
+        while isinstance(else_branch, IfStmt):
+            self.emit(f'elif {self.condition(else_branch.condition)}:')
+            self.emit_suite(else_branch.thenBranch)
+            else_branch = else_branch.elseBranch
+
+        if else_branch:
+            self.emit('else:')
+            self.emit_suite(else_branch)
+
+    def visit_return_stmt(self, stmt: "ReturnStmt"):
+        if self.initializer:
+            self.emit('return this')
+        else:
+            self.emit(f'return {self.expr(stmt.value) if stmt.value else None}')
+
+    def visit_var_stmt(self, stmt: "VarStmt"):
+        variable = self.analyzer.declarations[stmt]
+        value = self.expr(stmt.initializer) if stmt.initializer else 'None'
+
+        if variable is None:
+            self.emit(f'g_{stmt.name.lexeme} = {value}')
+        elif variable.boxed:
+            self.emit(f'{variable.name} = [{value}]')
+        else:
+            self.emit(f'{variable.name} = {value}')
+
+    def visit_while_stmt(self, stmt: "WhileStmt"):
+        self.emit(f'while {self.condition(stmt.condition)}:')
+        self.emit_suite(stmt.body)
+
+    # -------- Expr Visitor methods ---------
+    def visit_access_expr(self, expr: "AccessExpr") -> str:
+        line = expr.name.line
+        lst, bind_lst = self.bind(expr.lst)
+        return f'(index({lst}, {self.expr(expr.index)}, {line}) if type({bind_lst}) is list else not_list({line}))'
+
+    def visit_assign_expr(self, expr: "AssignExpr") -> str:
+        variable = self.analyzer.references[expr]
+        value = self.expr(expr.value)
+
+        if variable is None:
+            name = f'g_{expr.name.lexeme}'
+            return (f'({name} := {value} if {name!r} in lox_globals '
+                    f'else undefined_variable({expr.name.line}, {expr.name.lexeme!r}, {value}))')
+        if variable.boxed:
+            return f'assign_box({variable.name}, {value})'
+        return f'({variable.name} := {value})'
+
+    def visit_binary_expr(self, expr: "BinaryExpr") -> str:
+        t_type = expr.operator.t_type
+        line = expr.operator.line
+
+        if t_type in (TT.EQUAL_EQUAL, TT.BANG_EQUAL):
+            return self.equality(expr, t_type == TT.EQUAL_EQUAL)
+
+        left_literal, right_literal = self.literal(expr.left), self.literal(expr.right)
+        left_float = left_literal is not None and type(left_literal.value) is float
+        right_float = right_literal is not None and type(right_literal.value) is float
+
+        if t_type in (TT.PLUS, TT.PLUS_EQUAL, TT.PLUS_PLUS):
+            op, fallback = '+', 'add({left}, {right}, {line})'
+        elif t_type in (TT.SLASH, TT.SLASH_EQUAL):
+            op, fallback = '/', 'divide({left}, {right}, {line})'
+            if right_float and right_literal.value == 0: right_literal = right_float = None  # always an error
+        else:
+            op, fallback = self.arithmetic[t_type], 'numbers_error({line}, {left}, {right})'
+
+        if (left_literal and not left_float) or (right_literal and not right_float):
+            return fallback.format(left=self.expr(expr.left), right=self.expr(expr.right), line=line)
+
+        left, bind_left = self.bind(expr.left)
+        right, bind_right = self.bind(expr.right)
+
+        if left_float and right_float:
+            return f'({left} {op} {right})'
+
+        if left_float:
+            check = f'type({bind_right}) is float'
+        elif right_float:
+            check = f'type({bind_left}) is float'
+        else:
+            check = f'type({bind_left}) is type({bind_right}) is float'
+
+        if op == '/' and not right_float:
+            check += f' and {right}'  # division by zero takes the fallback, which raises
+
+        return f'({left} {op} {right} if {check} else {fallback.format(left=left, right=right, line=line)})'
+
+    def visit_call_expr(self, expr: "CallExpr") -> str:
+        line = expr.paren.line
+        calls = self.calls
+        self.calls += 1
+
+        if self.function is self.analyzer.module:
+            arguments = ''.join(f', {self.expr(argument)}' for argument in expr.arguments)
+            return f'call_top({self.expr(expr.callee)}, {line}{arguments})'
+
+        callee, bind_callee = self.bind(expr.callee)
+        arguments = [(argument, self.expr(argument)) for argument in expr.arguments]
+
+        if self.calls == calls + 1:
+            # The arguments are written out once per branch. Evaluating them after the check can't be observed,
+            # because the fallback evaluates them before raising.
+            values = ', '.join(code for argument, code in arguments)
+            evaluate = ''
+            checked = bind_callee
+        else:
+            # An argument contains another call, so writing it out twice would double the code with every level.
+            # Evaluate the callee and all arguments into temporaries first instead.
+            binds = [bind_callee] if callee != bind_callee else []
+            uses = []
+            for argument, code in arguments:
+                if self.is_simple(argument):
+                    uses.append(code)
+                else:
+                    uses.append(self.temp())
+                    binds.append(f'({uses[-1]} := {code})')
+            values = ', '.join(uses)
+            evaluate = f'({", ".join(binds)},) and ' if binds else ''
+            checked = callee
+
+        if isinstance(expr.callee, (GetExpr, SuperExpr)):
+            arity = f'{callee}.__func__.__code__.co_argcount == {len(arguments) + 1}'
+            check = f'{evaluate}type({checked}) is MethodType and {arity}'
+        else:
+            arity = f'{callee}.__code__.co_argcount == {len(arguments)}'
+            check = f'{evaluate}type({checked}) is FunctionType and {arity}'
+
+        return f'({callee}({values}) if {check} else call({callee}, {line}{", " + values if values else ""}))'
+
+    def visit_get_expr(self, expr: "GetExpr") -> str:
+        name = f'm_{expr.name.lexeme}'
+        line = expr.name.line
+        value = self.temp()
+
+        if isinstance(expr.object, ThisExpr):
+            return (f'({value} if ({value} := getattr({self.expr(expr.object)}, {name!r}, MISSING)) is not MISSING '
+                    f'else undefined_property({line}, {expr.name.lexeme!r}))')
+
+        obj, bind_obj = self.bind(expr.object)
+        return (f'({value} if isinstance({bind_obj}, LoxPyInstance) and '
+                f'({value} := getattr({obj}, {name!r}, MISSING)) is not MISSING '
+                f'else get_property({obj}, {name!r}, {line}))')
+
+    def visit_grouping_expr(self, expr: "GroupingExpr") -> str:
+        return self.expr(expr.expression)
+
+    def visit_list_expr(self, expr: "ListExpr") -> str:
+        return f'[{", ".join(self.expr(item) for item in expr.items)}]'
+
+    def visit_listassign_expr(self, expr: "ListAssignExpr") -> str:
+        line = expr.name.line
+        lst, bind_lst = self.bind(expr.lst)
+        return (f'(store({lst}, check_index({lst}, {self.expr(expr.index)}, {line}), {self.expr(expr.value)}) '
+                f'if type({bind_lst}) is list else not_list({line}))')
+
+    def visit_literal_expr(self, expr: "LiteralExpr") -> str:
+        return repr(expr.value)
+
+    def visit_logical_expr(self, expr: "LogicalExpr") -> str:
+        right = self.expr(expr.right)
+        is_or = expr.operator.t_type == TT.OR
+
+        if literal := self.literal(expr.left):
+            return self.expr(expr.left) if self.is_truthy(literal) == is_or else right
+        if self.is_bool(expr.left):
+            return f'({self.expr(expr.left)} {"or" if is_or else "and"} {right})'
+
+        left, bind_left = self.bind(expr.left)
+        if is_or:
+            return f'({left} if {bind_left} is not None and {left} is not False else {right})'
+        return f'({left} if {bind_left} is None or {left} is False else {right})'
+
+    def visit_set_expr(self, expr: "SetExpr") -> str:
+        name = f'm_{expr.name.lexeme}'
+        obj = self.expr(expr.object)
+        if not isinstance(expr.object, ThisExpr):
+            obj = f'check_instance({obj}, {expr.name.line})'
+        return f'set_property({obj}, {name!r}, {self.expr(expr.value)})'
+
+    def visit_super_expr(self, expr: "SuperExpr") -> str:
+        superclass = self.analyzer.references[expr].name
+        receiver = self.analyzer.receivers[expr].name
+        return f'get_super({superclass}, {receiver}, {"m_" + expr.method.lexeme!r}, {expr.method.line})'
+
+    def visit_this_expr(self, expr: "ThisExpr") -> str:
+        return self.analyzer.references[expr].name
+
+    def visit_unary_expr(self, expr: "UnaryExpr") -> str:
+        match expr.operator.t_type:
+            case TT.MINUS:
+                right, bind_right = self.bind(expr.right)
+                return f'(-{right} if type({bind_right}) is float else operand_error({expr.operator.line}))'
+            case TT.BANG:
+                if literal := self.literal(expr.right): return repr(not self.is_truthy(literal))
+                if self.is_bool(expr.right): return f'(not {self.expr(expr.right)})'
+                right, bind_right = self.bind(expr.right)
+                return f'({bind_right} is None or {right} is False)'
+            case _:
+                return f'({self.expr(expr.right)}, None)[1]'
+
+    def visit_variable_expr(self, expr: "VariableExpr") -> str:
+        variable = self.analyzer.references[expr]
+
+        if variable is None:
+            name = f'g_{expr.name.lexeme}'
+            if self.function is not self.analyzer.module:
+                return name  # a NameError is turned into a LoxRuntimeError at the top level call
+            return f'({name} if {name!r} in lox_globals else undefined_variable({expr.name.line}, {expr.name.lexeme!r}))'
+
+        if variable.boxed: return f'{variable.name}[0]'
+        return variable.name
+
+    # ------------- Helper methods ----------
+    def emit(self, line: str):
+        self.lines.append('    ' * self.indent + line)
+
+    def emit_suite(self, stmt: Stmt, increment: Expr = None):
+        """
+        Emit the indented body of an if, while or for statement, followed by the increment of a for loop.
+        """
+        self.indent += 1
+        start = len(self.lines)
+        stmt.accept(self)
+        if increment: self.emit_expression(increment)
+        if len(self.lines) == start: self.emit('pass')
+        self.indent -= 1
+
+    def emit_expression(self, expr: Expr):
+        """
+        Emit an expression evaluated as a statement.
+        """
+        if isinstance(expr, AssignExpr):
+            self.emit(self.assignment(expr))
+        elif isinstance(expr, SetExpr) and isinstance(expr.object, ThisExpr):
+            self.emit(f'{self.expr(expr.object)}.m_{expr.name.lexeme} = {self.expr(expr.value)}')
+        else:
+            self.emit(self.expr(expr))
+
+    def emit_function(self, function: FunctionStmt, name: str, is_method: bool = False,
+                      is_initializer: bool = False):
+        """
+        Emit a Python def for a Lox function or method.
+        :param function: FunctionStmt to translate
+        :param name: Python name of the def
+        :param is_method: whether the function takes 'this' as its first parameter
+        :param is_initializer: whether the function is an init method, which always returns 'this'
+        """
+        scope = self.analyzer.functions[function]
+        parameters = self.analyzer.parameters[function]
+
+        signature = (['this'] if is_method else []) + [parameter.name for parameter in parameters]
+        if scope.free:
+            signature += ['*'] + [f'{variable.name}={variable.name}' for variable in scope.free]
+
+        self.emit(f'def {name}({", ".join(signature)}):')
+        self.indent += 1
+        start = len(self.lines)
+
+        if scope.assigned_globals: self.emit(f'global {", ".join(scope.assigned_globals)}')
+        for parameter in parameters:
+            if parameter.boxed: self.emit(f'{parameter.name} = [{parameter.name}]')
+
+        enclosing, enclosing_initializer = self.function, self.initializer
+        self.function, self.initializer = scope, is_initializer
+
+        for stmt in function.body:
+            stmt.accept(self)
+
+        self.function, self.initializer = enclosing, enclosing_initializer
+
+        if is_initializer:
+            self.emit('return this')
+        elif len(self.lines) == start:
+            self.emit('pass')
+        self.indent -= 1
+
+    def expr(self, expr: Expr) -> str:
+        return expr.accept(self)
+
+    def assignment(self, expr: AssignExpr) -> str:
+        """
+        Translate an assignment used as a statement, which doesn't need to produce a value.
+        """
+        variable = self.analyzer.references[expr]
+        value = self.expr(expr.value)
+
+        if variable is None:
+            name = f'g_{expr.name.lexeme}'
+            return (f'{name} = {value} if {name!r} in lox_globals '
+                    f'else undefined_variable({expr.name.line}, {expr.name.lexeme!r}, {value})')
+        if variable.boxed:
+            return f'{variable.name}[0] = {value}'
+        return f'{variable.name} = {value}'
+
+    def equality(self, expr: BinaryExpr, equal: bool) -> str:
+        """
+        Translate == or !=. Bound methods are only equal to themselves, the same as LoxFunctions.
+        """
+        if self.literal(expr.left) or self.literal(expr.right):
+            return f'({self.expr(expr.left)} {"==" if equal else "!="} {self.expr(expr.right)})'
+
+        left, bind_left = self.bind(expr.left)
+        right, bind_right = self.bind(expr.right)
+        same, op = ('is', '==') if equal else ('is not', '!=')
+        return f'({left} {same} {right} if type({bind_left}) is type({bind_right}) is MethodType else {left} {op} {right})'
+
+    def condition(self, expr: Expr) -> str:
+        """
+        Translate a condition into a Python boolean following Lox truthiness.
+        """
+        if literal := self.literal(expr): return repr(self.is_truthy(literal))
+        if self.is_bool(expr): return self.expr(expr)
+
+        value, bind_value = self.bind(expr)
+        return f'{bind_value} is not None and {value} is not False'
+
+    def bind(self, expr: Expr) -> tuple[str, str]:
+        """
+        Prepare an expression which has to be used more than once.
+        :param expr: Expression to translate
+        :return: Code to use the value, and code which evaluates it (these are the same for simple expressions)
+        """
+        code = self.expr(expr)
+        if self.is_simple(expr): return code, code
+
+        temp = self.temp()
+        return temp, f'({temp} := {code})'
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f't{self.temps}'
+
+    def is_simple(self, expr: Expr) -> bool:
+        """
+        Check if an expression can be evaluated more than once, in any order, without anyone noticing.
+        """
+        if isinstance(expr, GroupingExpr): return self.is_simple(expr.expression)
+        if isinstance(expr, LiteralExpr): return True
+        if isinstance(expr, ThisExpr): return True
+        if isinstance(expr, VariableExpr):
+            variable = self.analyzer.references[expr]
+            return variable is not None and not variable.boxed
+        return False
+
+    @classmethod
+    def is_bool(cls, expr: Expr) -> bool:
+        """
+        Check if an expression always evaluates to a boolean, so Python truthiness can be used on it.
+        """
+        if isinstance(expr, GroupingExpr): return cls.is_bool(expr.expression)
+        if isinstance(expr, LiteralExpr): return type(expr.value) is bool
+        if isinstance(expr, UnaryExpr): return expr.operator.t_type == TT.BANG
+        if isinstance(expr, LogicalExpr): return cls.is_bool(expr.left) and cls.is_bool(expr.right)
+        if isinstance(expr, BinaryExpr):
+            return expr.operator.t_type in cls.comparisons or expr.operator.t_type in (TT.EQUAL_EQUAL, TT.BANG_EQUAL)
+        return False
+
+    @classmethod
+    def is_truthy(cls, literal: LiteralExpr) -> bool:
+        return PyRuntime.is_truthy(literal.value)
+
+    @classmethod
+    def literal(cls, expr: Expr) -> LiteralExpr | None:
+        """
+        :return: expr as a LiteralExpr, looking through any grouping, or None if it isn't one
+        """
+        while isinstance(expr, GroupingExpr):
+            expr = expr.expression
+        return expr if isinstance(expr, LiteralExpr) else None
+
+
+class PyInterpreter(PyRuntime):
+    """
+    Interpreter which transpiles programs to Python and runs them with exec.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.transpiler = Transpiler()
+        self.namespace: dict[str, object] = {}
+        self.emit_path: str | None = None
+        self.emitted = False
+        exec(Transpiler.HEADER, self.namespace)
+
+    def interpret(self, statements: list[Stmt], repl: bool = False):
+        source = self.transpiler.transpile(statements, repl)
+
+        if self.emit_path:
+            with open(self.emit_path, 'a' if self.emitted else 'w') as file:
+                file.write(source if self.emitted else Transpiler.HEADER + source)
+            self.emitted = True
+
+        try:
+            exec(compile(source, self.emit_path or '<lox>', 'exec'), self.namespace)
+        except LoxRuntimeError as error:
+            from lox.Lox import Lox
+            Lox.runtime_error(error)
@@ -0,0 +1,458 @@
+import math
+
+from lox.LoxCallable import LoxCallable
+from lox.LoxChunk import OpCode
+from lox.LoxClass import LoxClass
+from lox.LoxClosure import LoxBoundMethod, LoxClosure, Upvalue
+from lox.LoxInstance import LoxInstance
+from lox.LoxRuntimeError import LoxRuntimeError
+from lox.LoxStmt import Stmt
+from lox.NativeFunctions import NativeFunction
+from run.Compiler import Compiler
+from run.Interpreter import Interpreter
+
+# Plain ints, so the dispatch loop compares against module constants instead of enum members.
+CONSTANT = int(OpCode.CONSTANT)
+NIL = int(OpCode.NIL)
+TRUE = int(OpCode.TRUE)
+FALSE = int(OpCode.FALSE)
+POP = int(OpCode.POP)
+GET_LOCAL = int(OpCode.GET_LOCAL)
+SET_LOCAL = int(OpCode.SET_LOCAL)
+GET_UPVALUE = int(OpCode.GET_UPVALUE)
+SET_UPVALUE = int(OpCode.SET_UPVALUE)
+GET_GLOBAL = int(OpCode.GET_GLOBAL)
+SET_GLOBAL = int(OpCode.SET_GLOBAL)
+DEFINE_GLOBAL = int(OpCode.DEFINE_GLOBAL)
+GET_PROPERTY = int(OpCode.GET_PROPERTY)
+SET_PROPERTY = int(OpCode.SET_PROPERTY)
+CHECK_INSTANCE = int(OpCode.CHECK_INSTANCE)
+LOAD_METHOD = int(OpCode.LOAD_METHOD)
+GET_SUPER = int(OpCode.GET_SUPER)
+SUPER_METHOD = int(OpCode.SUPER_METHOD)
+EQUAL = int(OpCode.EQUAL)
+NOT_EQUAL = int(OpCode.NOT_EQUAL)
+GREATER = int(OpCode.GREATER)
+GREATER_EQUAL = int(OpCode.GREATER_EQUAL)
+LESS = int(OpCode.LESS)
+LESS_EQUAL = int(OpCode.LESS_EQUAL)
+ADD = int(OpCode.ADD)
+SUBTRACT = int(OpCode.SUBTRACT)
+MULTIPLY = int(OpCode.MULTIPLY)
+DIVIDE = int(OpCode.DIVIDE)
+POWER = int(OpCode.POWER)
+NOT = int(OpCode.NOT)
+NEGATE = int(OpCode.NEGATE)
+JUMP = int(OpCode.JUMP)
+JUMP_IF_FALSE = int(OpCode.JUMP_IF_FALSE)
+JUMP_IF_TRUE = int(OpCode.JUMP_IF_TRUE)
+POP_JUMP_IF_FALSE = int(OpCode.POP_JUMP_IF_FALSE)
+CALL = int(OpCode.CALL)
+CALL_METHOD = int(OpCode.CALL_METHOD)
+CLOSURE = int(OpCode.CLOSURE)
+CLOSE_UPVALUE = int(OpCode.CLOSE_UPVALUE)
+RETURN = int(OpCode.RETURN)
+CLASS = int(OpCode.CLASS)
+INHERIT = int(OpCode.INHERIT)
+METHOD = int(OpCode.METHOD)
+BUILD_LIST = int(OpCode.BUILD_LIST)
+CHECK_LIST = int(OpCode.CHECK_LIST)
+CHECK_INDEX = int(OpCode.CHECK_INDEX)
+INDEX_GET = int(OpCode.INDEX_GET)
+INDEX_SET = int(OpCode.INDEX_SET)
+PRINT_EXPR = int(OpCode.PRINT_EXPR)
+
+NUMBERS_MESSAGE = "Both Operands must be numbers."
+
+
+class VM:
+    """
+    Stack based virtual machine which runs the bytecode produced by the Compiler.
+    """
+
+    # natives only need these two helpers from the interpreter they are called with
+    is_truthy = Interpreter.is_truthy
+    stringify = Interpreter.stringify
+
+    max_call_depth = 100_000  # Lox calls which can be active at once before a "Stack overflow." error
+
+    def __init__(self):
+        self.globals: dict[str, object] = {}
+        self.open_upvalues: dict[int, Upvalue] = {}
+
+        self.define_global_constants()
+        self.define_native_functions()
+
+    def define_global_constants(self):
+        self.globals["PI"] = math.pi
+        self.globals["E"] = math.e
+
+    def define_native_functions(self):
+        for native in NativeFunction.__subclasses__():
+            self.globals[native.name] = native()
+
+    def interpret(self, statements: list[Stmt], repl: bool = False):
+        """
+        Compile the statements and run them on the VM.
+        :param statements: list of statements to run
+        :param repl: whether to print the output of expressions immediately after running (for repl)
+        """
+        script = Compiler().compile(statements, repl)
+        try:
+            self.run(LoxClosure(script, []))
+        except LoxRuntimeError as error:
+            from lox.Lox import Lox
+            Lox.runtime_error(error)
+
+    def run(self, closure: LoxClosure):
+        """
+        Execute the script closure until it returns.
+        :param closure: Closure of the top level script
+        :raises: LoxRuntimeError if the program fails
+        """
+        stack = [closure]
+        push, pop = stack.append, stack.pop
+        frames = []  # callers: (closure, code, constants, upvalues, ip, base)
+        globals_ = self.globals
+        open_upvalues = self.open_upvalues
+        open_upvalues.clear()  # left over if the previous run failed
+
+        code, constants, upvalues = closure.function.chunk.code, closure.function.chunk.constants, closure.upvalues
+        ip = base = 0
+
+        try:
+            while True:
+                op = code[ip]
+                arg = code[ip + 1]
+                ip += 2
+
+                if op == GET_LOCAL:
+                    push(stack[base + arg])
+                elif op == CONSTANT:
+                    push(constants[arg])
+                elif op == SET_LOCAL:
+                    stack[base + arg] = stack[-1]
+                elif op == POP:
+                    pop()
+                elif op == ADD:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is float and type(right) is float:
+                        stack[-1] = left + right
+                    else:
+                        stack[-1] = self.add(left, right)
+                elif op == LESS:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left < right
+                elif op == POP_JUMP_IF_FALSE:
+                    value = pop()
+                    if value is None or value is False: ip = arg
+                elif op == JUMP:
+                    ip = arg
+                elif op == GET_GLOBAL:
+                    try:
+                        push(globals_[constants[arg]])
+                    except KeyError:
+                        raise LoxRuntimeError(message=f"Undefined variable '{constants[arg]}'.")
+                elif op == GET_UPVALUE:
+                    upvalue = upvalues[arg]
+                    push(upvalue.value if upvalue.closed else upvalue.stack[upvalue.location])
+                elif op == SUBTRACT:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left - right
+                elif op == CALL or op == CALL_METHOD:
+                    if op == CALL:
+                        callee = stack[-arg - 1]
+                    else:
+                        callee = stack[-arg - 2]
+                        del stack[-arg - 2]
+                        if callee is None: callee = stack[-arg - 1]  # LOAD_METHOD found a field
+
+                    if type(callee) is not LoxClosure:
+                        callee = self.prepare_call(callee, arg, stack)
+                        if callee is None: continue  # already handled (native function, class without init)
+
+                    function = callee.function
+                    if function.arity != arg:
+                        raise LoxRuntimeError(message=f"Expected {function.arity} arguments but got {arg}.")
+
+                    if len(frames) >= self.max_call_depth: raise LoxRuntimeError(message="Stack overflow.")
+                    frames.append((closure, code, constants, upvalues, ip, base))
+                    closure, upvalues = callee, callee.upvalues
+                    code, constants = function.chunk.code, function.chunk.constants
+                    ip = 0
+                    base = len(stack) - arg - 1
+                elif op == RETURN:
+                    result = pop()
+                    if open_upvalues: self.close_upvalues(base)
+                    if not frames: return
+
+                    del stack[base:]
+                    push(result)
+                    closure, code, constants, upvalues, ip, base = frames.pop()
+                elif op == LOAD_METHOD:
+                    receiver = stack[-1]
+                    if not isinstance(receiver, LoxInstance):
+                        raise LoxRuntimeError(message="Only instances have properties.")
+
+                    name = constants[arg]
+                    shape = receiver.shape
+                    offset = shape.offsets.get(name)
+                    if offset is not None:
+                        stack[-1] = None
+                        push(receiver.values[offset])
+                    else:
+                        stack[-1] = self.find_method(shape.l_class, name)
+                        push(receiver)
+                elif op == GET_PROPERTY:
+                    receiver = stack[-1]
+                    if not isinstance(receiver, LoxInstance):
+                        raise LoxRuntimeError(message="Only instances have properties.")
+
+                    name = constants[arg]
+                    shape = receiver.shape
+                    offset = shape.offsets.get(name)
+                    if offset is not None:
+                        stack[-1] = receiver.values[offset]
+                    else:
+                        stack[-1] = LoxBoundMethod(receiver, self.find_method(shape.l_class, name))
+                elif op == SET_PROPERTY:
+                    value = pop()
+                    receiver = stack[-1]
+                    if not isinstance(receiver, LoxInstance):
+                        raise LoxRuntimeError(message="Only instances have fields.")
+
+                    receiver.set_field(constants[arg], value)
+                    stack[-1] = value
+                elif op == SET_UPVALUE:
+                    upvalue = upvalues[arg]
+                    if upvalue.closed:
+                        upvalue.value = stack[-1]
+                    else:
+                        upvalue.stack[upvalue.location] = stack[-1]
+                elif op == MULTIPLY:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left * right
+                elif op == DIVIDE:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    if right == 0: raise LoxRuntimeError(message="Cannot divide by 0.")
+                    stack[-1] = left / right
+                elif op == GREATER:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left > right
+                elif op == LESS_EQUAL:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left <= right
+                elif op == GREATER_EQUAL:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left >= right
+                elif op == EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] == right
+                elif op == NOT_EQUAL:
+                    right = pop()
+                    stack[-1] = stack[-1] != right
+                elif op == JUMP_IF_FALSE:
+                    value = stack[-1]
+                    if value is None or value is False: ip = arg
+                elif op == JUMP_IF_TRUE:
+                    value = stack[-1]
+                    if value is not None and value is not False: ip = arg
+                elif op == NOT:
+                    value = stack[-1]
+                    stack[-1] = value is None or value is False
+                elif op == NIL:
+                    push(None)
+                elif op == TRUE:
+                    push(True)
+                elif op == FALSE:
+                    push(False)
+                elif op == INDEX_GET:
+                    index = pop()
+                    lst = stack[-1]
+                    stack[-1] = lst[self.check_index(lst, index)]
+                elif op == INDEX_SET:
+                    value = pop()
+                    index = pop()
+                    lst = stack[-1]
+                    lst[self.check_index(lst, index)] = value
+                elif op == BUILD_LIST:
+                    if arg:
+                        items = stack[-arg:]
+                        del stack[-arg:]
+                    else:
+                        items = []
+                    push(items)
+                elif op == SET_GLOBAL:
+                    name = constants[arg]
+                    if name not in globals_:
+                        raise LoxRuntimeError(message=f"Undefined variable '{name}'.")
+                    globals_[name] = stack[-1]
+                elif op == DEFINE_GLOBAL:
+                    globals_[constants[arg]] = pop()
+                elif op == NEGATE:
+                    if type(stack[-1]) is not float: raise LoxRuntimeError(message="Operand must be a number.")
+                    stack[-1] = -stack[-1]
+                elif op == POWER:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float: raise LoxRuntimeError(message=NUMBERS_MESSAGE)
+                    stack[-1] = left ** right
+                elif op == CLOSURE:
+                    function = constants[arg]
+                    captured = [self.capture_upvalue(stack, base + index) if is_local else upvalues[index]
+                                for is_local, index in function.upvalues]
+                    push(LoxClosure(function, captured))
+                elif op == CLOSE_UPVALUE:
+                    self.close_upvalues(len(stack) - 1)
+                    pop()
+                elif op == CHECK_INSTANCE:
+                    if not isinstance(stack[-1], LoxInstance):
+                        raise LoxRuntimeError(message="Only instances have fields.")
+                elif op == CHECK_LIST:
+                    if not isinstance(stack[-1], list):
+                        raise LoxRuntimeError(message="Can only access index of lists.")
+                elif op == CHECK_INDEX:
+                    self.check_index(stack[-2], stack[-1])
+                elif op == GET_SUPER:
+                    superclass = pop()
+                    stack[-1] = LoxBoundMethod(stack[-1], self.find_super_method(superclass, constants[arg]))
+                elif op == SUPER_METHOD:
+                    superclass = pop()
+                    receiver = stack[-1]
+                    stack[-1] = self.find_super_method(superclass, constants[arg])
+                    push(receiver)
+                elif op == CLASS:
+                    push(LoxClass(constants[arg], None, {}))
+                elif op == INHERIT:
+                    superclass = stack[-2]
+                    if not isinstance(superclass, LoxClass):
+                        raise LoxRuntimeError(message="Superclass must be a class.")
+                    stack[-1].superclass = superclass
+                    stack[-1].methods.update(superclass.methods)  # copied down before the subclass adds its own
+                    stack[-1].initializer = superclass.initializer
+                elif op == METHOD:
+                    method = pop()
+                    stack[-1].methods[constants[arg]] = method
+                    if constants[arg] == "init": stack[-1].initializer = method
+                elif op == PRINT_EXPR:
+                    value = pop()
+                    if value is not None: print(self.stringify(value))
+                else:
+                    raise RuntimeError(f'Unknown opcode {OpCode(op)}.')
+        except LoxRuntimeError as error:
+            # like the tree-walker, an error inside a call is reported at the outermost call
+            if frames:
+                caller, caller_ip = frames[0][0], frames[0][4]
+                token = caller.function.chunk.token_at(caller_ip)
+            else:
+                token = error.token or closure.function.chunk.token_at(ip)
+            raise LoxRuntimeError(token, error.message)
+
+    # ------------- Helper methods ----------
+    def prepare_call(self, callee: object, arg_count: int, stack: list[object]) -> LoxClosure | None:
+        """
+        Set up a call to anything other than a plain closure. The callee sits in stack[-arg_count - 1].
+        :return: Closure to run in a new frame, or None if the call has already been completed
+        :raises: LoxRuntimeError if callee can't be called
+        """
+        if isinstance(callee, LoxBoundMethod):
+            stack[-arg_count - 1] = callee.receiver
+            return callee.method
+
+        if isinstance(callee, LoxClass):
+            stack[-arg_count - 1] = LoxInstance(callee)
+            initializer = callee.initializer
+            if initializer: return initializer
+
+            if arg_count != 0:
+                raise LoxRuntimeError(message=f"Expected 0 arguments but got {arg_count}.")
+            return None
+
+        if isinstance(callee, LoxCallable):
+            arity = callee.arity()
+            if arg_count != arity:
+                raise LoxRuntimeError(message=f"Expected {arity} arguments but got {arg_count}.")
+
+            first = len(stack) - arg_count
+            result = callee.call(self, stack[first:])
+            del stack[first - 1:]
+            stack.append(result)
+            return None
+
+        raise LoxRuntimeError(message="Can only call functions and classes.")
+
+    def capture_upvalue(self, stack: list[object], location: int) -> Upvalue:
+        """
+        Get the upvalue for a stack slot, reusing it if another closure already captured the slot.
+        """
+        upvalue = self.open_upvalues.get(location)
+        if upvalue is None:
+            upvalue = Upvalue(stack, location)
+            self.open_upvalues[location] = upvalue
+        return upvalue
+
+    def close_upvalues(self, last: int):
+        """
+        Close every open upvalue that points at stack slot last or above.
+        """
+        for location in [location for location in self.open_upvalues if location >= last]:
+            self.open_upvalues.pop(location).close()
+
+    @classmethod
+    def find_method(cls, l_class: LoxClass, name: str) -> LoxClosure:
+        method = l_class.find_method(name)
+        if method is None:
+            raise LoxRuntimeError(message=f"Undefined property {name}.")
+        return method
+
+    @classmethod
+    def find_super_method(cls, superclass: LoxClass, name: str) -> LoxClosure:
+        method = superclass.find_method(name)
+        if method is None:
+            raise LoxRuntimeError(message=f"Undefined property '{name}'.")
+        return method
+
+    @classmethod
+    def add(cls, left: object, right: object) -> object:
+        """
+        Addition for anything other than two numbers: lists append, strings concatenate.
+        """
+        if isinstance(left, list):
+            return left + [right]
+        if isinstance(left, str) or isinstance(right, str):
+            return cls.stringify(left) + cls.stringify(right)
+        raise LoxRuntimeError(message="Unsupported types for addition.")
+
+    @classmethod
+    def check_index(cls, lst: object, index: object) -> int:
+        """
+        Validate a list indexing operation.
+        :return: index as an int
+        :raises: LoxRuntimeError if lst isn't a list or index isn't a whole number in range
+        """
+        if not isinstance(lst, list):
+            raise LoxRuntimeError(message="Can only access index of lists.")
+
+        if not (isinstance(index, float) and index.is_integer()):
+            raise LoxRuntimeError(message="Can only index with a whole number.")
+
+        length = len(lst)
+        if index >= length or index < -length:
+            raise LoxRuntimeError(message="List index out of range.")
+
+        return int(index)
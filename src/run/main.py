@@ -7,8 +7,62 @@ def main():
     parser = argparse.ArgumentParser(description='Lox Interpreter written in Python.')
     parser.add_argument('filename', nargs='?',
                         help='Optional file to run as Lox source. Omit to run in interactive mode.')
+    parser.add_argument('--engine', choices=Lox.engines.keys(), default='tree',
+                        help='Engine to run programs with: the tree-walking interpreter, the bytecode VM, the closure '
+                             'compiler, the Python transpiler, the tree-walking interpreter with its own call stack, '
+                             'or the tree-walking interpreter compiling hot functions and loops with the closure '
+                             'compiler.')
+    parser.add_argument('--emit-py', metavar='PATH',
+                        help='Write the Python module generated by the py engine to PATH.')
+    parser.add_argument('--max-call-depth', type=int, metavar='N',
+                        help='Report a stack overflow once N Lox calls are active at once (stack and vm engines).')
+    parser.add_argument('--record-profile', metavar='PATH',
+                        help='Save the type feedback of the run to PATH (tree and stack engines).')
+    parser.add_argument('--use-profile', metavar='PATH',
+                        help='Specialize the program with a profile saved by --record-profile before running it, '
+                             'unless it was recorded for a different version of the program (tree and stack engines).')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Scan, parse and resolve the file even if an earlier run cached it in __loxcache__, and '
+                             'do not cache it.')
+    parser.add_argument('--eager-parse', action='store_true',
+                        help='Parse and resolve every function before running the file, so all syntax errors are '
+                             'reported up front, rather than parsing functions declared in top level code when first '
+                             'called.')
+    parser.add_argument('--hot-calls', type=int, metavar='N',
+                        help='Compile a function once it has been called N times (tiered engine).')
+    parser.add_argument('--hot-loops', type=int, metavar='N',
+                        help='Compile a function once its loops have run N iterations, and a loop once it has run N '
+                             'iterations (tiered engine).')
+    parser.add_argument('--tier-stats', action='store_true',
+                        help='Print the functions and loops which were compiled after running (tiered engine).')
     args = parser.parse_args()
 
+    if args.emit_py and args.engine != 'py':
+        parser.error('--emit-py requires --engine=py')
+    if args.max_call_depth is not None:
+        if args.engine not in ('stack', 'vm'): parser.error('--max-call-depth requires --engine=stack or --engine=vm')
+        if args.max_call_depth < 1: parser.error('--max-call-depth must be at least 1')
+    for option, value in (('--hot-calls', args.hot_calls), ('--hot-loops', args.hot_loops),
+                          ('--tier-stats', args.tier_stats or None)):
+        if value is None: continue
+        if args.engine != 'tiered': parser.error(f'{option} requires --engine=tiered')
+        if value is not True and value < 1: parser.error(f'{option} must be at least 1')
+    for option, path in (('--record-profile', args.record_profile), ('--use-profile', args.use_profile)):
+        if path is None: continue
+        if args.engine not in ('tree', 'stack'): parser.error(f'{option} requires --engine=tree or --engine=stack')
+        if not args.filename: parser.error(f'{option} requires a filename')
+
+    Lox.use_engine(args.engine)
+    if args.emit_py: Lox.interpreter.emit_path = args.emit_py
+    if args.max_call_depth: Lox.interpreter.max_call_depth = args.max_call_depth
+    if args.hot_calls: Lox.interpreter.hot_calls = args.hot_calls
+    if args.hot_loops: Lox.interpreter.hot_loops = args.hot_loops
+    if args.tier_stats: Lox.interpreter.tier_stats = True
+    Lox.record_profile = args.record_profile
+    Lox.use_profile = args.use_profile
+    Lox.use_cache = not args.no_cache
+    Lox.eager_parse = args.eager_parse
+
     Lox.run_prompt() if not args.filename else Lox.run_file(args.filename)
 
 
@@ -1,8 +1,13 @@
 import sys
 
+# fields every node has: whether running it can call Lox code, worked out the first time the stack engine runs it
+# (see StackInterpreter.contains_call)
+SHARED_RESOLVED = {'can_call': 'bool'}
 
-def define_subclass(file, superclass: str, subclass: str, fields: dict[str, str]):
+
+def define_subclass(file, superclass: str, subclass: str, fields: dict[str, str], resolved: dict[str, str]):
     file.write(f'class {subclass}{superclass}({superclass}):\n')
+    file.write(f'\t__slots__ = ({"".join(repr(name) + ", " for name in [*fields, *resolved])})\n\n')
 
     file.write(f'\tdef __init__(self, ')
     for name, type in fields.items():
@@ -12,6 +17,9 @@ def define_subclass(file, superclass: str, subclass: str, fields: dict[str, str]
     for name in fields.keys():
         file.write(f'\t\tself.{name} = {name}\n')
 
+    for name, type in resolved.items():
+        file.write(f'\t\tself.{name}: "{type}" = None\n')
+
     file.write(f'\tdef accept(self, visitor: "{superclass}Visitor"):\n')
     file.write(f'\t\treturn visitor.visit_{subclass.lower()}_{superclass.lower()}(self)\n')
     file.write('\n')
@@ -19,6 +27,7 @@ def define_subclass(file, superclass: str, subclass: str, fields: dict[str, str]
 
 def define_superclass(file, superclass):
     file.write(f'class {superclass}(ABC):\n')
+    file.write('\t__slots__ = ()  # nodes only have the attributes they declare, rather than a __dict__ each\n\n')
     file.write('\t@abstractmethod\n')
     file.write(f'\tdef accept(self, visitor: "{superclass}Visitor"): pass\n\n')
 
@@ -39,7 +48,9 @@ def write_imports(file):
     file.write('\n')
 
 
-def define_ast(output_dir: str, superclass: str, subclasses: dict[str, dict[str, str]]):
+def define_ast(output_dir: str, superclass: str, subclasses: dict[str, dict[str, str]],
+               resolved: dict[str, dict[str, str]] = None):
+    resolved = resolved or {}  # fields filled in after parsing, by the Resolver or by the interpreter as caches
     path = f'{output_dir}/Lox{superclass}.py'
     with open(path, 'w') as file:
         write_imports(file)
@@ -49,7 +60,7 @@ def define_ast(output_dir: str, superclass: str, subclasses: dict[str, dict[str,
         define_superclass(file, superclass)
 
         for class_name, fields in subclasses.items():
-            define_subclass(file, superclass, class_name, fields)
+            define_subclass(file, superclass, class_name, fields, {**resolved.get(class_name, {}), **SHARED_RESOLVED})
     print(fr'Successfully wrote to {path}')
 
 
@@ -59,13 +70,34 @@ def define_stmt_classes(output_dir):
         'Block': {'statements': 'list[Stmt]'},
         'Class': {'name': 'LoxToken', 'superclass': 'VariableExpr', 'methods': 'list[FunctionStmt]'},
         'Expression': {'expression': 'Expr'},
+        'For': {'initializer': 'Stmt', 'condition': 'Expr', 'increment': 'Expr', 'body': 'Stmt'},
         'Function': {'name': 'LoxToken', 'params': 'list[LoxToken]', 'body': 'list[Stmt]'},
         'If': {'condition': 'Expr', 'thenBranch': 'Stmt', 'elseBranch': 'Stmt'},
         'Return': {'keyword': 'LoxToken', 'value': 'Expr'},
         'Var': {'name': 'LoxToken', 'initializer': 'Expr'},
         'While': {'condition': 'Expr', 'body': 'Stmt'}
     }
-    define_ast(output_dir, superclass, subclasses)
+    # where the Resolver put a declared variable (slot is None for globals), the frames blocks, classes and
+    # functions need (top level blocks and classes get frames of their own), which returns are tail calls, and what
+    # a for loop counting its variable by a constant adds to it each iteration, and the tokens of function bodies the
+    # Parser has only pre-parsed so far
+    location = {'slot': 'int', 'captured': 'bool'}
+    # how much the tiered engine has run a function (calls, and iterations of the loops in its interpreted body) or a
+    # loop, and what it compiled once they got hot (see TieredInterpreter), function bodies compiled by the closure
+    # engine being kept the same way
+    function_hotness = {'calls': 'int', 'loops': 'int', 'compiled': 'StmtFn'}
+    loop_hotness = {'iterations': 'int', 'compiled': 'StmtFn'}
+    resolved = {
+        'Block': {'frame_size': 'int'},
+        'Class': {**location, 'super_slot': 'int', 'frame_size': 'int'},
+        'For': {'step': 'float', **loop_hotness},
+        'Function': {**location, 'cells': 'list[int]', 'upvalues': 'list[tuple[bool, int]]', 'frame_size': 'int',
+                     'lazy': 'LazyBody', **function_hotness},
+        'Return': {'tail_call': 'bool'},
+        'Var': location,
+        'While': loop_hotness
+    }
+    define_ast(output_dir, superclass, subclasses, resolved)
 
 
 def define_expr_classes(output_dir):
@@ -87,7 +119,30 @@ def define_expr_classes(output_dir):
         'Unary': {'operator': 'LoxToken', 'right': 'Expr'},
         'Variable': {'name': 'LoxToken'}
     }
-    define_ast(output_dir, superclass, types)
+    # where the Resolver found a variable, access is None for globals
+    location = {'access': 'VariableAccess', 'slot': 'int'}
+    # inline cache of the method a super access found last time, and the class it was found in
+    method_cache = {'cached_class': 'LoxClass', 'cached_method': 'LoxFunction'}
+    # inline caches of the instance shape a property access saw last time: where the field was (None if it wasn't a
+    # field, then the method it found instead), or where the value went and the shape it moved the instance to
+    property_cache = {'cached_shape': 'Shape', 'cached_offset': 'int', 'cached_method': 'LoxFunction'}
+    field_cache = {'cached_shape': 'Shape', 'cached_offset': 'int', 'cached_transition': 'Shape'}
+    # the operand types and operation an operator site has specialized itself to, and how often it has rewritten
+    # itself (see Interpreter.specialize_binary), or for logical operators the truthiness which skips the right side
+    binary_specialization = {'left_type': 'type', 'right_type': 'type', 'operation': 'Callable', 'rewrites': 'int'}
+    unary_specialization = {'operand_type': 'type', 'operation': 'Callable', 'rewrites': 'int'}
+    resolved = {
+        'Assign': location,
+        'Binary': binary_specialization,
+        'Get': property_cache,
+        'Logical': {'short_circuit': 'bool'},
+        'Set': field_cache,
+        'Super': {**location, 'this': 'ThisExpr', **method_cache},
+        'This': location,
+        'Unary': unary_specialization,
+        'Variable': location
+    }
+    define_ast(output_dir, superclass, types, resolved)
 
 
 def main():